@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.cleanup_plan import DeletionPlan, scan_directory
+
+OLD_FILE_AGE_SECONDS = 60 * 24 * 60 * 60
+ORIGINAL_STAT, ORIGINAL_UNLINK = os.stat, os.unlink
+
+
+def create_files(directory: Path, count: int) -> None:
+    """半数の更新日時を保持期間より古くしたファイルを作成する"""
+    old_time = time.time() - OLD_FILE_AGE_SECONDS
+    for index in range(count):
+        path = directory / f"backup_{index:06d}.log"
+        path.write_bytes(b"x" * 128)
+        if index % 2 == 0:
+            os.utime(path, (old_time, old_time))
+
+
+def cleanup_with_glob(directory: Path, cutoff: float) -> int:
+    """従来方式: globで列挙してファイル毎にstatし、メインスレッドで1件ずつ削除する"""
+    deleted = 0
+    for path in directory.glob("*.log"):
+        if path.stat().st_mtime < cutoff:
+            path.unlink()
+            deleted += 1
+    return deleted
+
+
+def cleanup_with_plan(directory: Path, cutoff: float, workers: int) -> int:
+    """scandirで1回だけ列挙して削除対象を確定し、ワーカーで削除する"""
+    plan = DeletionPlan()
+    for entry in scan_directory(directory, ["*.log"]):
+        stat = entry.stat()
+        if stat.st_mtime < cutoff:
+            plan.add(Path(entry.path), stat.st_size)
+    deleted, _ = plan.execute(workers)
+    return len(deleted)
+
+
+def add_latency(latency: float) -> None:
+    """ネットワーク共有を想定し、stat・削除の1回毎に往復の待ち時間を加える
+
+    scandirのDirEntryが一覧取得時に得た情報は対象外（Windowsでは一覧と同時に取得されるため）。
+    """
+    def stat(*args, **kwargs):
+        time.sleep(latency)
+        return ORIGINAL_STAT(*args, **kwargs)
+
+    def unlink(*args, **kwargs):
+        time.sleep(latency)
+        return ORIGINAL_UNLINK(*args, **kwargs)
+
+    os.stat, os.unlink = stat, unlink
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="大量のファイルに対する削除処理の速度を比較する")
+    parser.add_argument("--files", type=int, default=100_000, help="作成するファイル数")
+    parser.add_argument("--workers", type=int, default=4, help="削除に使うワーカー数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stat・削除の1回毎に加える待ち時間（ミリ秒）")
+    parser.add_argument("--dir", default=None, help="ファイルを作成するディレクトリ（ネットワーク共有での計測用）")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cutoff = time.time() - OLD_FILE_AGE_SECONDS / 2
+
+    print(f"📦 {args.files:,}ファイル（半数が削除対象）")
+    with tempfile.TemporaryDirectory(dir=args.dir) as temp_dir:
+        directory = Path(temp_dir)
+        for name, cleanup in [
+            ("glob + stat + 逐次削除", lambda: cleanup_with_glob(directory, cutoff)),
+            (f"scandir + 削除計画 + {args.workers}ワーカー", lambda: cleanup_with_plan(directory, cutoff, args.workers)),
+        ]:
+            create_files(directory, args.files)
+            if args.latency_ms:
+                add_latency(args.latency_ms / 1000)
+            started_at = time.perf_counter()
+            deleted = cleanup()
+            elapsed = time.perf_counter() - started_at
+
+            assert deleted == (args.files + 1) // 2, "削除したファイル数が一致しません"
+            print(f"  {name}: {elapsed:.2f}秒（{deleted:,}件削除）")
+            os.stat, os.unlink = ORIGINAL_STAT, ORIGINAL_UNLINK
+            for path in directory.iterdir():
+                path.unlink()
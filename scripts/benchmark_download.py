@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.http_download import download_segmented, download_with_resume
+
+SEND_BLOCK_SIZE = 64 * 1024
+
+
+class ThrottledRangeHandler(BaseHTTPRequestHandler):
+    """Rangeリクエストに対応し、1接続あたりの転送速度を制限するテスト用サーバー"""
+
+    server: 'ThrottledRangeServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        content = self.server.content
+        start, end = 0, len(content) - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            start_text, end_text = range_header.removeprefix('bytes=').split('-')
+            start = int(start_text)
+            end = min(int(end_text), end) if end_text else end
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        # 1接続の帯域が上限になる状況を再現するため、ブロック毎に送信間隔を空ける
+        interval = SEND_BLOCK_SIZE / self.server.bytes_per_second
+        for position in range(start, end + 1, SEND_BLOCK_SIZE):
+            self.wfile.write(content[position:min(position + SEND_BLOCK_SIZE, end + 1)])
+            time.sleep(interval)
+
+
+class ThrottledRangeServer(ThreadingHTTPServer):
+    def __init__(self, content: bytes, bytes_per_second: float) -> None:
+        super().__init__(('127.0.0.1', 0), ThrottledRangeHandler)
+        self.content = content
+        self.bytes_per_second = bytes_per_second
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ローカルのRange対応サーバーで分割ダウンロードの速度を比較する")
+    parser.add_argument("--size-mb", type=int, default=64, help="ダウンロードするファイルのサイズ（MB）")
+    parser.add_argument("--stream-mbps", type=float, default=16.0, help="1接続あたりの転送速度の上限（MB/s）")
+    parser.add_argument(
+        "--connections", type=lambda value: [int(item) for item in value.split(',')], default=[1, 2, 4, 8],
+        help="比較する接続数（カンマ区切り）"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    content = os.urandom(args.size_mb * 1024 * 1024)
+    server = ThrottledRangeServer(content, args.stream_mbps * 1024 * 1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/backup.dump"
+
+    print(f"📦 {args.size_mb}MB / 1接続あたり{args.stream_mbps}MB/s")
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for connections in args.connections:
+                destination = Path(temp_dir) / f"backup_{connections}.dump"
+                started_at = time.perf_counter()
+                if connections == 1:
+                    download_with_resume(url, destination)
+                else:
+                    download_segmented(url, destination, connections)
+                elapsed = time.perf_counter() - started_at
+
+                assert destination.read_bytes() == content, "ダウンロードした内容が一致しません"
+                print(f"  {connections}接続: {elapsed:.2f}秒 ({args.size_mb / elapsed:.1f}MB/s)")
+                destination.unlink()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,37 @@
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from service.heroku_postgreSQL_backup import HerokuPostgreSQLBackup
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="主キー順のチャンクに分割したJSONでバックアップする")
+    parser.add_argument("--resume", metavar="TIMESTAMP", help="中断したバックアップのタイムスタンプ（例: 20251129_143022）")
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="テーブルを並列にエクスポートするワーカー数（省略時は config.ini の export_workers）"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+
+    backup = None
+    succeeded = False
+    try:
+        backup = HerokuPostgreSQLBackup(export_workers=args.jobs)
+        succeeded = backup.backup_as_json_chunks(timestamp=args.resume)
+    except Exception as e:
+        print(f"❌ エラー: {e}")
+    finally:
+        if backup is not None:
+            backup.close()
+
+    sys.exit(0 if succeeded else 1)
@@ -0,0 +1,27 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from service.cleanup_old_backups import cleanup_old_backups
+from utils.config_manager import get_log_directory, get_log_retention_days, load_config
+from utils.log_rotation import setup_logging
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="古いバックアップとログを削除する")
+    parser.add_argument("--days", type=int, default=None, help="保持期間（日数、省略時は config.ini の cleanup_days）")
+    parser.add_argument("--dry-run", action="store_true", help="削除せずに削除対象と解放される容量を表示する")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(
+        log_directory=get_log_directory(), log_retention_days=get_log_retention_days(),
+        log_name='CleanupBackups', dry_run=args.dry_run
+    )
+
+    backup_dir = Path(load_config().get('Paths', 'backup_path'))
+    cleanup_old_backups(backup_dir, args.days, dry_run=args.dry_run)
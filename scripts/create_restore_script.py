@@ -7,6 +7,9 @@ import pytz
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+from utils.artifact_writer import ArtifactWriter, copy_through
+from utils.backup_catalog import BackupCatalog, CatalogEntry
+from utils.chunk_store import CHUNK_STORE_DIR_NAME, ChunkStore
 from utils.config_manager import get_log_directory, get_log_retention_days, load_config
 from utils.log_rotation import setup_logging
 
@@ -228,6 +231,44 @@ def create_restore_script_from_backup_data(backup_dir, timestamp):
     return generator.create_restore_script()
 
 
+DUMP_METHODS = ('heroku_dump', 'heroku_dump_chunked')
+
+
+def list_dump_files(backup_dir: Path) -> list[CatalogEntry]:
+    """復元できるダンプファイル（チャンクストアに格納したダンプを含む）をバックアップカタログから取得"""
+    with BackupCatalog(backup_dir) as catalog:
+        return [entry for entry in catalog.list_backups() if entry.method in DUMP_METHODS]
+
+
+def get_dump_name(entry: CatalogEntry) -> str:
+    """チャンクストアのダンプはマニフェスト名から元のダンプ名を求める"""
+    if entry.method == 'heroku_dump_chunked':
+        return entry.path.name.removesuffix('.json')
+    return entry.path.name
+
+
+def prepare_dump_file(backup_dir: Path, entry: CatalogEntry) -> Path:
+    """復元スクリプトが読める.dumpを用意する
+
+    チャンクストアのダンプはチャンクを連結して、圧縮したダンプは展開して復元し、記録したSHA-256と照合する。
+    """
+    if entry.method == 'heroku_dump_chunked':
+        dump_file = backup_dir / get_dump_name(entry)
+        ChunkStore(backup_dir / CHUNK_STORE_DIR_NAME).restore(dump_file.name, dump_file)
+        return dump_file
+
+    if entry.path.suffix == '.dump':
+        return entry.path
+
+    dump_file = entry.path.with_suffix('')
+    with ArtifactWriter(dump_file) as writer:
+        copy_through(entry.path, writer)
+    if entry.sha256 and writer.hexdigest() != entry.sha256:
+        dump_file.unlink(missing_ok=True)
+        raise ValueError(f"展開したダンプのSHA-256が記録と一致しません: {entry.path.name}")
+    return dump_file
+
+
 def main():
     """スタンドアロン実行用のメイン関数"""
     # ログシステムの初期化
@@ -255,8 +296,8 @@ def main():
         print(f"❌ ディレクトリが存在しません: {backup_dir}")
         return
 
-    # 利用可能なバックアップファイルを表示
-    dump_files = list(backup_dir.glob("heroku_backup_*.dump"))
+    # 利用可能なバックアップファイルをカタログから取得
+    dump_files = list_dump_files(backup_dir)
     if not dump_files:
         logger.warning("ダンプファイルが見つかりません")
         print("❌ ダンプファイルが見つかりません")
@@ -265,18 +306,31 @@ def main():
     logger.info(f"{len(dump_files)}個のダンプファイルを検出しました")
 
     print("\\n📁 利用可能なダンプファイル:")
-    for i, dump_file in enumerate(dump_files, 1):
-        # ファイル名からタイムスタンプを抽出
-        timestamp = dump_file.stem.replace("heroku_backup_", "")
-        print(f"  {i}. {dump_file.name} ({timestamp})")
+    for i, entry in enumerate(dump_files, 1):
+        sha256 = f", SHA-256: {entry.sha256[:12]}" if entry.sha256 else ""
+        if entry.method == 'heroku_dump_chunked':
+            location = "チャンクストア"
+        else:
+            location = f"{entry.size_bytes / 1024 / 1024:,.1f}MB"
+        print(f"  {i}. {get_dump_name(entry)} ({entry.timestamp}, {location}{sha256})")
 
     try:
         choice = int(input("\\n復元スクリプトを作成するダンプファイルを選択してください: ")) - 1
         if 0 <= choice < len(dump_files):
             selected_file = dump_files[choice]
-            timestamp = selected_file.stem.replace("heroku_backup_", "")
-
-            logger.info(f"選択されたダンプファイル: {selected_file.name}")
+            timestamp = selected_file.timestamp
+
+            logger.info(f"選択されたダンプファイル: {get_dump_name(selected_file)}")
+
+            try:
+                dump_file = prepare_dump_file(backup_dir, selected_file)
+            except (OSError, ValueError) as e:
+                logger.error(f"ダンプの展開エラー: {e}")
+                print(f"❌ ダンプを展開できませんでした: {e}")
+                return
+            if dump_file != selected_file.path:
+                logger.info(f"ダンプを展開しました: {dump_file}")
+                print(f"📦 ダンプを展開しました（復元後は削除できます）: {dump_file}")
 
             generator = RestoreScriptGenerator(backup_dir, timestamp)
             restore_file = generator.create_restore_script()
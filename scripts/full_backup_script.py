@@ -1,3 +1,4 @@
+import argparse
 import os
 
 from dotenv import load_dotenv
@@ -6,36 +7,59 @@ from service.heroku_login_again import ensure_heroku_login
 from service.heroku_postgreSQL_backup import HerokuPostgreSQLBackup
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Heroku PostgreSQL インタラクティブバックアップ")
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="テーブルを並列にエクスポートするワーカー数（省略時は config.ini の export_workers）"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     load_dotenv()
+    args = parse_args()
 
+    backup = None
     try:
-        backup = HerokuPostgreSQLBackup()
+        backup = HerokuPostgreSQLBackup(export_workers=args.jobs)
 
         print("\n💡 利用可能なバックアップ方法:")
         print("1. Heroku CLI バックアップ")
         print("2. JSON データバックアップ")
         print("3. CSV データバックアップ")
         print("4. すべての方法で実行")
+        print("5. NDJSON データバックアップ")
+        print("6. バイナリCOPY データバックアップ")
+        print("7. Parquet データバックアップ")
 
-        choice = input("\n選択してください (1-4): ").strip()
+        choice = input("\n選択してください (1-7): ").strip()
 
         # Heroku CLIを使用する場合はログイン状態をチェック
         if choice in ["1", "4"]:
             ensure_heroku_login()
 
         if choice == "1":
-            app_name = os.environ.get("HEROKU_APP_NAME")
-            backup.backup_with_heroku_cli_method(app_name)
+            app_name = os.environ.get("HEROKU_APP_NAME", "")
+            backup.backup_with_cli(app_name)
         elif choice == "2":
-            backup.backup_data_as_json_method()
+            backup.backup_as_json()
         elif choice == "3":
-            backup.backup_data_as_csv_method()
+            backup.backup_as_csv()
         elif choice == "4":
             app_name = os.environ.get("HEROKU_APP_NAME")
             backup.backup_all(app_name if app_name else None)
+        elif choice == "5":
+            backup.backup_as_ndjson()
+        elif choice == "6":
+            backup.backup_as_pgcopy()
+        elif choice == "7":
+            backup.backup_as_parquet()
         else:
             print("❌ 無効な選択です")
 
     except Exception as e:
         print(f"❌ エラー: {e}")
+    finally:
+        if backup is not None:
+            backup.close()
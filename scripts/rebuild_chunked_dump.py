@@ -0,0 +1,44 @@
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.chunk_store import CHUNK_STORE_DIR_NAME, ChunkStore
+from utils.config_manager import load_config
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="チャンクストアに格納したダンプを復元する")
+    parser.add_argument("name", nargs="?", help="復元するダンプ名（例: heroku_backup_20240115_030000.dump）")
+    parser.add_argument("--output", help="復元先のパス（省略時はバックアップディレクトリに同じ名前で復元）")
+    parser.add_argument("--list", action="store_true", help="格納しているダンプと重複排除率を表示する")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    backup_dir = Path(load_config().get('Paths', 'backup_path'))
+    store = ChunkStore(backup_dir / CHUNK_STORE_DIR_NAME)
+
+    if args.list or not args.name:
+        for name in store.list_manifests():
+            manifest = store.read_manifest(name)
+            print(f"  {name} ({manifest['size_bytes'] / 1024 / 1024:,.1f}MB, {len(manifest['chunks'])}チャンク)")
+        stats = store.get_stats()
+        print(
+            f"📦 {stats.manifest_count}件 {stats.logical_bytes / 1024 / 1024:,.1f}MB を"
+            f" {stats.stored_bytes / 1024 / 1024:,.1f}MB で保存（重複排除率: {stats.dedup_ratio:.1f}倍）"
+        )
+        sys.exit(0)
+
+    output = Path(args.output) if args.output else backup_dir / args.name
+    try:
+        size = store.restore(args.name, output)
+    except FileNotFoundError as e:
+        print(f"❌ マニフェストまたはチャンクが見つかりません: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ ダンプを復元しました: {output} ({size:,}バイト)")
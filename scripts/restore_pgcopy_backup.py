@@ -0,0 +1,34 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from service.backup_data_as_pgcopy import restore_data_from_pgcopy
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="バイナリCOPY形式のバックアップをデータベースに読み込む")
+    parser.add_argument("pgcopy_dir", help="pgcopy_backup_{timestamp} ディレクトリのパス")
+    parser.add_argument("--tables", help="読み込むテーブル（カンマ区切り、省略時は config.ini の backup_tables）")
+    parser.add_argument("--truncate", action="store_true", help="読み込み前に対象テーブルを空にする")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+
+    database_url = os.environ.get("DATABASE_URL", "")
+    if not database_url:
+        print("❌ DATABASE_URL環境変数が設定されていません")
+        sys.exit(1)
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    tables = [table.strip() for table in args.tables.split(',')] if args.tables else None
+    succeeded = restore_data_from_pgcopy(database_url, Path(args.pgcopy_dir), tables, truncate=args.truncate)
+    sys.exit(0 if succeeded else 1)
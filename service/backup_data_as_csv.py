@@ -1,36 +1,145 @@
+import codecs
+import time
 from pathlib import Path
 
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import Connection, Engine, text
 
-from utils.config_manager import get_backup_tables
-from utils.database_helper import add_ssl_mode
+from service.table_export import export_engine, export_tables, removing_partial_file, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.change_tracker import TABLE_STATS_FILE_NAME, TableChangeTracker
+from utils.compression import get_compression_suffix, open_binary_writer, open_text_writer
+from utils.config_manager import (
+    get_backup_tables,
+    get_consistent_snapshot,
+    get_csv_compression,
+    get_csv_export_method,
+    get_export_workers,
+    get_full_export_every_days,
+    get_incremental_columns,
+    get_incremental_export,
+    get_incremental_overlap,
+    get_skip_unchanged_tables,
+)
+from utils.database_helper import copy_expert
+from utils.watermark import WATERMARK_FILE_NAME, IncrementalExport, WatermarkRange
 
 
-def backup_data_as_csv(database_url: str, backup_dir: Path, timestamp: str) -> bool:
-    """データをCSV形式でバックアップ"""
+def _copy_table_to_csv(
+    conn: Connection,
+    table: str,
+    csv_file: Path,
+    watermark_range: WatermarkRange | None = None,
+    compression: str = 'none',
+) -> int:
+    """COPY TO STDOUTでテーブルをCSVファイルに直接書き込み、件数を返す"""
+    query = f"SELECT * FROM {table}"
+    params = None
+    if watermark_range is not None and watermark_range.params:
+        query += f" WHERE {watermark_range.condition(conn, pyformat=True)}"
+        params = watermark_range.params
+
+    with removing_partial_file(csv_file):
+        with open_binary_writer(csv_file, compression) as f:
+            # Excelで文字化けしないようBOMを付与する
+            f.write(codecs.BOM_UTF8)
+            return copy_expert(
+                conn,
+                f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')",
+                f,
+                params
+            )
+
+
+def _read_table_to_csv(
+    conn: Connection,
+    table: str,
+    csv_file: Path,
+    watermark_range: WatermarkRange | None = None,
+    compression: str = 'none',
+) -> int:
+    """pandasでテーブルを読み込んでCSVファイルに書き込み、件数を返す"""
+    if watermark_range is not None and watermark_range.params:
+        query = text(f"SELECT * FROM {table} WHERE {watermark_range.condition(conn)}")
+        df = pd.read_sql_query(query, conn, params=watermark_range.params)
+    else:
+        df = pd.read_sql_table(table, conn)
+    with open_text_writer(csv_file, compression) as f:
+        # Excelで文字化けしないようBOMを付与する
+        f.write('\ufeff')
+        df.to_csv(f, index=False)
+    return len(df)
+
+
+def backup_data_as_csv(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+    incremental: bool | None = None,
+    compression: str | None = None,
+) -> bool:
+    """データをCSV形式でバックアップ（圧縮方式を指定した場合は書き込みながら圧縮）"""
+    started_at = time.monotonic()
     try:
-        db_url = add_ssl_mode(database_url)
+        if workers is None:
+            workers = get_export_workers()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            csv_dir = backup_dir / f"csv_backup_{timestamp}"
+            csv_dir.mkdir(exist_ok=True)
+
+            if compression is None:
+                compression = get_csv_compression()
+            suffix = get_compression_suffix(compression)
+
+            write_csv = _copy_table_to_csv if get_csv_export_method() == 'copy' else _read_table_to_csv
+
+            if incremental is None:
+                incremental = get_incremental_export()
+            # 差分エクスポートでは前回のウォーターマーク以降の行だけを書き込む
+            tracker = IncrementalExport(
+                backup_dir / WATERMARK_FILE_NAME, 'csv', get_incremental_columns(), timestamp,
+                overlap=get_incremental_overlap(), full_export_every_days=get_full_export_every_days(),
+            ) if incremental else None
+            change_tracker = TableChangeTracker.start(
+                backup_dir / TABLE_STATS_FILE_NAME, 'csv', engine, tables, snapshot_id
+            ) if get_skip_unchanged_tables() else None
 
-        engine = create_engine(db_url)
+            print("🔄 データをCSVでバックアップ中...")
+            row_counts: dict[str, int] = {}
 
-        tables = get_backup_tables()
-        csv_dir = backup_dir / f"csv_backup_{timestamp}"
-        csv_dir.mkdir(exist_ok=True)
+            def export_table(conn: Connection, table: str) -> str:
+                csv_file = csv_dir / f"{table}.csv{suffix}"
+                is_incremental = tracker is not None and tracker.is_incremental(table)
+                # 差分ファイルは前回以降の行しか含まないため再利用しない
+                if change_tracker is not None and not is_incremental \
+                        and change_tracker.reuse_if_unchanged(table, csv_file):
+                    return f"変更なし（前回のファイルを再利用） -> {csv_file}"
+                watermark_range = tracker.prepare(conn, table) if tracker is not None else None
+                row_count = row_counts[table] = write_csv(conn, table, csv_file, watermark_range, compression)
+                if is_incremental:
+                    return f"{row_count}件（差分） -> {csv_file}"
+                return f"{row_count}件 -> {csv_file}"
 
-        print("🔄 データをCSVでバックアップ中...")
+            with snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                results = export_tables(engine, tables, export_table, workers, active_snapshot_id)
 
-        for table in tables:
-            try:
-                df = pd.read_sql_table(table, engine)
-                csv_file = csv_dir / f"{table}.csv"
-                df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-                print(f"  ✅ {table}: {len(df)}件 -> {csv_file}")
-            except Exception as e:
-                print(f"  ❌ {table}: {e}")
+            if tracker is not None:
+                tracker.save(results)
+            if change_tracker is not None:
+                change_tracker.save(results)
 
-        print(f"✅ CSVバックアップ完了: {csv_dir}")
-        return True
+            # 差分を含む場合は起点の全件エクスポートを記録し、削除時に差分と一緒に残す
+            record_backup(
+                backup_dir, timestamp, 'csv', csv_dir, time.monotonic() - started_at, row_counts=row_counts,
+                base_timestamp=tracker.get_base_timestamp() if tracker is not None else None,
+            )
+            print(f"✅ CSVバックアップ完了: {csv_dir}")
+            return True
 
     except Exception as e:
         print(f"❌ CSVバックアップエラー: {e}")
@@ -1,48 +1,206 @@
-import datetime
 import json
+import shutil
+import time
 from pathlib import Path
+from typing import BinaryIO, TextIO
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import Connection, Engine, Result
 
-from utils.config_manager import get_backup_tables
-from utils.database_helper import add_ssl_mode
+from service.table_export import export_engine, export_tables, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.compression import append_text_member, get_compression_suffix, open_binary_reader
+from utils.config_manager import (
+    get_backup_tables,
+    get_consistent_snapshot,
+    get_export_workers,
+    get_fetch_batch_size,
+    get_full_export_every_days,
+    get_incremental_columns,
+    get_incremental_export,
+    get_incremental_overlap,
+    get_json_compression,
+)
+from utils.database_helper import stream_table
+from utils.row_converter import RowEncoder
+from utils.watermark import WATERMARK_FILE_NAME, IncrementalExport
 
+# 非圧縮の出力で並列エクスポートする際の一時ファイルの圧縮レベル（出力時に展開するため速度を優先する）
+FRAGMENT_GZIP_LEVEL = 1
 
-def backup_data_as_json(database_url: str, backup_dir: Path, timestamp: str) -> bool:
-    """データをJSON形式でバックアップ"""
+
+def _write_table_rows(f: TextIO, table: str, result: Result) -> int:
+    """取得した行を逐次書き込み、件数を返す"""
+    f.write(f"  {json.dumps(table, ensure_ascii=False)}: [")
+
+    encoder = RowEncoder.from_result(result)
+    row_count = 0
+    for row in result:
+        f.write("\n    " if row_count == 0 else ",\n    ")
+        f.write(encoder.encode(row))
+        row_count += 1
+
+    f.write("\n  ]" if row_count else "]")
+    return row_count
+
+
+def _stream_rows(
+    conn: Connection, table: str, batch_size: int, incremental: IncrementalExport | None
+) -> Result:
+    """差分エクスポートの場合は前回のウォーターマーク以降の行だけを取得する"""
+    watermark_range = incremental.prepare(conn, table) if incremental is not None else None
+    if watermark_range is None:
+        return stream_table(conn, table, batch_size)
+    return stream_table(conn, table, batch_size, watermark_range.condition(conn), watermark_range.params)
+
+
+def _format_row_count(row_count: int, table: str, incremental: IncrementalExport | None) -> str:
+    if incremental is not None and incremental.is_incremental(table):
+        return f"{row_count}件（差分）"
+    return f"{row_count}件"
+
+
+def _get_fragment_path(backup_file: Path, table: str, compression: str) -> Path:
+    return backup_file.with_name(f".{backup_file.name}.{table}.part{get_compression_suffix(compression)}")
+
+
+def _export_tables_to_output(
+    engine: Engine,
+    raw: BinaryIO,
+    compression: str,
+    tables: list[str],
+    batch_size: int,
+    snapshot_id: str | None,
+    incremental: IncrementalExport | None,
+    row_counts: dict[str, int],
+) -> dict[str, bool]:
+    """1本の接続でテーブル順に出力へ直接書き込み、失敗したテーブルは書き込み前の位置まで切り詰める"""
+    written: list[str] = []
+
+    def export_table(conn: Connection, table: str) -> str:
+        result = _stream_rows(conn, table, batch_size, incremental)
+        offset = raw.tell()
+        try:
+            # テーブル毎に独立したメンバーとして書き込み、切り詰めた後も有効な圧縮ファイルのままにする
+            with append_text_member(raw, compression) as f:
+                f.write(",\n" if written else "\n")
+                row_counts[table] = _write_table_rows(f, table, result)
+        except Exception:
+            # 途中までのテーブルの行を完全なデータと誤認しないよう除外する
+            raw.seek(offset)
+            raw.truncate()
+            raise
+        written.append(table)
+        return _format_row_count(row_counts[table], table, incremental)
+
+    return export_tables(engine, tables, export_table, 1, snapshot_id)
+
+
+def _export_tables_in_parallel(
+    engine: Engine,
+    raw: BinaryIO,
+    compression: str,
+    backup_file: Path,
+    tables: list[str],
+    batch_size: int,
+    workers: int,
+    snapshot_id: str | None,
+    incremental: IncrementalExport | None,
+    row_counts: dict[str, int],
+) -> dict[str, bool]:
+    """テーブル毎の一時ファイルに圧縮して書き込み、成功したテーブルだけをテーブル順に連結する
+
+    一時ファイルは出力と同じ方式で圧縮し、gzipのメンバー・zstdのフレームのまま連結する。
+    非圧縮の出力では一時ファイルを速度優先のgzipで圧縮し、展開しながら連結する。
+    """
+    fragment_compression = compression if compression != 'none' else 'gzip'
+
+    def export_table(conn: Connection, table: str) -> str:
+        result = _stream_rows(conn, table, batch_size, incremental)
+        with open(_get_fragment_path(backup_file, table, fragment_compression), 'wb') as fragment, \
+                append_text_member(fragment, fragment_compression, FRAGMENT_GZIP_LEVEL) as f:
+            row_counts[table] = _write_table_rows(f, table, result)
+        return _format_row_count(row_counts[table], table, incremental)
+
+    try:
+        results = export_tables(engine, tables, export_table, workers, snapshot_id)
+
+        is_first = True
+        for table in tables:
+            if not results.get(table):
+                continue
+            with append_text_member(raw, compression) as f:
+                f.write("\n" if is_first else ",\n")
+            is_first = False
+            fragment_path = _get_fragment_path(backup_file, table, fragment_compression)
+            with (open(fragment_path, 'rb') if compression != 'none' else open_binary_reader(fragment_path)) \
+                    as fragment:
+                shutil.copyfileobj(fragment, raw)
+        return results
+    finally:
+        for table in tables:
+            _get_fragment_path(backup_file, table, fragment_compression).unlink(missing_ok=True)
+
+
+def backup_data_as_json(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+    incremental: bool | None = None,
+    compression: str | None = None,
+) -> bool:
+    """データをJSON形式でバックアップ（圧縮方式を指定した場合は書き込みながら圧縮）"""
+    started_at = time.monotonic()
     try:
-        db_url = add_ssl_mode(database_url)
-
-        engine = create_engine(db_url)
-
-        backup_data = {}
-        tables = get_backup_tables()
-
-        print("🔄 データをJSONでバックアップ中...")
-
-        with engine.connect() as conn:
-            for table in tables:
-                try:
-                    result = conn.execute(text(f"SELECT * FROM {table}"))
-                    rows = []
-                    for row in result:
-                        row_dict = dict(row._mapping)
-                        # datetime オブジェクトを文字列に変換
-                        for key, value in row_dict.items():
-                            if isinstance(value, datetime.datetime):
-                                row_dict[key] = value.isoformat()
-                        rows.append(row_dict)
-                    backup_data[table] = rows
-                    print(f"  ✅ {table}: {len(rows)}件")
-                except Exception as e:
-                    print(f"  ❌ {table}: {e}")
-
-        backup_file = backup_dir / f"data_backup_{timestamp}.json"
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
-
-        print(f"✅ JSONバックアップ完了: {backup_file}")
-        return True
+        if workers is None:
+            workers = get_export_workers()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            batch_size = get_fetch_batch_size()
+
+            if incremental is None:
+                incremental = get_incremental_export()
+            # 差分エクスポートでは前回のウォーターマーク以降の行だけを書き込む
+            tracker = IncrementalExport(
+                backup_dir / WATERMARK_FILE_NAME, 'json', get_incremental_columns(), timestamp,
+                overlap=get_incremental_overlap(), full_export_every_days=get_full_export_every_days(),
+            ) if incremental else None
+
+            print("🔄 データをJSONでバックアップ中...")
+
+            if compression is None:
+                compression = get_json_compression()
+            backup_file = backup_dir / f"data_backup_{timestamp}.json{get_compression_suffix(compression)}"
+            row_counts: dict[str, int] = {}
+            with open(backup_file, 'wb') as raw, \
+                    snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                with append_text_member(raw, compression) as f:
+                    f.write("{")
+                if workers <= 1 or len(tables) <= 1:
+                    results = _export_tables_to_output(
+                        engine, raw, compression, tables, batch_size, active_snapshot_id, tracker, row_counts
+                    )
+                else:
+                    results = _export_tables_in_parallel(
+                        engine, raw, compression, backup_file, tables, batch_size, workers, active_snapshot_id,
+                        tracker, row_counts,
+                    )
+                with append_text_member(raw, compression) as f:
+                    f.write("\n}\n")
+
+            if tracker is not None:
+                tracker.save(results)
+
+            # 差分を含む場合は起点の全件エクスポートを記録し、削除時に差分と一緒に残す
+            record_backup(
+                backup_dir, timestamp, 'json', backup_file, time.monotonic() - started_at, row_counts=row_counts,
+                base_timestamp=tracker.get_base_timestamp() if tracker is not None else None,
+            )
+            print(f"✅ JSONバックアップ完了: {backup_file}")
+            return True
 
     except Exception as e:
         print(f"❌ JSONバックアップエラー: {e}")
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Connection, Engine, TextClause, text
+
+from service.table_export import export_engine, export_tables, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.config_manager import (
+    get_backup_tables,
+    get_chunk_rows,
+    get_consistent_snapshot,
+    get_export_workers,
+    get_fetch_batch_size,
+)
+from utils.database_helper import get_primary_key_columns, stream_table
+from utils.json_state import load_json_state, save_json_state
+from utils.row_converter import RowEncoder
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ChunkManifest:
+    """書き込みが完了したチャンクを記録し、中断したエクスポートの再開位置を提供する"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: dict[str, Any] = load_json_state(path) or {"tables": {}}
+
+    def get_table(self, table: str) -> dict[str, Any]:
+        with self._lock:
+            state = self._data["tables"].get(table, {})
+            return {"completed": state.get("completed", False), "chunks": list(state.get("chunks", []))}
+
+    def record_chunk(
+        self, table: str, key_columns: list[str], file_name: str, row_count: int, last_key: list[Any] | None
+    ) -> None:
+        with self._lock:
+            state = self._data["tables"].setdefault(table, {"completed": False, "chunks": []})
+            state["key_columns"] = key_columns
+            state["chunks"].append({"file": file_name, "rows": row_count, "last_key": last_key})
+            self._save()
+
+    def mark_completed(self, table: str) -> None:
+        with self._lock:
+            state = self._data["tables"].setdefault(table, {"completed": False, "chunks": []})
+            state["completed"] = True
+            self._save()
+
+    def _save(self) -> None:
+        save_json_state(self.path, self._data)
+
+
+def _get_chunk_file(chunk_dir: Path, table: str, index: int) -> Path:
+    return chunk_dir / f"{table}_{index:05d}.json"
+
+
+def _write_chunk(chunk_file: Path, encoder: RowEncoder, rows: Iterable[Sequence[Any]]) -> int:
+    """行をJSON配列として一時ファイルに書き込み、完了後にチャンクファイルへ置き換える"""
+    part_file = chunk_file.with_name(f"{chunk_file.name}.part")
+    row_count = 0
+    try:
+        with open(part_file, 'w', encoding='utf-8') as f:
+            f.write("[")
+            for row in rows:
+                f.write("\n  " if row_count == 0 else ",\n  ")
+                f.write(encoder.encode(row))
+                row_count += 1
+            f.write("\n]\n" if row_count else "]\n")
+        os.replace(part_file, chunk_file)
+    except Exception:
+        part_file.unlink(missing_ok=True)
+        raise
+    return row_count
+
+
+def _build_chunk_query(conn: Connection, table: str, key_columns: list[str], after_key: bool) -> TextClause:
+    """主キーの順に、前回のチャンクの最後のキーより後ろの行を取得するクエリを作成"""
+    quote = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(quote(column) for column in key_columns)
+    where = ""
+    if after_key:
+        params = ", ".join(f":k{index}" for index in range(len(key_columns)))
+        where = f" WHERE ({columns}) > ({params})"
+    return text(f"SELECT * FROM {table}{where} ORDER BY {columns} LIMIT :limit")
+
+
+def backup_data_as_json_chunks(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    chunk_rows: int | None = None,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+) -> bool:
+    """データを主キー順のチャンクに分割したJSONファイルでバックアップ
+
+    同じタイムスタンプで再実行すると、マニフェストに記録された最後のチャンクの続きから再開する。
+    """
+    started_at = time.monotonic()
+    try:
+        if workers is None:
+            workers = get_export_workers()
+        if chunk_rows is None:
+            chunk_rows = get_chunk_rows()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            batch_size = get_fetch_batch_size()
+
+            chunk_dir = backup_dir / f"json_chunks_{timestamp}"
+            chunk_dir.mkdir(exist_ok=True)
+            manifest = ChunkManifest(chunk_dir / MANIFEST_NAME)
+
+            print("🔄 データをチャンク分割したJSONでバックアップ中...")
+            row_counts: dict[str, int] = {}
+
+            def export_without_key(conn: Connection, table: str) -> int:
+                # 主キーがないテーブルはページングできないため全件を1ファイルに書き込む
+                result = stream_table(conn, table, batch_size)
+                file_name = _get_chunk_file(chunk_dir, table, 0).name
+                row_count = _write_chunk(chunk_dir / file_name, RowEncoder.from_result(result), result)
+                manifest.record_chunk(table, [], file_name, row_count, None)
+                return row_count
+
+            def export_table(conn: Connection, table: str) -> str:
+                state = manifest.get_table(table)
+                chunks = state["chunks"]
+                if state["completed"]:
+                    return f"完了済みのためスキップ ({len(chunks)}ファイル)"
+
+                key_columns = get_primary_key_columns(conn, table)
+                if not key_columns:
+                    row_count = export_without_key(conn, table)
+                    manifest.mark_completed(table)
+                    row_counts[table] = row_count
+                    return f"{row_count}件 -> 1ファイル（主キーなし）"
+
+                last_key = chunks[-1]["last_key"] if chunks else None
+                key_encoder = RowEncoder(key_columns)
+                row_count = sum(chunk["rows"] for chunk in chunks)
+                index = len(chunks)
+                while True:
+                    params: dict[str, Any] = {"limit": chunk_rows}
+                    if last_key is not None:
+                        params.update({f"k{position}": value for position, value in enumerate(last_key)})
+                    result = conn.execute(_build_chunk_query(conn, table, key_columns, last_key is not None), params)
+                    rows = result.fetchall()
+                    if not rows:
+                        break
+
+                    file_name = _get_chunk_file(chunk_dir, table, index).name
+                    _write_chunk(chunk_dir / file_name, RowEncoder.from_result(result), rows)
+
+                    keys = list(result.keys())
+                    last_values = [rows[-1][keys.index(column)] for column in key_columns]
+                    last_key = list(key_encoder.convert(last_values).values())
+                    manifest.record_chunk(table, key_columns, file_name, len(rows), last_key)
+                    row_count += len(rows)
+                    index += 1
+
+                    if snapshot_id is None:
+                        # チャンク毎にトランザクションを終え、長時間スナップショットを保持しないようにする
+                        conn.commit()
+                    if len(rows) < chunk_rows:
+                        break
+
+                manifest.mark_completed(table)
+                row_counts[table] = row_count
+                return f"{row_count}件 -> {index}ファイル"
+
+            with snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                snapshot_id = active_snapshot_id
+                results = export_tables(engine, tables, export_table, workers, active_snapshot_id)
+
+            if not all(results.values()):
+                print(f"⚠️ 一部のテーブルが未完了です。タイムスタンプ {timestamp} で再実行すると続きから再開します")
+                return False
+
+            record_backup(
+                backup_dir, timestamp, 'json_chunks', chunk_dir, time.monotonic() - started_at, row_counts=row_counts
+            )
+            print(f"✅ チャンク分割JSONバックアップ完了: {chunk_dir}")
+            return True
+
+    except Exception as e:
+        print(f"❌ チャンク分割JSONバックアップエラー: {e}")
+        return False
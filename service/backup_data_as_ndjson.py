@@ -0,0 +1,84 @@
+import time
+from pathlib import Path
+
+from sqlalchemy import Connection, Engine
+
+from service.table_export import export_engine, export_tables, removing_partial_file, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.change_tracker import TABLE_STATS_FILE_NAME, TableChangeTracker
+from utils.compression import get_compression_suffix, open_text_writer
+from utils.config_manager import (
+    get_backup_tables,
+    get_consistent_snapshot,
+    get_export_workers,
+    get_fetch_batch_size,
+    get_ndjson_compression,
+    get_skip_unchanged_tables,
+)
+from utils.database_helper import stream_table
+from utils.row_converter import RowEncoder
+
+
+def backup_data_as_ndjson(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    compression: str | None = None,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+) -> bool:
+    """データをテーブル毎のNDJSON形式でバックアップ"""
+    started_at = time.monotonic()
+    try:
+        if workers is None:
+            workers = get_export_workers()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            batch_size = get_fetch_batch_size()
+            if compression is None:
+                compression = get_ndjson_compression()
+            suffix = get_compression_suffix(compression)
+
+            ndjson_dir = backup_dir / f"ndjson_backup_{timestamp}"
+            ndjson_dir.mkdir(exist_ok=True)
+
+            change_tracker = TableChangeTracker.start(
+                backup_dir / TABLE_STATS_FILE_NAME, 'ndjson', engine, tables, snapshot_id
+            ) if get_skip_unchanged_tables() else None
+
+            print("🔄 データをNDJSONでバックアップ中...")
+            row_counts: dict[str, int] = {}
+
+            def export_table(conn: Connection, table: str) -> str:
+                ndjson_file = ndjson_dir / f"{table}.ndjson{suffix}"
+                if change_tracker is not None and change_tracker.reuse_if_unchanged(table, ndjson_file):
+                    return f"変更なし（前回のファイルを再利用） -> {ndjson_file}"
+                with removing_partial_file(ndjson_file):
+                    result = stream_table(conn, table, batch_size)
+                    encoder = RowEncoder.from_result(result)
+                    row_count = 0
+                    with open_text_writer(ndjson_file, compression) as f:
+                        for row in result:
+                            f.write(encoder.encode(row))
+                            f.write("\n")
+                            row_count += 1
+                row_counts[table] = row_count
+                return f"{row_count}件 -> {ndjson_file}"
+
+            with snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                results = export_tables(engine, tables, export_table, workers, active_snapshot_id)
+
+            if change_tracker is not None:
+                change_tracker.save(results)
+
+            record_backup(
+                backup_dir, timestamp, 'ndjson', ndjson_dir, time.monotonic() - started_at, row_counts=row_counts
+            )
+            print(f"✅ NDJSONバックアップ完了: {ndjson_dir}")
+            return True
+
+    except Exception as e:
+        print(f"❌ NDJSONバックアップエラー: {e}")
+        return False
@@ -0,0 +1,198 @@
+import json
+import time
+from collections.abc import Callable, Sequence
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Connection, CursorResult, Engine
+
+from service.table_export import export_engine, export_tables, removing_partial_file, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.change_tracker import TABLE_STATS_FILE_NAME, TableChangeTracker
+from utils.config_manager import (
+    get_backup_tables,
+    get_consistent_snapshot,
+    get_export_workers,
+    get_fetch_batch_size,
+    get_parquet_compression,
+    get_parquet_row_group_rows,
+    get_skip_unchanged_tables,
+)
+from utils.database_helper import stream_table
+from utils.row_converter import get_converter
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+else:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Parquet出力を使わない環境では未インストールでも動作させる
+        pa = None
+        pq = None
+
+# 型コード（OID）からpyarrowの型への対応。ここにない型は文字列として保存する
+ARROW_TYPE_FACTORIES: dict[int, Callable[[], Any]] = {
+    16: lambda: pa.bool_(),                      # bool
+    17: lambda: pa.binary(),                     # bytea
+    20: lambda: pa.int64(),                      # int8
+    21: lambda: pa.int16(),                      # int2
+    23: lambda: pa.int32(),                      # int4
+    26: lambda: pa.int64(),                      # oid
+    700: lambda: pa.float32(),                   # float4
+    701: lambda: pa.float64(),                   # float8
+    1082: lambda: pa.date32(),                   # date
+    1083: lambda: pa.time64('us'),               # time
+    1114: lambda: pa.timestamp('us'),            # timestamp
+    1184: lambda: pa.timestamp('us', tz='UTC'),  # timestamptz
+    1186: lambda: pa.duration('us'),             # interval
+}
+BYTEA_TYPE_OID = 17
+JSON_TYPE_OIDS = frozenset({114, 3802})  # json, jsonb
+NUMERIC_TYPE_OID = 1700
+MAX_DECIMAL128_PRECISION = 38
+
+
+def _to_text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _build_column(column: Sequence[Any]) -> tuple[Any, Callable[[Any], Any] | None]:
+    """カーソルの列情報からpyarrowの型と値の変換関数を決定"""
+    type_code = column[1]
+
+    if type_code in ARROW_TYPE_FACTORIES:
+        # psycopg2はbyteaをmemoryviewで返すためbytesに変換する
+        converter = bytes if type_code == BYTEA_TYPE_OID else None
+        return ARROW_TYPE_FACTORIES[type_code](), converter
+
+    if type_code == NUMERIC_TYPE_OID:
+        precision, scale = column[4], column[5]
+        if isinstance(precision, int) and isinstance(scale, int) \
+                and 0 < precision <= MAX_DECIMAL128_PRECISION and 0 <= scale <= precision:
+            return pa.decimal128(precision, scale), None
+        # 精度指定のないnumericは桁数が不定のため文字列で保持する
+        return pa.string(), str
+
+    if type_code in JSON_TYPE_OIDS:
+        return pa.string(), _to_text
+
+    converter = get_converter(type_code)
+    if converter is None:
+        return pa.string(), None
+    return pa.string(), lambda value: _to_text(converter(value))
+
+
+def _build_schema(result: CursorResult) -> tuple[Any, list[Callable[[Any], Any] | None]]:
+    """結果セットの列情報からParquetのスキーマを作成"""
+    description = result.cursor.description if result.cursor is not None else None
+    if description is None:
+        raise RuntimeError("列情報を取得できませんでした")
+
+    fields = []
+    converters = []
+    for name, column in zip(result.keys(), description):
+        arrow_type, converter = _build_column(column)
+        fields.append(pa.field(name, arrow_type))
+        converters.append(converter)
+    return pa.schema(fields), converters
+
+
+def _write_parquet(
+    result: CursorResult, parquet_file: Path, batch_size: int, row_group_rows: int, compression: str
+) -> int:
+    """行をレコードバッチ単位で変換し、row_group_rows行ずつの行グループでParquetファイルに書き込み、件数を返す
+
+    行グループが小さいと列毎の統計情報や圧縮の効率が落ちるため、取得した行はまとめてから書き込む。
+    """
+    schema, converters = _build_schema(result)
+
+    row_count = 0
+    rows = iter(result)
+    pending: list[Any] = []
+    pending_rows = 0
+    with pq.ParquetWriter(parquet_file, schema, compression=compression) as writer:
+        while batch := list(islice(rows, batch_size)):
+            arrays = []
+            for index, (field, converter) in enumerate(zip(schema, converters)):
+                values = [row[index] for row in batch]
+                if converter is not None:
+                    values = [None if value is None else converter(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            pending.append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            pending_rows += len(batch)
+            row_count += len(batch)
+
+            while pending_rows >= row_group_rows:
+                table = pa.Table.from_batches(pending, schema=schema)
+                writer.write_table(table.slice(0, row_group_rows), row_group_size=row_group_rows)
+                remainder = table.slice(row_group_rows)
+                pending = remainder.to_batches()
+                pending_rows = remainder.num_rows
+
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending, schema=schema), row_group_size=row_group_rows)
+    return row_count
+
+
+def backup_data_as_parquet(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+) -> bool:
+    """データをテーブル毎のParquet形式でバックアップ"""
+    if pa is None:
+        print("❌ Parquetバックアップエラー: pyarrowがインストールされていません")
+        return False
+
+    started_at = time.monotonic()
+    try:
+        if workers is None:
+            workers = get_export_workers()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            batch_size = get_fetch_batch_size()
+            compression = get_parquet_compression()
+            row_group_rows = get_parquet_row_group_rows()
+
+            parquet_dir = backup_dir / f"parquet_backup_{timestamp}"
+            parquet_dir.mkdir(exist_ok=True)
+
+            change_tracker = TableChangeTracker.start(
+                backup_dir / TABLE_STATS_FILE_NAME, 'parquet', engine, tables, snapshot_id
+            ) if get_skip_unchanged_tables() else None
+
+            print("🔄 データをParquetでバックアップ中...")
+            row_counts: dict[str, int] = {}
+
+            def export_table(conn: Connection, table: str) -> str:
+                parquet_file = parquet_dir / f"{table}.parquet"
+                if change_tracker is not None and change_tracker.reuse_if_unchanged(table, parquet_file):
+                    return f"変更なし（前回のファイルを再利用） -> {parquet_file}"
+                with removing_partial_file(parquet_file):
+                    result = stream_table(conn, table, batch_size)
+                    row_count = _write_parquet(result, parquet_file, batch_size, row_group_rows, compression)
+                row_counts[table] = row_count
+                return f"{row_count}件 -> {parquet_file}"
+
+            with snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                results = export_tables(engine, tables, export_table, workers, active_snapshot_id)
+
+            if change_tracker is not None:
+                change_tracker.save(results)
+
+            record_backup(
+                backup_dir, timestamp, 'parquet', parquet_dir, time.monotonic() - started_at, row_counts=row_counts
+            )
+            print(f"✅ Parquetバックアップ完了: {parquet_dir}")
+            return True
+
+    except Exception as e:
+        print(f"❌ Parquetバックアップエラー: {e}")
+        return False
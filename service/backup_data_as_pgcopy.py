@@ -0,0 +1,127 @@
+import time
+from pathlib import Path
+
+from sqlalchemy import Connection, Engine, create_engine
+
+from service.table_export import export_engine, export_tables, removing_partial_file, snapshot_scope
+from utils.backup_catalog import record_backup
+from utils.change_tracker import TABLE_STATS_FILE_NAME, TableChangeTracker
+from utils.compression import COMPRESSION_SUFFIXES, get_compression_suffix, open_binary_reader, open_binary_writer
+from utils.config_manager import (
+    get_backup_tables,
+    get_consistent_snapshot,
+    get_export_workers,
+    get_pgcopy_compression,
+    get_skip_unchanged_tables,
+)
+from utils.database_helper import add_ssl_mode, copy_expert
+
+PGCOPY_SUFFIX = ".pgcopy"
+
+
+def backup_data_as_pgcopy(
+    database_url: str,
+    backup_dir: Path,
+    timestamp: str,
+    workers: int | None = None,
+    snapshot_id: str | None = None,
+    engine: Engine | None = None,
+    compression: str | None = None,
+) -> bool:
+    """データをテーブル毎のPostgreSQLバイナリCOPY形式でバックアップ（圧縮方式を指定した場合は書き込みながら圧縮）"""
+    started_at = time.monotonic()
+    try:
+        if workers is None:
+            workers = get_export_workers()
+
+        with export_engine(database_url, engine, workers) as engine:
+            tables = get_backup_tables()
+            pgcopy_dir = backup_dir / f"pgcopy_backup_{timestamp}"
+            pgcopy_dir.mkdir(exist_ok=True)
+            if compression is None:
+                compression = get_pgcopy_compression()
+            suffix = get_compression_suffix(compression)
+
+            change_tracker = TableChangeTracker.start(
+                backup_dir / TABLE_STATS_FILE_NAME, 'pgcopy', engine, tables, snapshot_id
+            ) if get_skip_unchanged_tables() else None
+
+            print("🔄 データをバイナリCOPYでバックアップ中...")
+            row_counts: dict[str, int] = {}
+
+            def export_table(conn: Connection, table: str) -> str:
+                pgcopy_file = pgcopy_dir / f"{table}{PGCOPY_SUFFIX}{suffix}"
+                if change_tracker is not None and change_tracker.reuse_if_unchanged(table, pgcopy_file):
+                    return f"変更なし（前回のファイルを再利用） -> {pgcopy_file}"
+                with removing_partial_file(pgcopy_file):
+                    with open_binary_writer(pgcopy_file, compression) as f:
+                        row_count = copy_expert(conn, f"COPY {table} TO STDOUT (FORMAT binary)", f)
+                row_counts[table] = row_count
+                return f"{row_count}件 -> {pgcopy_file}"
+
+            with snapshot_scope(engine, snapshot_id, get_consistent_snapshot()) as active_snapshot_id:
+                results = export_tables(engine, tables, export_table, workers, active_snapshot_id)
+
+            if change_tracker is not None:
+                change_tracker.save(results)
+
+            record_backup(
+                backup_dir, timestamp, 'pgcopy', pgcopy_dir, time.monotonic() - started_at, row_counts=row_counts
+            )
+            print(f"✅ バイナリCOPYバックアップ完了: {pgcopy_dir}")
+            return True
+
+    except Exception as e:
+        print(f"❌ バイナリCOPYバックアップエラー: {e}")
+        return False
+
+
+def restore_data_from_pgcopy(
+    database_url: str,
+    pgcopy_dir: Path,
+    tables: list[str] | None = None,
+    truncate: bool = False,
+) -> bool:
+    """バイナリCOPY形式のファイルをテーブルに読み込む"""
+    engine: Engine | None = None
+    try:
+        db_url = add_ssl_mode(database_url)
+
+        engine = create_engine(db_url)
+
+        if tables is None:
+            tables = get_backup_tables()
+
+        print(f"🔄 バイナリCOPYからデータを復元中: {pgcopy_dir}")
+
+        all_succeeded = True
+        for table in tables:
+            # 圧縮の有無は拡張子から判定して展開しながら読み込む
+            candidates = [pgcopy_dir / f"{table}{PGCOPY_SUFFIX}{suffix}" for suffix in COMPRESSION_SUFFIXES.values()]
+            pgcopy_file = next((path for path in candidates if path.exists()), candidates[0])
+            if not pgcopy_file.exists():
+                print(f"  ⚠️ {table}: ファイルが見つかりません -> {pgcopy_file}")
+                all_succeeded = False
+                continue
+
+            try:
+                # テーブル毎に1トランザクションで読み込み、失敗時は元の状態に戻す
+                with engine.begin() as conn:
+                    if truncate:
+                        conn.exec_driver_sql(f"TRUNCATE {table}")
+                    with open_binary_reader(pgcopy_file) as f:
+                        row_count = copy_expert(conn, f"COPY {table} FROM STDIN (FORMAT binary)", f)
+                print(f"  ✅ {table}: {row_count}件")
+            except Exception as e:
+                print(f"  ❌ {table}: {e}")
+                all_succeeded = False
+
+        print("✅ バイナリCOPYからの復元完了" if all_succeeded else "⚠️ 一部のテーブルの復元に失敗しました")
+        return all_succeeded
+
+    except Exception as e:
+        print(f"❌ バイナリCOPY復元エラー: {e}")
+        return False
+    finally:
+        if engine is not None:
+            engine.dispose()
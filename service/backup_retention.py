@@ -0,0 +1,95 @@
+import datetime
+from collections.abc import Callable, Hashable
+
+from utils.backup_catalog import TIMESTAMP_FORMAT, CatalogEntry
+
+
+def parse_timestamp(timestamp: str) -> datetime.datetime | None:
+    """カタログのタイムスタンプを日時に変換。形式が異なる場合はNone"""
+    try:
+        return datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def _keep_newest_per_period(
+    entries: list[tuple[datetime.datetime, CatalogEntry]],
+    count: int,
+    get_period: Callable[[datetime.datetime], Hashable],
+) -> set[int]:
+    """新しい順のバックアップから、直近count個の期間それぞれの最新のものを選ぶ"""
+    kept: set[int] = set()
+    periods: set[Hashable] = set()
+    for backup_time, entry in entries:
+        period = get_period(backup_time)
+        if period in periods:
+            continue
+        if len(periods) >= count:
+            break
+        periods.add(period)
+        kept.add(entry.entry_id)
+    return kept
+
+
+def select_gfs_expired(entries: list[CatalogEntry], daily: int, weekly: int, monthly: int) -> list[CatalogEntry]:
+    """日次・週次・月次のいずれにも残らないバックアップを種類毎に選ぶ
+
+    タイムスタンプを解釈できないバックアップは削除しない。
+    """
+    expired = []
+    for method in sorted({entry.method for entry in entries}):
+        dated = [
+            (backup_time, entry) for entry in entries
+            if entry.method == method and (backup_time := parse_timestamp(entry.timestamp)) is not None
+        ]
+        dated.sort(key=lambda item: item[0], reverse=True)
+        kept = (
+            _keep_newest_per_period(dated, daily, lambda backup_time: backup_time.date())
+            | _keep_newest_per_period(dated, weekly, lambda backup_time: backup_time.isocalendar()[:2])
+            | _keep_newest_per_period(dated, monthly, lambda backup_time: (backup_time.year, backup_time.month))
+        )
+        expired.extend(entry for _, entry in reversed(dated) if entry.entry_id not in kept)
+    return expired
+
+
+def select_over_quota(
+    entries: list[CatalogEntry], max_total_bytes: int, total_bytes: int | None = None
+) -> list[CatalogEntry]:
+    """合計サイズが上限以下になるまで古い順にバックアップを選ぶ（種類毎の最新のバックアップは残す）
+
+    total_bytesを省略した場合は各バックアップのサイズの合計を使用量とする。
+    """
+    if total_bytes is None:
+        total_bytes = sum(entry.size_bytes for entry in entries)
+    if max_total_bytes <= 0 or total_bytes <= max_total_bytes:
+        return []
+
+    newest: dict[str, CatalogEntry] = {}
+    for entry in sorted(entries, key=lambda entry: entry.timestamp):
+        newest[entry.method] = entry
+    newest_ids = {entry.entry_id for entry in newest.values()}
+
+    selected = []
+    for entry in sorted(entries, key=lambda entry: entry.timestamp):
+        if total_bytes <= max_total_bytes:
+            break
+        if entry.entry_id in newest_ids:
+            continue
+        selected.append(entry)
+        total_bytes -= entry.size_bytes
+    return selected
+
+
+def exclude_incremental_chains(entries: list[CatalogEntry], selected: list[CatalogEntry]) -> list[CatalogEntry]:
+    """残す差分バックアップの復元に必要な、起点の全件バックアップから差分までを削除対象から除く"""
+    selected_ids = {entry.entry_id for entry in selected}
+    required_ids: set[int] = set()
+    for increment in entries:
+        if increment.base_timestamp is None or increment.entry_id in selected_ids:
+            continue
+        required_ids.update(
+            entry.entry_id for entry in entries
+            if entry.method == increment.method
+            and increment.base_timestamp <= entry.timestamp <= increment.timestamp
+        )
+    return [entry for entry in selected if entry.entry_id not in required_ids]
@@ -1,35 +1,282 @@
 import logging
+import re
 import subprocess
+import time
+import urllib.error
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+from service.heroku_capture import CAPTURE_METRICS_FILE_NAME, record_capture_metrics, run_capture
+from utils.artifact_writer import get_digest_path, hash_file, read_digest_file, write_digest_file
+from utils.backup_catalog import record_backup
+from utils.chunk_store import CHUNK_STORE_DIR_NAME, ChunkStore
+from utils.compression import get_compression_suffix
+from utils.config_manager import (
+    get_capture_poll_interval,
+    get_capture_timeout,
+    get_dedup_chunk_size,
+    get_dedup_dumps,
+    get_download_chunk_size,
+    get_download_connections,
+    get_download_method,
+    get_download_retries,
+    get_dump_compression,
+    get_max_capture_age,
+)
+from utils.heroku_api import HerokuAPIClient, HerokuAPIError, get_api_client, get_backup_id, parse_backup_number
+from utils.http_download import download_segmented, download_with_resume
+
 logger = logging.getLogger(__name__)
 
+# heroku pg:backups の一覧の行（例: "a123  2024-01-15 03:00:12 +0000  Completed 2024-01-15 03:01:45 +0000  ..."）
+BACKUP_LINE_PATTERN = re.compile(
+    r'^\s*(?P<id>[a-z]\d+)\s+(?P<created_at>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} [+-]\d{4})\s+(?P<status>\S+)'
+)
+COMPLETED_STATUSES = frozenset({'Completed', 'Finished'})
+
+
+class HerokuCapture:
+    """heroku pg:backupsの一覧に表示されるバックアップ"""
+
+    def __init__(self, backup_id: str, created_at: datetime, status: str) -> None:
+        self.backup_id = backup_id
+        self.created_at = created_at
+        self.status = status
+
+    @property
+    def completed(self) -> bool:
+        return self.status in COMPLETED_STATUSES
+
+
+def parse_backup_list(output: str) -> list[HerokuCapture]:
+    """heroku pg:backupsの出力から「Backups」欄のバックアップを取得"""
+    captures = []
+    in_backups = False
+    for line in output.splitlines():
+        if line.startswith('==='):
+            # リストアやコピーの欄は対象外
+            in_backups = 'Backups' in line
+            continue
+        if not in_backups:
+            continue
+        match = BACKUP_LINE_PATTERN.match(line)
+        if match:
+            created_at = datetime.strptime(match.group('created_at'), '%Y-%m-%d %H:%M:%S %z')
+            captures.append(HerokuCapture(match.group('id'), created_at, match.group('status')))
+    return captures
+
+
+def capture_from_transfer(transfer: dict) -> HerokuCapture:
+    """Heroku APIの転送情報をpg:backupsの一覧と同じ形式に変換"""
+    if transfer.get('finished_at'):
+        status = 'Completed' if transfer.get('succeeded') else 'Failed'
+    else:
+        status = 'Running'
+    created_at = datetime.strptime(transfer['created_at'], '%Y-%m-%d %H:%M:%S %z')
+    return HerokuCapture(get_backup_id(transfer), created_at, status)
+
+
+def list_captures(app_name: str, client: HerokuAPIClient | None = None) -> list[HerokuCapture]:
+    """Herokuバックアップの一覧を取得（clientを指定した場合はHeroku APIを使う）"""
+    if client is not None:
+        return [capture_from_transfer(transfer) for transfer in client.list_backups(app_name)]
+
+    result = subprocess.run([
+        "heroku", "pg:backups",
+        "--app", app_name
+    ], shell=True, check=True, capture_output=True, text=True)
+    return parse_backup_list(result.stdout)
+
+
+def find_recent_capture(
+    app_name: str, max_age_hours: float, client: HerokuAPIClient | None = None
+) -> HerokuCapture | None:
+    """許容時間内に作成された完了済みのバックアップのうち最新のものを取得"""
+    now = datetime.now(timezone.utc)
+    recent = [
+        capture for capture in list_captures(app_name, client)
+        if capture.completed and now - capture.created_at <= timedelta(hours=max_age_hours)
+    ]
+    return max(recent, key=lambda capture: capture.created_at, default=None)
+
+
+def select_capture(app_name: str, client: HerokuAPIClient | None = None) -> str | None:
+    """再利用するバックアップのIDを返す。新規に作成する場合はNone"""
+    max_age_hours = get_max_capture_age()
+    if max_age_hours <= 0:
+        return None
+
+    try:
+        capture = find_recent_capture(app_name, max_age_hours, client)
+    except (subprocess.CalledProcessError, HerokuAPIError, OSError) as e:
+        logger.warning(f"Herokuバックアップの一覧を取得できないため新規に作成します: {e}")
+        return None
+
+    if capture is None:
+        logger.info(f"{max_age_hours:g}時間以内に完了したHerokuバックアップがないため新規に作成します")
+        return None
+
+    age_hours = (datetime.now(timezone.utc) - capture.created_at).total_seconds() / 3600
+    logger.info(
+        f"既存のHerokuバックアップ {capture.backup_id} を再利用します"
+        f"（作成: {capture.created_at:%Y-%m-%d %H:%M:%S %z}, 経過: {age_hours:.1f}時間 / 許容: {max_age_hours:g}時間）"
+    )
+    return capture.backup_id
+
+
+def get_backup_url(app_name: str, backup_id: str | None = None, client: HerokuAPIClient | None = None) -> str:
+    """Herokuバックアップをダウンロードする署名付きURLを取得（backup_id省略時は最新）"""
+    if client is not None:
+        if backup_id is None:
+            completed = [capture for capture in list_captures(app_name, client) if capture.completed]
+            if not completed:
+                raise ValueError("ダウンロードできるHerokuバックアップがありません")
+            backup_id = max(completed, key=lambda capture: capture.created_at).backup_id
+        return client.get_backup_url(app_name, parse_backup_number(backup_id))
+
+    result = subprocess.run([
+        "heroku", "pg:backups:url",
+        *([backup_id] if backup_id else []),
+        "--app", app_name
+    ], shell=True, check=True, capture_output=True, text=True)
+
+    url = result.stdout.strip()
+    if not url.startswith(("https://", "http://")):
+        raise ValueError(f"バックアップのURLを取得できませんでした: {result.stderr.strip()}")
+    return url
+
+
+def download_backup(
+    app_name: str, backup_file: Path, backup_id: str | None = None, client: HerokuAPIClient | None = None
+) -> bool:
+    """署名付きURLからバックアップを直接ダウンロードし、SHA-256をファイルの隣に記録"""
+    url = get_backup_url(app_name, backup_id, client)
+    connections = get_download_connections()
+    compression = get_dump_compression()
+    artifact = backup_file.with_name(f"{backup_file.name}{get_compression_suffix(compression)}")
+
+    # 署名付きURLは認証情報を含むためログに出力しない
+    if connections > 1:
+        result = download_segmented(
+            url, artifact, connections,
+            chunk_size=get_download_chunk_size(),
+            max_retries=get_download_retries(),
+            compression=compression
+        )
+    else:
+        result = download_with_resume(
+            url, artifact,
+            chunk_size=get_download_chunk_size(),
+            max_retries=get_download_retries(),
+            compression=compression
+        )
+
+    # ハッシュは圧縮前のダンプの内容に対する値のため、ダンプのファイル名で記録する
+    digest_file = write_digest_file(backup_file, result.sha256)
+    logger.info(f"Herokuバックアップ完了: {artifact} ({result.size:,}バイト)")
+    logger.info(f"SHA-256: {result.sha256} -> {digest_file}")
+    return True
+
+
+def download_backup_with_cli(app_name: str, backup_file: Path, backup_id: str | None = None) -> bool:
+    """heroku pg:backups:downloadでバックアップをダウンロード"""
+    result = subprocess.run([
+        "heroku", "pg:backups:download",
+        *([backup_id] if backup_id else []),
+        "--app", app_name,
+        "--output", str(backup_file)
+    ], shell=True, capture_output=True, text=True)
+
+    if result.returncode == 0:
+        logger.info(f"Herokuバックアップ完了: {backup_file}")
+        if backup_file.exists():
+            # CLIが書き込んだファイルは読み直してハッシュを計算する
+            write_digest_file(backup_file, hash_file(backup_file))
+        return True
+    else:
+        logger.error(f"Herokuバックアップ失敗: {result.stderr}")
+        return False
+
+
+def record_dump(backup_dir: Path, timestamp: str, backup_file: Path, duration: float) -> None:
+    """ダウンロードしたダンプ（圧縮した場合は圧縮後のファイル）をカタログに登録"""
+    compressed = backup_file.with_name(f"{backup_file.name}{get_compression_suffix(get_dump_compression())}")
+    artifact = next((path for path in (compressed, backup_file) if path.exists()), None)
+    if artifact is None:
+        logger.warning(f"ダウンロードしたダンプが見つからないためカタログに登録しません: {backup_file}")
+        return
+    record_backup(backup_dir, timestamp, 'heroku_dump', artifact, duration, read_digest_file(backup_file))
+
+
+def store_dump(backup_dir: Path, timestamp: str, backup_file: Path, duration: float) -> None:
+    """ダンプをチャンクストアに重複排除して格納し、元のダンプの代わりにマニフェストをカタログに登録"""
+    if not backup_file.exists():
+        # 圧縮したダンプは内容が少し変わるだけで以降のバイト列が全て変わり、重複排除できない
+        logger.warning(f"チャンクストアは圧縮していないダンプが対象のため格納しません: {backup_file.name}")
+        record_dump(backup_dir, timestamp, backup_file, duration)
+        return
+
+    store = ChunkStore(backup_dir / CHUNK_STORE_DIR_NAME, get_dedup_chunk_size())
+    try:
+        result = store.add_file(backup_file)
+        stats = store.get_stats()
+    except (OSError, ValueError) as e:
+        logger.error(f"チャンクストアへの格納エラー（ダンプはそのまま残します）: {e}", exc_info=True)
+        record_dump(backup_dir, timestamp, backup_file, duration)
+        return
+
+    backup_file.unlink()
+    get_digest_path(backup_file).unlink(missing_ok=True)
+    logger.info(
+        f"チャンクストアに格納: {backup_file.name}（{result.chunk_count}チャンク中{result.new_chunk_count}チャンクが新規, "
+        f"追加{result.new_bytes / 1024 / 1024:,.1f}MB / {result.size_bytes / 1024 / 1024:,.1f}MB）"
+    )
+    logger.info(
+        f"チャンクストア全体: {stats.manifest_count}件 {stats.logical_bytes / 1024 / 1024:,.1f}MB を"
+        f" {stats.stored_bytes / 1024 / 1024:,.1f}MB で保存（重複排除率: {stats.dedup_ratio:.1f}倍）"
+    )
+    # 他のダンプと共有するチャンクは数えず、このダンプで増えたチャンクの合計サイズを登録する
+    record_backup(
+        backup_dir, timestamp, 'heroku_dump_chunked', result.manifest_path, duration, result.sha256,
+        size_bytes=result.new_bytes,
+    )
+
 
 def backup_with_heroku_cli(backup_dir: Path, timestamp: str, app_name: str) -> bool:
-    """Heroku CLIを使用してバックアップを作成"""
+    """Heroku CLIを使用してバックアップを作成（APIトークンがある場合はHeroku APIを使う）"""
+    client = get_api_client()
+    started_at = time.monotonic()
     try:
         backup_file = backup_dir / f"heroku_backup_{timestamp}.dump"
 
-        logger.info("Herokuバックアップを作成中...")
-        subprocess.run([
-            "heroku", "pg:backups:capture",
-            "--app", app_name
-        ], shell=True, check=True)
+        backup_id = select_capture(app_name, client)
+        if backup_id is None:
+            logger.info("Herokuバックアップを作成中...")
+            capture = run_capture(app_name, get_capture_poll_interval(), get_capture_timeout(), client)
+            record_capture_metrics(backup_dir / CAPTURE_METRICS_FILE_NAME, timestamp, capture)
+            backup_id = capture.backup_id
 
         logger.info("バックアップをダウンロード中...")
-        result = subprocess.run([
-            "heroku", "pg:backups:download",
-            "--app", app_name,
-            "--output", str(backup_file)
-        ], shell=True, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            logger.info(f"Herokuバックアップ完了: {backup_file}")
-            return True
+        if get_download_method() == 'http':
+            success = download_backup(app_name, backup_file, backup_id, client)
         else:
-            logger.error(f"Herokuバックアップ失敗: {result.stderr}")
-            return False
+            success = download_backup_with_cli(app_name, backup_file, backup_id)
+
+        if success and get_dedup_dumps():
+            store_dump(backup_dir, timestamp, backup_file, time.monotonic() - started_at)
+        elif success:
+            record_dump(backup_dir, timestamp, backup_file, time.monotonic() - started_at)
+        return success
 
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, HerokuAPIError) as e:
         logger.error(f"Herokuバックアップエラー: {e}", exc_info=True)
         return False
+    except TimeoutError as e:
+        logger.error(f"Herokuバックアップエラー: {e}")
+        return False
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        logger.error(f"Herokuバックアップのダウンロードエラー: {e}", exc_info=True)
+        return False
+    finally:
+        if client is not None:
+            client.close()
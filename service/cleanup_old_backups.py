@@ -4,41 +4,138 @@ from pathlib import Path
 
 import pytz
 
-from utils.config_manager import load_config
+from service.backup_retention import exclude_incremental_chains, select_gfs_expired, select_over_quota
+from utils.artifact_writer import get_digest_path
+from utils.backup_catalog import TIMESTAMP_FORMAT, BackupCatalog, CatalogEntry
+from utils.chunk_store import CHUNK_STORE_DIR_NAME, ChunkStore
+from utils.cleanup_plan import DeletionPlan
+from utils.config_manager import (
+    get_cleanup_workers,
+    get_keep_daily,
+    get_keep_monthly,
+    get_keep_weekly,
+    get_max_total_bytes,
+    load_config,
+)
 
 JST = pytz.timezone('Asia/Tokyo')
 logger = logging.getLogger(__name__)
 
+# テーブル毎のファイルをまとめたディレクトリとして保存する種類
+DIRECTORY_METHODS = frozenset({'json_chunks', 'ndjson', 'pgcopy', 'parquet', 'csv'})
 
-def cleanup_old_backups(backup_dir: Path, days: int | None = None) -> None:
-    """古いバックアップファイルを削除"""
+
+def _get_extra_paths(entry: CatalogEntry) -> list[Path]:
+    """バックアップと一緒に削除する関連ファイル（ダンプのハッシュ）"""
+    if entry.method != 'heroku_dump':
+        return []
+    # ハッシュは圧縮前のダンプのファイル名で記録している
+    dump_name = entry.path.name[:entry.path.name.find('.dump') + len('.dump')]
+    return [get_digest_path(entry.path.with_name(dump_name))]
+
+
+def _collect_chunk_garbage(backup_dir: Path) -> None:
+    """削除したマニフェストだけが参照していたチャンクをチャンクストアから削除"""
+    removed, freed_bytes = ChunkStore(backup_dir / CHUNK_STORE_DIR_NAME).collect_garbage()
+    if removed:
+        logger.info(f"チャンクストアから不要なチャンクを{removed}個削除しました（{freed_bytes / 1024 / 1024:,.1f}MB）")
+
+
+def _get_used_bytes(backup_dir: Path, remaining: list[CatalogEntry], expired: list[CatalogEntry]) -> int:
+    """合計サイズの上限の判定に使う使用量
+
+    チャンクストアのダンプは、カタログに登録した追加分ではなくチャンクストア全体の実際の使用量で数え、
+    削除予定のダンプが追加したチャンクの分だけ差し引く。
+    """
+    used_bytes = sum(entry.size_bytes for entry in remaining if entry.method != 'heroku_dump_chunked')
+    if not any(entry.method == 'heroku_dump_chunked' for entry in remaining):
+        return used_bytes
+    stored_bytes = ChunkStore(backup_dir / CHUNK_STORE_DIR_NAME).get_stats().stored_bytes
+    expired_bytes = sum(entry.size_bytes for entry in expired if entry.method == 'heroku_dump_chunked')
+    return used_bytes + max(stored_bytes - expired_bytes, 0)
+
+
+def cleanup_old_backups(backup_dir: Path, days: int | None = None, dry_run: bool = False) -> None:
+    """古いバックアップを削除（削除対象はバックアップカタログから検索）
+
+    日次・週次・月次の保持数を設定した場合は世代管理（GFS）で、それ以外はcleanup_daysで判定する。
+    合計サイズの上限を設定した場合は、上限以下になるまで古いバックアップから削除する。
+    dry_runの場合は削除対象と解放される容量をログに出力するだけで削除しない。
+    """
     if days is None:
         config = load_config()
         days = config.getint('Backup', 'cleanup_days', fallback=30)
 
-    logger.info(f"古いバックアップファイルの削除を開始します（保持期間: {days}日）")
+    keep_daily, keep_weekly, keep_monthly = get_keep_daily(), get_keep_weekly(), get_keep_monthly()
+    max_total_bytes = get_max_total_bytes()
+    use_gfs = keep_daily > 0 or keep_weekly > 0 or keep_monthly > 0
+
+    if use_gfs:
+        logger.info(
+            f"古いバックアップファイルの削除を開始します"
+            f"（日次: {keep_daily}, 週次: {keep_weekly}, 月次: {keep_monthly}）"
+        )
+    else:
+        logger.info(f"古いバックアップファイルの削除を開始します（保持期間: {days}日）")
 
     try:
-        current_time = datetime.datetime.now(JST)
-        cutoff_time = current_time - datetime.timedelta(days=days)
-
-        deleted_count = 0
-        for backup_file in backup_dir.glob("*.dump"):
-            file_ctime = datetime.datetime.fromtimestamp(
-                backup_file.stat().st_ctime,
-                tz=JST
-            )
+        with BackupCatalog(backup_dir) as catalog:
+            entries = catalog.list_backups()
+            if use_gfs:
+                expired = select_gfs_expired(entries, keep_daily, keep_weekly, keep_monthly)
+                reason = "世代管理の対象外"
+            else:
+                current_time = datetime.datetime.now(JST)
+                cutoff = (current_time - datetime.timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+                expired = [entry for entry in entries if entry.timestamp < cutoff]
+                reason = f"保持期間（{days}日）超過"
+
+            expired_ids = {entry.entry_id for entry in expired}
+            remaining = [entry for entry in entries if entry.entry_id not in expired_ids]
+            over_quota = select_over_quota(
+                remaining, max_total_bytes, _get_used_bytes(backup_dir, remaining, expired)
+            ) if max_total_bytes > 0 else []
+            deletable_ids = {entry.entry_id for entry in exclude_incremental_chains(entries, expired + over_quota)}
+            protected_count = len(expired) + len(over_quota) - len(deletable_ids)
+            if protected_count:
+                logger.info(f"差分バックアップの復元に必要な{protected_count}個のバックアップを残します")
+            expired = [entry for entry in expired if entry.entry_id in deletable_ids]
+            over_quota = [entry for entry in over_quota if entry.entry_id in deletable_ids]
+            if over_quota:
+                logger.info(
+                    f"合計サイズの上限（{max_total_bytes / 1024 ** 3:,.1f}GB）を超えるため"
+                    f"{len(over_quota)}個のバックアップを追加で削除します"
+                )
 
-            if file_ctime < cutoff_time:
-                try:
-                    backup_file.unlink()
-                    logger.info(f"古いバックアップファイルを削除: {backup_file.name}")
-                    deleted_count += 1
-                except OSError as e:
-                    logger.error(f"ファイル削除エラー {backup_file.name}: {e}")
+            plan = DeletionPlan()
+            planned_entries: dict[Path, CatalogEntry] = {}
+            reasons = [(entry, reason) for entry in expired] + [(entry, "合計サイズの上限超過") for entry in over_quota]
+            for entry, entry_reason in reasons:
+                plan.add(
+                    entry.path, entry.size_bytes, entry.method in DIRECTORY_METHODS, entry_reason,
+                    _get_extra_paths(entry)
+                )
+                planned_entries[entry.path] = entry
 
-        if deleted_count > 0:
-            logger.info(f"{deleted_count}個の古いバックアップファイルを削除しました")
+            if dry_run:
+                plan.log_report("削除対象のバックアップ")
+                return
+
+            deleted, failed = plan.execute(get_cleanup_workers())
+            for item in deleted:
+                catalog.mark_deleted(planned_entries[item.path].entry_id)
+                logger.info(f"古いバックアップファイルを削除: {item.path.name}")
+            for item, error in failed:
+                logger.error(f"ファイル削除エラー {item.path.name}: {error}")
+
+        if any(planned_entries[item.path].method == 'heroku_dump_chunked' for item in deleted):
+            _collect_chunk_garbage(backup_dir)
+
+        if deleted:
+            freed_bytes = sum(item.size_bytes for item in deleted)
+            logger.info(
+                f"{len(deleted)}個の古いバックアップファイルを削除しました（{freed_bytes / 1024 / 1024:,.1f}MB）"
+            )
         else:
             logger.info("削除対象の古いバックアップファイルはありませんでした")
 
@@ -0,0 +1,233 @@
+import codecs
+import csv
+import logging
+import re
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import IO
+
+from utils.heroku_api import HerokuAPIClient, HerokuAPIError, get_backup_id
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_METRICS_FILE_NAME = "capture_metrics.csv"
+METRICS_COLUMNS = ['timestamp', 'backup_id', 'duration_seconds', 'size_bytes', 'mb_per_second']
+# capture の出力（例: "Backing up DATABASE to b101... done"）からバックアップIDを取得する。
+# 読み込み途中の"to b10"を誤って取得しないよう、IDの後ろの文字まで受信してから判定する
+BACKUP_ID_PATTERN = re.compile(r'\bto ([a-z]\d+)(?=\W)')
+CAPTURE_READ_SIZE = 1024
+SIZE_PATTERN = re.compile(r'^([\d.]+)\s*([kKMGT]?)B')
+SIZE_UNITS = {'': 1, 'k': 1024, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+INFO_FIELD_PATTERN = re.compile(r'^([A-Za-z][A-Za-z ]*?):\s+(.*)$')
+
+
+class CaptureResult:
+    """キャプチャしたバックアップのID・所要時間・サイズ"""
+
+    def __init__(self, backup_id: str | None, duration: float, size: int) -> None:
+        self.backup_id = backup_id
+        self.duration = duration
+        self.size = size
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.size / 1024 / 1024 / self.duration if self.duration > 0 else 0.0
+
+
+def parse_size(text: str) -> int | None:
+    """"12.3MB"のようなサイズ表記をバイト数に変換"""
+    match = SIZE_PATTERN.match(text.strip())
+    if match is None:
+        return None
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_backup_info(output: str) -> dict[str, str]:
+    """heroku pg:backups:infoの出力から項目と値を取得（ログ欄は対象外）"""
+    fields = {}
+    for line in output.splitlines():
+        if line.startswith('=== Backup Logs'):
+            break
+        match = INFO_FIELD_PATTERN.match(line)
+        if match:
+            fields[match.group(1)] = match.group(2).strip()
+    return fields
+
+
+def get_backup_progress(app_name: str, backup_id: str) -> tuple[str, int | None]:
+    """バックアップの状態と、その時点のバックアップサイズを取得"""
+    result = subprocess.run([
+        "heroku", "pg:backups:info", backup_id,
+        "--app", app_name
+    ], shell=True, check=True, capture_output=True, text=True)
+
+    fields = parse_backup_info(result.stdout)
+    size_text = fields.get('Backup Size')
+    return fields.get('Status', ''), parse_size(size_text) if size_text else None
+
+
+class CaptureOutputReader:
+    """captureの出力を別スレッドで読み込み、バックアップIDを取得する"""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.backup_id: str | None = None
+        self.output = ""
+        self._thread = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        self._thread.start()
+
+    def _read(self, stream: IO[bytes]) -> None:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            # "Backing up DATABASE to b101..."は完了まで改行されないため、行単位ではなく受信した分だけ読み込む
+            while chunk := stream.read(CAPTURE_READ_SIZE):
+                self.output += decoder.decode(chunk)
+                if self.backup_id is None and (match := BACKUP_ID_PATTERN.search(self.output)):
+                    self.backup_id = match.group(1)
+        except (OSError, ValueError):
+            logger.debug("キャプチャの出力の読み込みを終了しました")
+
+    def join(self) -> None:
+        self._thread.join(timeout=5)
+
+
+def cancel_capture(app_name: str, backup_id: str | None) -> None:
+    """実行中のキャプチャを取り消す"""
+    subprocess.run([
+        "heroku", "pg:backups:cancel",
+        *([backup_id] if backup_id else []),
+        "--app", app_name
+    ], shell=True, capture_output=True, text=True)
+
+
+def log_capture_progress(
+    backup_id: str, status: str, size: int, previous_size: int, elapsed: float, interval: float
+) -> None:
+    """バックアップサイズと直前の確認からの速度をログに出力"""
+    rate = (size - previous_size) / 1024 / 1024 / interval if interval > 0 else 0.0
+    logger.info(
+        f"Herokuバックアップ {backup_id} {status}: {size / 1024 / 1024:,.1f}MB"
+        f"（{rate:.2f}MB/s, 経過 {elapsed:.0f}秒）"
+    )
+
+
+def log_capture_result(result: CaptureResult) -> None:
+    logger.info(
+        f"Herokuバックアップ作成完了: {result.backup_id} "
+        f"({result.size / 1024 / 1024:,.1f}MB, {result.duration:.1f}秒, {result.mb_per_second:.2f}MB/s)"
+    )
+
+
+def run_capture_with_api(
+    client: HerokuAPIClient, app_name: str, poll_interval: float, timeout: float
+) -> CaptureResult:
+    """Heroku APIでバックアップを作成し、完了まで処理済みのバイト数をログに出力"""
+    started_at = time.monotonic()
+    transfer = client.capture(app_name)
+    backup_id = get_backup_id(transfer)
+    logger.info(f"Herokuバックアップ {backup_id} を開始しました")
+
+    size, last_size, last_polled_at = 0, 0, started_at
+    while not transfer.get('finished_at'):
+        time.sleep(poll_interval)
+        now = time.monotonic()
+        elapsed = now - started_at
+        if elapsed > timeout:
+            logger.error(f"Herokuバックアップが{timeout:.0f}秒以内に完了しないため取り消します: {backup_id}")
+            client.cancel_backup(app_name, transfer['uuid'])
+            raise TimeoutError(f"Herokuバックアップが{timeout:.0f}秒以内に完了しませんでした")
+
+        transfer = client.get_backup(app_name, transfer['num'])
+        size = transfer.get('processed_bytes') or 0
+        if not transfer.get('finished_at'):
+            log_capture_progress(backup_id, "Running", size, last_size, elapsed, now - last_polled_at)
+            last_size, last_polled_at = size, now
+
+    if not transfer.get('succeeded'):
+        raise HerokuAPIError(f"Herokuバックアップ {backup_id} が失敗しました")
+
+    result = CaptureResult(backup_id, time.monotonic() - started_at, size)
+    log_capture_result(result)
+    return result
+
+
+def run_capture(
+    app_name: str, poll_interval: float, timeout: float, client: HerokuAPIClient | None = None
+) -> CaptureResult:
+    """heroku pg:backups:captureを非同期で実行し、完了までpg:backups:infoで進捗をログに出力
+
+    clientを指定した場合はHeroku APIを使う。
+    timeout秒以内に完了しない場合はキャプチャを取り消してTimeoutErrorを送出する。
+    """
+    if client is not None:
+        return run_capture_with_api(client, app_name, poll_interval, timeout)
+
+    command = ["heroku", "pg:backups:capture", "--app", app_name]
+    started_at = time.monotonic()
+    process = subprocess.Popen(
+        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0
+    )
+    # stdout=PIPEを指定しているため、出力のストリームは必ずある
+    assert process.stdout is not None
+    reader = CaptureOutputReader(process.stdout)
+
+    size = 0
+    last_size, last_polled_at = 0, started_at
+    while True:
+        try:
+            process.wait(timeout=poll_interval)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+
+        now = time.monotonic()
+        elapsed = now - started_at
+        if elapsed > timeout:
+            logger.error(f"Herokuバックアップが{timeout:.0f}秒以内に完了しないため取り消します: {reader.backup_id}")
+            cancel_capture(app_name, reader.backup_id)
+            process.kill()
+            raise TimeoutError(f"Herokuバックアップが{timeout:.0f}秒以内に完了しませんでした")
+
+        if reader.backup_id is None:
+            logger.info(f"Herokuバックアップを開始中...（経過 {elapsed:.0f}秒）")
+            continue
+
+        try:
+            status, current_size = get_backup_progress(app_name, reader.backup_id)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Herokuバックアップの進捗を取得できませんでした: {e}")
+            continue
+
+        if current_size is not None:
+            size = current_size
+        log_capture_progress(reader.backup_id, status, size, last_size, elapsed, now - last_polled_at)
+        last_size, last_polled_at = size, now
+
+    reader.join()
+    duration = time.monotonic() - started_at
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, output=reader.output)
+
+    if reader.backup_id is not None:
+        try:
+            _, final_size = get_backup_progress(app_name, reader.backup_id)
+            size = final_size if final_size is not None else size
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Herokuバックアップのサイズを取得できませんでした: {e}")
+
+    result = CaptureResult(reader.backup_id, duration, size)
+    log_capture_result(result)
+    return result
+
+
+def record_capture_metrics(metrics_file: Path, timestamp: str, result: CaptureResult) -> None:
+    """キャプチャの所要時間・サイズ・速度をCSVに追記"""
+    write_header = not metrics_file.exists()
+    with open(metrics_file, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(METRICS_COLUMNS)
+        writer.writerow([
+            timestamp, result.backup_id or '', f"{result.duration:.1f}", result.size, f"{result.mb_per_second:.3f}"
+        ])
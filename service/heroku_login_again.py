@@ -1,16 +1,71 @@
+import codecs
 import logging
 import os
+import queue
+import re
 import subprocess
 import threading
 import time
+from collections.abc import Callable
+from typing import IO
 
 from utils.config_manager import load_config
+from utils.heroku_api import HerokuAPIError, get_api_client, get_auth_cache
 
 logger = logging.getLogger(__name__)
 
+LOGIN_TIMEOUT_SECONDS = 120
+# ログイン完了の表示後にプロセスの終了を待つ秒数
+LOGIN_EXIT_TIMEOUT_SECONDS = 10
+LOGIN_READ_SIZE = 1024
+LOGIN_OUTPUT_TAIL = 4096
+# 例: "heroku: Press any key to open up the browser to login or q to exit:"
+BROWSER_PROMPT_PATTERN = re.compile(r'Press any key to open up the browser', re.IGNORECASE)
+# 例: "Logged in as user@example.com"
+LOGIN_SUCCESS_PATTERN = re.compile(r'Logged in as (\S+)')
+
+
+def check_heroku_login_with_api() -> str | bool | None:
+    """Heroku APIでログイン状態をチェックし、ログイン中のアカウントを返す。APIで確認できない場合はNone"""
+    client = get_api_client()
+    if client is None:
+        return None
+
+    with client:
+        try:
+            email = client.whoami()
+        except HerokuAPIError as e:
+            if e.status == 401:
+                logger.warning("Herokuのログイン状態が切れています")
+                return False
+            logger.warning(f"Heroku APIでログイン状態を確認できないためCLIで確認します: {e}")
+            return None
+        except OSError as e:
+            logger.warning(f"Heroku APIに接続できないためCLIで確認します: {e}")
+            return None
+
+    logger.info(f"Herokuのログイン状態を確認しました: {email}")
+    return email
+
 
 def check_heroku_login() -> bool:
-    """Heroku CLIのログイン状態をチェック"""
+    """Heroku CLIのログイン状態をチェック
+
+    前回確認したログイン状態が有効な場合はキャッシュを使い、APIトークンがある場合はHeroku APIで確認する。
+    """
+    cache = get_auth_cache()
+    identity = cache.get_identity()
+    if identity is not None:
+        logger.info(f"Herokuのログイン状態をキャッシュで確認しました: {identity}")
+        return True
+
+    identity = check_heroku_login_with_api()
+    if isinstance(identity, str):
+        cache.save(identity)
+        return True
+    if identity is False:
+        return False
+
     try:
         result = subprocess.run(
             ["heroku", "auth:whoami"],
@@ -22,8 +77,10 @@ def check_heroku_login() -> bool:
         is_logged_in = result.returncode == 0
         if is_logged_in:
             logger.info("Heroku CLIのログイン状態を確認しました")
+            cache.save(str(result.stdout).strip())
         else:
             logger.warning("Heroku CLIのログイン状態が切れています")
+            cache.invalidate()
         return is_logged_in
     except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
         logger.error(f"Herokuログイン状態のチェック中にエラー: {e}")
@@ -32,7 +89,6 @@ def check_heroku_login() -> bool:
 
 def open_folder_async(folder_path: str) -> None:
     """フォルダを非同期で開く"""
-    time.sleep(2)
     try:
         if os.path.exists(folder_path):
             subprocess.run(["explorer", folder_path], shell=True)
@@ -49,32 +105,98 @@ def open_folder_in_background(executable_path: str) -> None:
     folder_thread.start()
 
 
-def execute_heroku_login() -> bool:
-    """Heroku CLIのログインコマンドを実行"""
+class LoginOutputReader:
+    """heroku loginの出力を別スレッドで読み込み、受信した順にキューに入れる（終了時はNone）"""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.queue: queue.Queue[str | None] = queue.Queue()
+        thread = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        thread.start()
+
+    def _read(self, stream: IO[bytes]) -> None:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            # プロンプトは改行なしで出力されるため、行単位ではなく受信した分だけ読み込む
+            while chunk := stream.read(LOGIN_READ_SIZE):
+                self.queue.put(decoder.decode(chunk))
+        except (OSError, ValueError):
+            logger.debug("ログインプロセスの出力の読み込みを終了しました")
+        finally:
+            self.queue.put(None)
+
+
+def send_enter(process: subprocess.Popen) -> None:
+    """ブラウザを開くためにEnterキーを送信"""
+    try:
+        if process.stdin is not None:
+            process.stdin.write(b"\n")
+            process.stdin.flush()
+    except (BrokenPipeError, OSError):
+        logger.debug("stdinへの書き込みに失敗（プロセス終了済みの可能性）")
+
+
+def wait_for_exit(process: subprocess.Popen) -> None:
+    """ログイン完了後にプロセスの終了を待ち、終了しない場合は終了させて回収する"""
+    try:
+        process.wait(timeout=LOGIN_EXIT_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        logger.warning("ログインプロセスが終了しないため終了させます")
+        process.terminate()
+        try:
+            process.wait(timeout=LOGIN_EXIT_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def execute_heroku_login(on_browser_prompt: Callable[[], None] | None = None) -> bool:
+    """Heroku CLIのログインコマンドを実行
+
+    出力を受信した順に確認し、ブラウザを開くプロンプトが表示されたらEnterキーを送信して
+    on_browser_promptを呼び出す。ログインの完了が表示された時点で戻る。
+    """
     logger.info("Heroku CLIでログインを開始します")
+    started_at = time.perf_counter()
 
-    process: subprocess.Popen[str] | None = None
+    process: subprocess.Popen[bytes] | None = None
     try:
         process = subprocess.Popen(
             ["heroku", "login"],
             shell=True,
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
+            stderr=subprocess.STDOUT,
+            bufsize=0
         )
-
-        time.sleep(1)
-        try:
-            if process.stdin is not None:
-                process.stdin.write("\n")
-                process.stdin.flush()
-        except (BrokenPipeError, OSError):
-            logger.debug("stdinへの書き込みに失敗（プロセス終了済みの可能性）")
-
-        process.communicate(timeout=120)
-
-        if process.returncode == 0:
+        # stdout=PIPEを指定しているため、出力のストリームは必ずある
+        assert process.stdout is not None
+        reader = LoginOutputReader(process.stdout)
+
+        output = ""
+        prompted = False
+        deadline = started_at + LOGIN_TIMEOUT_SECONDS
+        while True:
+            try:
+                chunk = reader.queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(process.args, LOGIN_TIMEOUT_SECONDS)
+            if chunk is None:
+                break
+
+            output = (output + chunk)[-LOGIN_OUTPUT_TAIL:]
+            if not prompted and BROWSER_PROMPT_PATTERN.search(output):
+                prompted = True
+                logger.info("ブラウザでHerokuにログインしてください")
+                send_enter(process)
+                if on_browser_prompt is not None:
+                    on_browser_prompt()
+
+            if match := LOGIN_SUCCESS_PATTERN.search(output):
+                logger.info(f"ログインプロセスが完了しました: {match.group(1)}")
+                wait_for_exit(process)
+                return True
+
+        if process.wait(timeout=max(deadline - time.perf_counter(), 0)) == 0:
             logger.info("ログインプロセスが完了しました")
             return True
         else:
@@ -89,6 +211,8 @@ def execute_heroku_login() -> bool:
     except Exception as e:
         logger.error(f"ログイン処理中にエラーが発生しました: {e}", exc_info=True)
         return False
+    finally:
+        logger.info(f"Herokuへの再ログインにかかった時間: {time.perf_counter() - started_at:.1f}秒")
 
 
 def prompt_heroku_login() -> None:
@@ -98,8 +222,8 @@ def prompt_heroku_login() -> None:
     config = load_config()
     executable_file_path = config["Paths"]["executable_file_path"]
 
-    open_folder_in_background(executable_file_path)
-    execute_heroku_login()
+    # ブラウザのログイン画面が開くタイミングでフォルダを開く
+    execute_heroku_login(on_browser_prompt=lambda: open_folder_in_background(executable_file_path))
 
 
 def ensure_heroku_login() -> bool:
@@ -1,23 +1,38 @@
 import datetime
 import logging
 import os
+from collections.abc import Iterator
+from contextlib import contextmanager
 from pathlib import Path
 from urllib.parse import urlparse
 
 import pytz
 from dotenv import load_dotenv
+from sqlalchemy import Engine, create_engine
 
 from service.backup_data_as_csv import backup_data_as_csv
 from service.backup_data_as_json import backup_data_as_json
+from service.backup_data_as_json_chunks import backup_data_as_json_chunks
+from service.backup_data_as_ndjson import backup_data_as_ndjson
+from service.backup_data_as_parquet import backup_data_as_parquet
+from service.backup_data_as_pgcopy import backup_data_as_pgcopy
 from service.backup_with_heroku_cli import backup_with_heroku_cli
-from utils.config_manager import load_config
+from service.table_export import get_export_pool_size
+from utils.config_manager import (
+    get_consistent_snapshot,
+    get_export_workers,
+    get_pool_pre_ping,
+    get_pool_size,
+    load_config,
+)
+from utils.database_helper import ConnectionStats, add_ssl_mode, exported_snapshot
 
 JST = pytz.timezone('Asia/Tokyo')
 logger = logging.getLogger(__name__)
 
 
 class HerokuPostgreSQLBackup:
-    def __init__(self) -> None:
+    def __init__(self, export_workers: int | None = None) -> None:
         load_dotenv()
         config = load_config()
         backup_dir = config.get('Paths', 'backup_path')
@@ -32,21 +47,93 @@ class HerokuPostgreSQLBackup:
             logger.info("DATABASE_URLをpostgresql://形式に変換しました")
 
         self.parsed_url = urlparse(self.database_url)
+        self.export_workers = export_workers
+        self.connection_stats = ConnectionStats()
+        self._engine: Engine | None = None
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
         self.timestamp = datetime.datetime.now(JST).strftime("%Y%m%d_%H%M%S")
         logger.info(f"HerokuPostgreSQLBackupを初期化しました - タイムスタンプ: {self.timestamp}")
         logger.info(f"バックアップディレクトリ: {self.backup_dir.absolute()}")
 
+    def get_engine(self) -> Engine:
+        """全エクスポートで共有する接続プール付きエンジンを初回利用時に作成"""
+        if self._engine is None:
+            # --jobs で設定より多いワーカー数を指定した場合も、スナップショットを保持する接続と合わせて接続待ちにならないようにする
+            pool_size = max(get_pool_size(), get_export_pool_size(self.export_workers or get_export_workers()))
+            self._engine = create_engine(
+                add_ssl_mode(self.database_url),
+                pool_size=pool_size,
+                max_overflow=1,
+                pool_pre_ping=get_pool_pre_ping(),
+            )
+            self.connection_stats.attach(self._engine)
+            logger.info(f"共有DBエンジンを作成しました - プールサイズ: {pool_size}")
+        return self._engine
+
+    def close(self) -> None:
+        """共有エンジンを破棄し、接続の統計をログに出力"""
+        if self._engine is None:
+            return
+
+        self._engine.dispose()
+        self._engine = None
+        stats = self.connection_stats
+        logger.info(
+            f"DB接続数: {stats.connection_count}件, "
+            f"接続確立時間: 合計{stats.total_connect_seconds:.2f}秒"
+        )
+
+    @contextmanager
+    def consistent_snapshot(self) -> Iterator[str | None]:
+        """一貫性モードの場合、ブロック内の全エクスポートで共有するスナップショットを保持する"""
+        if not get_consistent_snapshot():
+            yield None
+            return
+
+        with exported_snapshot(self.get_engine()) as snapshot_id:
+            logger.info(f"スナップショットを取得しました: {snapshot_id}")
+            yield snapshot_id
 
     def backup_with_cli(self, app_name: str) -> bool:
         return backup_with_heroku_cli(self.backup_dir, self.timestamp, app_name)
 
-    def backup_as_json(self) -> bool:
-        return backup_data_as_json(self.database_url, self.backup_dir, self.timestamp)
-
-    def backup_as_csv(self) -> bool:
-        return backup_data_as_csv(self.database_url, self.backup_dir, self.timestamp)
+    def backup_as_json(self, snapshot_id: str | None = None) -> bool:
+        return backup_data_as_json(
+            self.database_url, self.backup_dir, self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
+
+    def backup_as_json_chunks(self, snapshot_id: str | None = None, timestamp: str | None = None) -> bool:
+        """チャンク分割JSONでバックアップ。中断したバックアップのタイムスタンプを指定すると再開する"""
+        return backup_data_as_json_chunks(
+            self.database_url, self.backup_dir, timestamp or self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
+
+    def backup_as_ndjson(self, snapshot_id: str | None = None) -> bool:
+        return backup_data_as_ndjson(
+            self.database_url, self.backup_dir, self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
+
+    def backup_as_pgcopy(self, snapshot_id: str | None = None) -> bool:
+        return backup_data_as_pgcopy(
+            self.database_url, self.backup_dir, self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
+
+    def backup_as_parquet(self, snapshot_id: str | None = None) -> bool:
+        return backup_data_as_parquet(
+            self.database_url, self.backup_dir, self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
+
+    def backup_as_csv(self, snapshot_id: str | None = None) -> bool:
+        return backup_data_as_csv(
+            self.database_url, self.backup_dir, self.timestamp,
+            workers=self.export_workers, snapshot_id=snapshot_id, engine=self.get_engine()
+        )
 
     def backup_all(self, app_name: str | None = None) -> dict[str, bool]:
         logger.info(f"バックアップ開始 - {self.timestamp}")
@@ -61,11 +148,16 @@ class HerokuPostgreSQLBackup:
             logger.warning("Heroku app名が指定されていないため、Heroku CLIバックアップをスキップ")
             results['heroku_cli'] = False
 
-        logger.info("JSONバックアップを実行します")
-        results['json'] = self.backup_as_json()
+        try:
+            # JSONとCSVは同じ時点のデータからエクスポートする
+            with self.consistent_snapshot() as snapshot_id:
+                logger.info("JSONバックアップを実行します")
+                results['json'] = self.backup_as_json(snapshot_id)
 
-        logger.info("CSVバックアップを実行します")
-        results['csv'] = self.backup_as_csv()
+                logger.info("CSVバックアップを実行します")
+                results['csv'] = self.backup_as_csv(snapshot_id)
+        finally:
+            self.close()
 
         logger.info("バックアップ結果:")
         for method, success in results.items():
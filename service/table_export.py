@@ -0,0 +1,112 @@
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import Connection, Engine, create_engine
+
+from utils.database_helper import add_ssl_mode, begin_snapshot, exported_snapshot
+
+# テーブル名を受け取ってエクスポートし、結果表示用のメッセージを返す処理
+TableExporter = Callable[[Connection, str], str]
+
+
+def get_export_pool_size(workers: int) -> int:
+    """ワーカー毎の接続に、スナップショットを保持する接続を加えた接続プールのサイズ"""
+    return max(workers, 1) + 1
+
+
+@contextmanager
+def export_engine(database_url: str, engine: Engine | None, workers: int) -> Iterator[Engine]:
+    """共有エンジンが渡されればそれを使い、ない場合はワーカー数に合わせたエンジンを作成する"""
+    if engine is not None:
+        yield engine
+        return
+
+    owned_engine = create_engine(
+        add_ssl_mode(database_url), pool_size=get_export_pool_size(workers), max_overflow=1
+    )
+    try:
+        yield owned_engine
+    finally:
+        # 自前で作成したエンジンは接続を残さないよう破棄する
+        owned_engine.dispose()
+
+
+@contextmanager
+def removing_partial_file(path: Path) -> Iterator[None]:
+    """ブロック内で失敗した場合、途中までのファイルを完全なバックアップと誤認しないよう削除する"""
+    try:
+        yield
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def snapshot_scope(engine: Engine, snapshot_id: str | None, consistent: bool) -> Iterator[str | None]:
+    """一貫性モードの場合はスナップショットを用意し、そのIDを返す"""
+    if snapshot_id is not None or not consistent:
+        # 呼び出し元が保持しているスナップショットをそのまま使う
+        yield snapshot_id
+        return
+
+    with exported_snapshot(engine) as exported_id:
+        print(f"📸 スナップショットを取得しました: {exported_id}")
+        yield exported_id
+
+
+def _prepare_connection(conn: Connection, snapshot_id: str | None) -> None:
+    if snapshot_id is not None:
+        begin_snapshot(conn, snapshot_id)
+
+
+def _export_on_new_connection(
+    engine: Engine, export_table: TableExporter, table: str, snapshot_id: str | None
+) -> str:
+    with engine.connect() as conn:
+        _prepare_connection(conn, snapshot_id)
+        return export_table(conn, table)
+
+
+def export_tables(
+    engine: Engine,
+    tables: list[str],
+    export_table: TableExporter,
+    workers: int = 1,
+    snapshot_id: str | None = None,
+) -> dict[str, bool]:
+    """テーブル毎のエクスポート処理を実行し、テーブル毎の成否を返す"""
+    results: dict[str, bool] = {}
+
+    if workers <= 1 or len(tables) <= 1:
+        with engine.connect() as conn:
+            _prepare_connection(conn, snapshot_id)
+            for table in tables:
+                try:
+                    message = export_table(conn, table)
+                    print(f"  ✅ {table}: {message}")
+                    results[table] = True
+                except Exception as e:
+                    print(f"  ❌ {table}: {e}")
+                    results[table] = False
+                    # 失敗したトランザクションを破棄して次のテーブルに進む
+                    conn.rollback()
+                    _prepare_connection(conn, snapshot_id)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(tables))) as executor:
+        futures = {
+            table: executor.submit(_export_on_new_connection, engine, export_table, table, snapshot_id)
+            for table in tables
+        }
+        for table, future in futures.items():
+            try:
+                message = future.result()
+                print(f"  ✅ {table}: {message}")
+                results[table] = True
+            except Exception as e:
+                print(f"  ❌ {table}: {e}")
+                results[table] = False
+
+    return results
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+
+from utils.artifact_writer import ArtifactWriter, get_digest_path, hash_file, write_digest_file
+
+
+class TestArtifactWriter:
+    """ArtifactWriterクラスのテスト"""
+
+    def test_hashes_and_writes(self, tmp_path):
+        """正常系: 書き込んだ内容とSHA-256が一致する"""
+        path = tmp_path / "backup.dump"
+
+        with ArtifactWriter(path) as writer:
+            writer.write(b"hello ")
+            writer.write(b"world")
+
+        assert path.read_bytes() == b"hello world"
+        assert writer.bytes_written == 11
+        assert writer.hexdigest() == hashlib.sha256(b"hello world").hexdigest()
+
+    def test_hashes_uncompressed_content(self, tmp_path):
+        """正常系: 圧縮して保存しても圧縮前の内容のハッシュを返す"""
+        path = tmp_path / "backup.dump.gz"
+
+        with ArtifactWriter(path, 'gzip') as writer:
+            writer.write(b"data" * 1000)
+
+        assert gzip.decompress(path.read_bytes()) == b"data" * 1000
+        assert writer.hexdigest() == hashlib.sha256(b"data" * 1000).hexdigest()
+
+    def test_resume_includes_existing_content(self, tmp_path):
+        """正常系: 再開時は書き込み済みの内容をハッシュに含めて追記する"""
+        path = tmp_path / "backup.dump.part"
+        path.write_bytes(b"hello ")
+
+        with ArtifactWriter(path, resume=True) as writer:
+            writer.write(b"world")
+
+        assert path.read_bytes() == b"hello world"
+        assert writer.bytes_written == 11
+        assert writer.hexdigest() == hashlib.sha256(b"hello world").hexdigest()
+
+    def test_resume_with_compression_starts_over(self, tmp_path):
+        """正常系: 圧縮する場合は既存の内容を破棄して最初から書き込む"""
+        path = tmp_path / "backup.dump.gz.part"
+        path.write_bytes(b"stale")
+
+        with ArtifactWriter(path, 'gzip', resume=True) as writer:
+            writer.write(b"fresh")
+
+        assert gzip.decompress(path.read_bytes()) == b"fresh"
+        assert writer.bytes_written == 5
+
+    def test_restart_discards_written_content(self, tmp_path):
+        """正常系: restartで書き込み済みの内容とハッシュを破棄する"""
+        path = tmp_path / "backup.dump"
+
+        with ArtifactWriter(path) as writer:
+            writer.write(b"stale")
+            writer.restart()
+            writer.write(b"fresh")
+
+        assert path.read_bytes() == b"fresh"
+        assert writer.hexdigest() == hashlib.sha256(b"fresh").hexdigest()
+
+
+class TestDigestFile:
+    """ハッシュファイル関連関数のテスト"""
+
+    def test_write_digest_file(self, tmp_path):
+        """正常系: sha256sumと同じ形式でファイルの隣に保存する"""
+        artifact = tmp_path / "heroku_backup_20231201_120000.dump"
+
+        digest_file = write_digest_file(artifact, "abc123")
+
+        assert digest_file == get_digest_path(artifact)
+        assert digest_file.name == "heroku_backup_20231201_120000.dump.sha256"
+        assert digest_file.read_text(encoding='utf-8') == "abc123  heroku_backup_20231201_120000.dump\n"
+
+    def test_hash_file(self, tmp_path):
+        """正常系: ファイルのSHA-256を計算する"""
+        path = tmp_path / "backup.dump"
+        path.write_bytes(b"content")
+
+        assert hash_file(path) == hashlib.sha256(b"content").hexdigest()
+
+    def test_hash_file_of_compressed_artifact(self, tmp_path):
+        """正常系: 圧縮したファイルは展開後の内容のSHA-256を計算し、記録したハッシュと照合できる"""
+        path = tmp_path / "backup.dump.gz"
+        path.write_bytes(gzip.compress(b"content"))
+
+        assert hash_file(path) == hashlib.sha256(b"content").hexdigest()
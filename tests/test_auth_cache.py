@@ -0,0 +1,83 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from utils.auth_cache import AuthCache, hash_credentials
+
+
+class TestHashCredentials:
+    """hash_credentials関数のテスト"""
+
+    def test_changes_with_credentials(self, tmp_path):
+        """正常系: 認証情報ファイルの内容が変わるとハッシュも変わる"""
+        netrc_file = tmp_path / ".netrc"
+        netrc_file.write_text("machine api.heroku.com\n  password token-1\n")
+        first = hash_credentials(netrc_file)
+        netrc_file.write_text("machine api.heroku.com\n  password token-2\n")
+
+        assert first is not None
+        assert hash_credentials(netrc_file) != first
+
+    def test_environment_token(self, tmp_path):
+        """正常系: 環境変数のトークンがある場合はそのハッシュを使う"""
+        assert hash_credentials(tmp_path / ".netrc", "env-token") is not None
+
+    def test_missing_credentials(self, tmp_path):
+        """正常系: 認証情報がない場合はNone"""
+        assert hash_credentials(tmp_path / ".netrc") is None
+
+
+class TestAuthCache:
+    """AuthCacheクラスのテスト"""
+
+    def test_round_trip(self, tmp_path):
+        """正常系: 保存したログイン状態を同じ認証情報で取得できる"""
+        state_file = tmp_path / "auth.json"
+        AuthCache(state_file, "hash-1", 12).save("user@example.com")
+
+        assert AuthCache(state_file, "hash-1", 12).get_identity() == "user@example.com"
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+        assert state["credentials_hash"] == "hash-1"
+        assert datetime.fromisoformat(state["expires_at"]) > datetime.now(timezone.utc)
+
+    def test_different_credentials(self, tmp_path):
+        """正常系: 認証情報が変わった場合（再ログイン）はキャッシュを使わない"""
+        state_file = tmp_path / "auth.json"
+        AuthCache(state_file, "hash-1", 12).save("user@example.com")
+
+        assert AuthCache(state_file, "hash-2", 12).get_identity() is None
+
+    def test_expired(self, tmp_path):
+        """正常系: 有効期限を過ぎたキャッシュは使わない"""
+        state_file = tmp_path / "auth.json"
+        expired_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        state_file.write_text(json.dumps({
+            "identity": "user@example.com", "credentials_hash": "hash-1", "expires_at": expired_at.isoformat()
+        }), encoding='utf-8')
+
+        assert AuthCache(state_file, "hash-1", 12).get_identity() is None
+
+    def test_invalidate(self, tmp_path):
+        """正常系: invalidateでキャッシュを削除する"""
+        state_file = tmp_path / "auth.json"
+        cache = AuthCache(state_file, "hash-1", 12)
+        cache.save("user@example.com")
+
+        cache.invalidate()
+
+        assert not state_file.exists()
+        assert cache.get_identity() is None
+
+    def test_disabled_without_credentials(self, tmp_path):
+        """正常系: 認証情報がない場合や有効時間が0の場合は保存しない"""
+        AuthCache(tmp_path / "a.json", None, 12).save("user@example.com")
+        AuthCache(tmp_path / "b.json", "hash-1", 0).save("user@example.com")
+
+        assert not (tmp_path / "a.json").exists()
+        assert not (tmp_path / "b.json").exists()
+
+    def test_corrupted_file(self, tmp_path):
+        """異常系: 壊れたキャッシュファイルは無視する"""
+        state_file = tmp_path / "auth.json"
+        state_file.write_text("{broken", encoding='utf-8')
+
+        assert AuthCache(state_file, "hash-1", 12).get_identity() is None
@@ -0,0 +1,186 @@
+import sqlite3
+from unittest.mock import patch
+
+from utils.backup_catalog import (
+    CATALOG_FILE_NAME,
+    BackupCatalog,
+    get_artifact_size,
+    parse_artifact_timestamp,
+    record_backup,
+)
+
+
+class TestParseArtifactTimestamp:
+    """parse_artifact_timestamp関数のテスト"""
+
+    def test_parses_timestamp_from_name(self):
+        """正常系: ファイル名・ディレクトリ名からタイムスタンプを取得する"""
+        assert parse_artifact_timestamp("heroku_backup_20240115_030000.dump.gz") == "20240115_030000"
+        assert parse_artifact_timestamp("csv_backup_20240115_030000") == "20240115_030000"
+
+    def test_name_without_timestamp(self):
+        """正常系: タイムスタンプを含まない場合はNone"""
+        assert parse_artifact_timestamp("old_backup.dump") is None
+
+
+class TestGetArtifactSize:
+    """get_artifact_size関数のテスト"""
+
+    def test_directory_size(self, tmp_path):
+        """正常系: ディレクトリの場合は含まれるファイルの合計サイズ"""
+        csv_dir = tmp_path / "csv_backup_20240115_030000"
+        (csv_dir / "nested").mkdir(parents=True)
+        (csv_dir / "a.csv").write_bytes(b"x" * 10)
+        (csv_dir / "nested" / "b.csv").write_bytes(b"x" * 5)
+
+        assert get_artifact_size(csv_dir) == 15
+
+
+class TestBackupCatalog:
+    """BackupCatalogクラスのテスト"""
+
+    def test_record_and_list(self, tmp_path):
+        """正常系: 登録したバックアップを相対パスで保存し、タイムスタンプ順に取得する"""
+        newer = tmp_path / "heroku_backup_20240116_030000.dump"
+        older = tmp_path / "heroku_backup_20240115_030000.dump"
+
+        with BackupCatalog(tmp_path) as catalog:
+            newer.write_bytes(b"x" * 20)
+            older.write_bytes(b"x" * 10)
+            catalog.record("20240116_030000", 'heroku_dump', newer, 12.5, "a" * 64)
+            catalog.record("20240115_030000", 'heroku_dump', older)
+
+        with BackupCatalog(tmp_path) as catalog:
+            entries = catalog.list_backups('heroku_dump')
+        with sqlite3.connect(tmp_path / CATALOG_FILE_NAME) as conn:
+            stored_paths = [row[0] for row in conn.execute("SELECT path FROM backups ORDER BY id")]
+
+        assert [entry.path for entry in entries] == [older, newer]
+        assert [entry.size_bytes for entry in entries] == [10, 20]
+        assert entries[1].sha256 == "a" * 64
+        assert entries[1].duration_seconds == 12.5
+        assert stored_paths == [newer.name, older.name]
+
+    def test_list_filters_by_method_and_timestamp(self, tmp_path):
+        """正常系: 種類とタイムスタンプの上限で絞り込む"""
+        json_file = tmp_path / "data_backup_20240115_030000.json"
+        dump_file = tmp_path / "heroku_backup_20240115_030000.dump"
+        new_dump = tmp_path / "heroku_backup_20240120_030000.dump"
+        for path in (json_file, dump_file, new_dump):
+            path.touch()
+
+        with BackupCatalog(tmp_path) as catalog:
+            catalog.record("20240115_030000", 'json', json_file)
+            catalog.record("20240115_030000", 'heroku_dump', dump_file)
+            catalog.record("20240120_030000", 'heroku_dump', new_dump)
+
+            entries = catalog.list_backups('heroku_dump', before="20240120_030000")
+
+        assert [entry.path for entry in entries] == [dump_file]
+
+    def test_row_counts_replaced_on_rerecord(self, tmp_path):
+        """正常系: 同じパスを再登録した場合は上書きし、テーブル毎の件数も置き換える"""
+        json_file = tmp_path / "data_backup_20240115_030000.json"
+        json_file.write_text("{}")
+
+        with BackupCatalog(tmp_path) as catalog:
+            first_id = catalog.record("20240115_030000", 'json', json_file, row_counts={'users': 1, 'prompts': 2})
+            second_id = catalog.record("20240115_030000", 'json', json_file, row_counts={'users': 3})
+
+            assert second_id == first_id
+            assert catalog.get_row_counts(first_id) == {'users': 3}
+            assert len(catalog.list_backups()) == 1
+
+    def test_mark_deleted_hides_entry(self, tmp_path):
+        """正常系: 削除済みにしたバックアップは一覧に含めない"""
+        dump_file = tmp_path / "heroku_backup_20240115_030000.dump"
+        dump_file.touch()
+
+        with BackupCatalog(tmp_path) as catalog:
+            entry_id = catalog.record("20240115_030000", 'heroku_dump', dump_file)
+            catalog.mark_deleted(entry_id)
+
+            assert catalog.list_backups() == []
+
+    def test_import_existing_skips_registered(self, tmp_path):
+        """正常系: 既存のバックアップを登録し、登録済みのパスは上書きしない"""
+        registered = tmp_path / "heroku_backup_20240115_030000.dump"
+        existing = tmp_path / "heroku_backup_20240116_030000.dump"
+
+        with BackupCatalog(tmp_path) as catalog:
+            registered.touch()
+            existing.touch()
+            catalog.record("20240115_030000", 'heroku_dump', registered, sha256="a" * 64)
+            count = catalog.import_existing('heroku_dump', [
+                (registered, "20240115_030000", 0), (existing, "20240116_030000", 0)
+            ])
+            entries = catalog.list_backups()
+
+        assert count == 1
+        assert [entry.sha256 for entry in entries] == ["a" * 64, None]
+
+    def test_adds_missing_column_to_old_catalog(self, tmp_path):
+        """正常系: 以前のバージョンで作成したカタログに差分の起点の列を追加する"""
+        with sqlite3.connect(tmp_path / CATALOG_FILE_NAME) as conn:
+            conn.execute(
+                "CREATE TABLE backups (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, method TEXT NOT NULL, "
+                "path TEXT NOT NULL UNIQUE, size_bytes INTEGER NOT NULL, sha256 TEXT, duration_seconds REAL, "
+                "created_at TEXT NOT NULL, deleted_at TEXT)"
+            )
+        json_file = tmp_path / "data_backup_20240116_030000.json"
+
+        with BackupCatalog(tmp_path) as catalog:
+            json_file.write_text("{}")
+            catalog.record("20240116_030000", 'json', json_file, base_timestamp="20240115_030000")
+            entry, = catalog.list_backups('json')
+
+        assert entry.base_timestamp == "20240115_030000"
+
+    def test_bootstraps_existing_artifacts_once(self, tmp_path):
+        """正常系: 最初に開いた際に既存のバックアップを種類毎に登録し、以降は登録しない"""
+        dump_file = tmp_path / "heroku_backup_20240115_030000.dump"
+        json_file = tmp_path / "data_backup_20240115_030000.json.gz"
+        csv_dir = tmp_path / "csv_backup_20240115_030000"
+        csv_dir.mkdir()
+        (csv_dir / "users.csv").write_text("id\n1\n")
+        dump_file.write_bytes(b"x" * 10)
+        json_file.touch()
+        (tmp_path / "notes.txt").touch()
+
+        with BackupCatalog(tmp_path) as catalog:
+            entries = catalog.list_backups()
+        (tmp_path / "heroku_backup_20240116_030000.dump").touch()
+        with BackupCatalog(tmp_path) as catalog:
+            assert len(catalog.list_backups()) == 3
+
+        assert {(entry.method, entry.path) for entry in entries} == {
+            ('heroku_dump', dump_file), ('json', json_file), ('csv', csv_dir)
+        }
+        assert {entry.path: entry.size_bytes for entry in entries}[csv_dir] == len("id\n1\n")
+
+
+class TestRecordBackup:
+    """record_backup関数のテスト"""
+
+    def test_records_backup(self, tmp_path):
+        """正常系: 完了したバックアップをカタログファイルに登録する"""
+        json_file = tmp_path / "data_backup_20240115_030000.json"
+        json_file.write_text("{}")
+
+        record_backup(tmp_path, "20240115_030000", 'json', json_file, 1.5, row_counts={'users': 2})
+
+        assert (tmp_path / CATALOG_FILE_NAME).exists()
+        with BackupCatalog(tmp_path) as catalog:
+            entry, = catalog.list_backups('json')
+            assert catalog.get_row_counts(entry.entry_id) == {'users': 2}
+
+    def test_catalog_error_is_logged(self, tmp_path, caplog):
+        """異常系: カタログに書き込めない場合は警告のみで例外を送出しない"""
+        json_file = tmp_path / "data_backup_20240115_030000.json"
+        json_file.write_text("{}")
+
+        with patch('utils.backup_catalog.sqlite3.connect', side_effect=sqlite3.OperationalError("disk I/O error")):
+            record_backup(tmp_path, "20240115_030000", 'json', json_file)
+
+        assert 'バックアップカタログに登録できませんでした' in caplog.text
+        assert 'disk I/O error' in caplog.text
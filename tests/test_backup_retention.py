@@ -0,0 +1,165 @@
+import datetime
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from service.backup_retention import (
+    exclude_incremental_chains,
+    parse_timestamp,
+    select_gfs_expired,
+    select_over_quota,
+)
+from utils.backup_catalog import CatalogEntry
+from utils.watermark import IncrementalExport
+
+
+def make_entry(entry_id, timestamp, method='heroku_dump', size_bytes=100, base_timestamp=None):
+    return CatalogEntry(
+        entry_id, timestamp, method, Path(f"backup_{entry_id}"), size_bytes, None, None, base_timestamp
+    )
+
+
+class TestParseTimestamp:
+    """parse_timestamp関数のテスト"""
+
+    def test_valid_timestamp(self):
+        """正常系: バックアップのタイムスタンプを日時に変換する"""
+        parsed = parse_timestamp("20240115_030000")
+
+        assert parsed is not None
+        assert (parsed.year, parsed.month, parsed.day, parsed.hour) == (2024, 1, 15, 3)
+
+    def test_invalid_timestamp(self):
+        """正常系: 形式が異なるタイムスタンプはNone"""
+        assert parse_timestamp("manual") is None
+
+
+class TestSelectGfsExpired:
+    """select_gfs_expired関数のテスト"""
+
+    def test_daily_keeps_newest_per_day(self):
+        """正常系: 同じ日のバックアップは最新のものだけを日次として残す"""
+        entries = [
+            make_entry(1, "20240113_030000"),
+            make_entry(2, "20240114_030000"),
+            make_entry(3, "20240115_030000"),
+            make_entry(4, "20240115_150000"),
+        ]
+
+        expired = select_gfs_expired(entries, daily=2, weekly=0, monthly=0)
+
+        assert [entry.entry_id for entry in expired] == [1, 3]
+
+    def test_weekly_keeps_newest_per_iso_week(self):
+        """正常系: 週次はISO週（月曜始まり）毎の最新のバックアップを直近の週数分残す"""
+        entries = [
+            make_entry(1, "20231231_030000"),
+            make_entry(2, "20240102_030000"),
+            make_entry(3, "20240107_030000"),
+            make_entry(4, "20240108_030000"),
+            make_entry(5, "20240110_030000"),
+        ]
+
+        expired = select_gfs_expired(entries, daily=0, weekly=2, monthly=0)
+
+        assert [entry.entry_id for entry in expired] == [1, 2, 4]
+
+    def test_monthly_keeps_newest_per_month(self):
+        """正常系: 月次は月毎の最新のバックアップを直近の月数分残す"""
+        entries = [
+            make_entry(1, "20231031_030000"),
+            make_entry(2, "20231130_030000"),
+            make_entry(3, "20231215_030000"),
+            make_entry(4, "20231231_030000"),
+        ]
+
+        expired = select_gfs_expired(entries, daily=0, weekly=0, monthly=2)
+
+        assert [entry.entry_id for entry in expired] == [1, 3]
+
+    def test_methods_are_retained_independently(self):
+        """正常系: 種類毎に保持数を数える"""
+        entries = [
+            make_entry(1, "20240114_030000", 'heroku_dump'),
+            make_entry(2, "20240115_030000", 'heroku_dump'),
+            make_entry(3, "20240114_030000", 'csv'),
+        ]
+
+        expired = select_gfs_expired(entries, daily=1, weekly=0, monthly=0)
+
+        assert [entry.entry_id for entry in expired] == [1]
+
+    def test_unparseable_timestamp_is_kept(self):
+        """正常系: タイムスタンプを解釈できないバックアップは削除しない"""
+        expired = select_gfs_expired([make_entry(1, "manual")], daily=1, weekly=0, monthly=0)
+
+        assert expired == []
+
+
+class TestSelectOverQuota:
+    """select_over_quota関数のテスト"""
+
+    def test_within_quota(self):
+        """正常系: 上限以下または上限なしの場合は削除しない"""
+        entries = [make_entry(1, "20240114_030000"), make_entry(2, "20240115_030000")]
+
+        assert select_over_quota(entries, 200) == []
+        assert select_over_quota(entries, 0) == []
+
+    def test_keeps_newest_of_each_method(self):
+        """正常系: 上限を超えても種類毎の最新のバックアップは残す"""
+        entries = [
+            make_entry(1, "20240113_030000", 'heroku_dump'),
+            make_entry(2, "20240114_030000", 'csv'),
+            make_entry(3, "20240115_030000", 'heroku_dump'),
+        ]
+
+        selected = select_over_quota(entries, 50)
+
+        assert [entry.entry_id for entry in selected] == [1]
+
+
+class TestExcludeIncrementalChains:
+    """exclude_incremental_chains関数のテスト"""
+
+    def test_keeps_base_and_earlier_increments(self):
+        """正常系: 残す差分の起点の全件バックアップと、それまでの差分は削除しない"""
+        entries = [
+            make_entry(1, "20240113_030000", 'json'),
+            make_entry(2, "20240114_030000", 'json'),
+            make_entry(3, "20240115_030000", 'json', base_timestamp="20240114_030000"),
+            make_entry(4, "20240116_030000", 'json', base_timestamp="20240114_030000"),
+            make_entry(5, "20240114_030000", 'csv'),
+        ]
+
+        remaining = exclude_incremental_chains(entries, entries[:3] + entries[4:])
+
+        assert [entry.entry_id for entry in remaining] == [1, 5]
+
+    def test_deletes_chain_when_all_selected(self):
+        """正常系: 差分も削除対象の場合は起点の全件バックアップも削除する"""
+        entries = [
+            make_entry(1, "20240114_030000", 'json'),
+            make_entry(2, "20240115_030000", 'json', base_timestamp="20240114_030000"),
+        ]
+
+        assert exclude_incremental_chains(entries, entries) == entries
+
+    def test_reclaims_chains_replaced_by_full_export(self, tmp_path):
+        """正常系: 定期的な全件エクスポートで起点が更新され、古い起点と差分は削除できる"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(json.dumps({}), encoding='utf-8')
+        entries = []
+        for day in range(60):
+            timestamp = (datetime.datetime(2024, 1, 1, 3) + datetime.timedelta(days=day)).strftime("%Y%m%d_%H%M%S")
+            with patch('utils.watermark.has_column', return_value=True), \
+                 patch('utils.watermark.get_column_max', return_value=day):
+                incremental = IncrementalExport(state_file, 'csv', {"users": "id"}, timestamp, full_export_every_days=7)
+                incremental.prepare(MagicMock(), 'users')
+                incremental.save({"users": True})
+            entries.append(make_entry(day, timestamp, 'csv', base_timestamp=incremental.get_base_timestamp()))
+
+        remaining = exclude_incremental_chains(entries, entries[:30])
+
+        # 残す30日目の差分は28日目の全件エクスポートを起点とするため、28・29日目だけを残す
+        assert [entry.entry_id for entry in remaining] == list(range(28))
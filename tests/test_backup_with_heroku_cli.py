@@ -1,13 +1,48 @@
 import subprocess
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, patch
 
 import pytest
 
-from service.backup_with_heroku_cli import backup_with_heroku_cli
+from service.backup_with_heroku_cli import backup_with_heroku_cli, parse_backup_list, select_capture
+from service.heroku_capture import CaptureResult
+from utils.backup_catalog import BackupCatalog
+from utils.chunk_store import ChunkStore
+from utils.heroku_api import HerokuAPIError
+
+
+@pytest.fixture
+def mock_capture():
+    """heroku pg:backups:captureの実行（進捗の監視を含む）"""
+    with patch(
+        'service.backup_with_heroku_cli.run_capture', return_value=CaptureResult("b101", 10.0, 1024 * 1024)
+    ) as mock:
+        yield mock
+
+
+def format_backup_list(*rows):
+    """heroku pg:backupsと同じ形式の一覧を作成"""
+    lines = [
+        "=== Backups",
+        "ID    Created at                 Status                               Size    Database",
+        "────  ─────────────────────────  ───────────────────────────────────  ──────  ────────",
+    ]
+    for backup_id, created_at, status in rows:
+        lines.append(f"{backup_id}  {created_at:%Y-%m-%d %H:%M:%S +0000}  {status}  12.3MB  DATABASE")
+    lines += ["", "=== Restores", "r010  2020-01-01 00:00:00 +0000  Finished 2020-01-01 00:01:00 +0000  1MB  DATABASE"]
+    return "\n".join(lines)
 
 
 class TestBackupWithHerokuCli:
-    """backup_with_heroku_cli関数のテスト"""
+    """backup_with_heroku_cli関数のテスト（CLIダウンロード方式）"""
+
+    @pytest.fixture(autouse=True)
+    def use_cli_download(self, mock_capture):
+        """heroku pg:backups:downloadでダウンロードし、毎回captureする方式に固定"""
+        with patch('service.backup_with_heroku_cli.get_download_method', return_value='cli'), \
+             patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=0), \
+             patch('service.backup_with_heroku_cli.get_api_client', return_value=None):
+            yield
 
     @pytest.fixture
     def mock_backup_dir(self, tmp_path):
@@ -25,7 +60,7 @@ class TestBackupWithHerokuCli:
         return "test-heroku-app"
 
     def test_backup_with_heroku_cli_success(
-        self, mock_backup_dir, mock_timestamp, mock_app_name
+        self, mock_backup_dir, mock_timestamp, mock_app_name, mock_capture
     ):
         """正常系: Heroku CLIバックアップが成功する"""
         mock_backup_dir.mkdir(parents=True, exist_ok=True)
@@ -43,17 +78,13 @@ class TestBackupWithHerokuCli:
             )
 
             assert result is True
-            assert mock_run.call_count == 2
+            assert mock_run.call_count == 1
+            assert mock_capture.call_args[0][0] == mock_app_name
 
-            first_call = mock_run.call_args_list[0]
-            assert first_call[0][0] == ["heroku", "pg:backups:capture", "--app", mock_app_name]
-            assert first_call[1]['shell'] is True
-            assert first_call[1]['check'] is True
-
-            second_call = mock_run.call_args_list[1]
+            second_call = mock_run.call_args_list[0]
             expected_backup_file = mock_backup_dir / f"heroku_backup_{mock_timestamp}.dump"
             assert second_call[0][0] == [
-                "heroku", "pg:backups:download",
+                "heroku", "pg:backups:download", "b101",
                 "--app", mock_app_name,
                 "--output", str(expected_backup_file)
             ]
@@ -129,8 +160,8 @@ class TestBackupWithHerokuCli:
                 mock_app_name
             )
 
-            download_call = mock_run.call_args_list[1]
-            output_path = download_call[0][0][5]
+            download_call = mock_run.call_args_list[0]
+            output_path = download_call[0][0][-1]
             expected_path = str(mock_backup_dir / f"heroku_backup_{mock_timestamp}.dump")
             assert output_path == expected_path
 
@@ -160,7 +191,7 @@ class TestBackupWithHerokuCli:
             assert 'Herokuバックアップ完了' in caplog.text
 
     def test_backup_with_heroku_cli_with_different_app_name(
-        self, mock_backup_dir, mock_timestamp
+        self, mock_backup_dir, mock_timestamp, mock_capture
     ):
         """正常系: 異なるアプリ名でも正しく動作する"""
         mock_backup_dir.mkdir(parents=True, exist_ok=True)
@@ -179,6 +210,7 @@ class TestBackupWithHerokuCli:
             )
 
             assert result is True
+            assert mock_capture.call_args[0][0] == different_app_name
             first_call = mock_run.call_args_list[0]
             assert "--app" in first_call[0][0]
             assert different_app_name in first_call[0][0]
@@ -243,3 +275,381 @@ class TestBackupWithHerokuCli:
 
             for call in mock_run.call_args_list:
                 assert call[1]['shell'] is True
+
+
+class TestBackupWithHerokuCliHttpDownload:
+    """backup_with_heroku_cli関数のテスト（HTTPダウンロード方式）"""
+
+    @pytest.fixture(autouse=True)
+    def use_http_download(self, mock_capture):
+        """署名付きURLから直接ダウンロードし、圧縮しない方式に固定"""
+        with patch('service.backup_with_heroku_cli.get_download_method', return_value='http'), \
+             patch('service.backup_with_heroku_cli.get_dump_compression', return_value='none'), \
+             patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=0), \
+             patch('service.backup_with_heroku_cli.get_api_client', return_value=None):
+            yield
+
+    @pytest.fixture
+    def download_result(self):
+        """ダウンロード結果（サイズとSHA-256）"""
+        return Mock(size=1024, sha256="a" * 64)
+
+    def test_downloads_from_signed_url(self, tmp_path, download_result):
+        """正常系: pg:backups:urlで取得したURLからダウンロードし、SHA-256をファイルの隣に記録する"""
+        url_result = Mock(stdout="https://storage.example.com/backup?sig=abc\n", stderr="")
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result) as mock_run, \
+             patch('service.backup_with_heroku_cli.download_with_resume', return_value=download_result) as mock_download:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            assert mock_run.call_args[0][0] == ["heroku", "pg:backups:url", "b101", "--app", "test-app"]
+            assert mock_download.call_args[0] == (
+                "https://storage.example.com/backup?sig=abc", tmp_path / "heroku_backup_20231201_120000.dump"
+            )
+            digest_file = tmp_path / "heroku_backup_20231201_120000.dump.sha256"
+            assert digest_file.read_text(encoding='utf-8') == f"{'a' * 64}  heroku_backup_20231201_120000.dump\n"
+
+    def test_compresses_while_downloading(self, tmp_path, download_result):
+        """正常系: 圧縮方式を指定した場合は拡張子を付けて保存し、ハッシュは元のダンプ名で記録する"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.get_dump_compression', return_value='gzip'), \
+             patch('service.backup_with_heroku_cli.download_with_resume', return_value=download_result) as mock_download:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            assert mock_download.call_args[0][1] == tmp_path / "heroku_backup_20231201_120000.dump.gz"
+            assert mock_download.call_args[1]['compression'] == 'gzip'
+            assert (tmp_path / "heroku_backup_20231201_120000.dump.sha256").exists()
+
+    def test_records_dump_in_catalog(self, tmp_path, download_result):
+        """正常系: ダウンロードしたダンプをサイズとSHA-256とともにバックアップカタログに登録する"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        def download(url, destination, **kwargs):
+            destination.write_bytes(b"x" * 1024)
+            return download_result
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.download_with_resume', side_effect=download):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+        assert result is True
+        with BackupCatalog(tmp_path) as catalog:
+            entry, = catalog.list_backups('heroku_dump')
+        assert entry.path == tmp_path / "heroku_backup_20231201_120000.dump"
+        assert entry.timestamp == "20231201_120000"
+        assert entry.size_bytes == 1024
+        assert entry.sha256 == "a" * 64
+
+    def test_stores_dump_in_chunk_store(self, tmp_path, download_result, caplog):
+        """正常系: 重複排除を有効にした場合はダンプをチャンクストアに格納し、マニフェストをカタログに登録する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+        dump_bytes = bytes(range(256)) * 4096
+
+        def download(url, destination, **kwargs):
+            destination.write_bytes(dump_bytes)
+            return download_result
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.download_with_resume', side_effect=download), \
+             patch('service.backup_with_heroku_cli.get_dedup_dumps', return_value=True), \
+             patch('service.backup_with_heroku_cli.get_dedup_chunk_size', return_value=4096):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+        assert result is True
+        assert not (tmp_path / "heroku_backup_20231201_120000.dump").exists()
+        assert not (tmp_path / "heroku_backup_20231201_120000.dump.sha256").exists()
+        with BackupCatalog(tmp_path) as catalog:
+            entry, = catalog.list_backups()
+        assert entry.method == 'heroku_dump_chunked'
+        assert entry.path == tmp_path / "chunk_store" / "manifests" / "heroku_backup_20231201_120000.dump.json"
+        # 同じ内容のチャンクは1回だけ保存するため、登録するサイズは実際に増えた分になる
+        assert entry.size_bytes == ChunkStore(tmp_path / "chunk_store").get_stats().stored_bytes < len(dump_bytes)
+        assert '重複排除率' in caplog.text
+
+        restored = tmp_path / "restored.dump"
+        ChunkStore(tmp_path / "chunk_store").restore("heroku_backup_20231201_120000.dump", restored)
+        assert restored.read_bytes() == dump_bytes
+
+    def test_skips_chunk_store_for_compressed_dump(self, tmp_path, download_result, caplog):
+        """正常系: 圧縮したダンプはチャンクストアに格納せず、そのままカタログに登録する"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        def download(url, destination, **kwargs):
+            destination.write_bytes(b"x" * 1024)
+            return download_result
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.get_dump_compression', return_value='zstd'), \
+             patch('service.backup_with_heroku_cli.download_with_resume', side_effect=download), \
+             patch('service.backup_with_heroku_cli.get_dedup_dumps', return_value=True):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+        assert result is True
+        assert (tmp_path / "heroku_backup_20231201_120000.dump.zst").exists()
+        assert not (tmp_path / "chunk_store").exists()
+        assert 'チャンクストアは圧縮していないダンプが対象' in caplog.text
+        with BackupCatalog(tmp_path) as catalog:
+            assert [entry.method for entry in catalog.list_backups()] == ['heroku_dump']
+
+    def test_segmented_download_with_multiple_connections(self, tmp_path, download_result):
+        """正常系: 接続数が2以上の場合は分割ダウンロードを使う"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.get_download_connections', return_value=4), \
+             patch('service.backup_with_heroku_cli.download_segmented', return_value=download_result) as mock_segmented, \
+             patch('service.backup_with_heroku_cli.download_with_resume') as mock_download:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            assert mock_segmented.call_args[0][2] == 4
+            mock_download.assert_not_called()
+
+    def test_invalid_url_output(self, tmp_path, caplog):
+        """異常系: URLを取得できない場合はダウンロードしない"""
+        url_result = Mock(stdout="", stderr="No backups")
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.download_with_resume') as mock_download:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is False
+            mock_download.assert_not_called()
+            assert 'バックアップのURLを取得できませんでした' in caplog.text
+
+    def test_download_error(self, tmp_path, caplog):
+        """異常系: 再試行してもダウンロードできない場合はFalse"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result), \
+             patch('service.backup_with_heroku_cli.download_with_resume', side_effect=ConnectionError("timeout")):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is False
+            assert 'Herokuバックアップのダウンロードエラー' in caplog.text
+
+
+class TestParseBackupList:
+    """parse_backup_list関数のテスト"""
+
+    def test_parses_backups_section_only(self):
+        """正常系: Backups欄の行だけを取得し、リストアの行は含めない"""
+        created_at = datetime(2024, 1, 15, 3, 0, 12, tzinfo=timezone.utc)
+        output = format_backup_list(
+            ("a101", created_at, "Completed 2024-01-15 03:01:45 +0000"),
+            ("b100", created_at - timedelta(days=1), "Failed 2024-01-14 03:00:30 +0000"),
+        )
+
+        captures = parse_backup_list(output)
+
+        assert [capture.backup_id for capture in captures] == ["a101", "b100"]
+        assert captures[0].created_at == created_at
+        assert captures[0].completed is True
+        assert captures[1].completed is False
+
+    def test_empty_output(self):
+        """正常系: バックアップがない場合は空のリスト"""
+        assert parse_backup_list("=== Backups\nNo backups. Capture one with heroku pg:backups:capture") == []
+
+
+class TestSelectCapture:
+    """select_capture関数のテスト"""
+
+    def _run(self, output, max_age=6):
+        with patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=max_age), \
+             patch('service.backup_with_heroku_cli.subprocess.run', return_value=Mock(stdout=output)) as mock_run:
+            return select_capture("test-app"), mock_run
+
+    def test_selects_newest_completed_within_age(self, caplog):
+        """正常系: 許容時間内の完了済みバックアップのうち最新のものを選び、理由をログに出力する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        now = datetime.now(timezone.utc)
+        output = format_backup_list(
+            ("b103", now - timedelta(minutes=10), "Running"),
+            ("b102", now - timedelta(hours=1), "Failed 2024-01-15 03:00:30 +0000"),
+            ("a101", now - timedelta(hours=2), "Completed 2024-01-15 03:01:45 +0000"),
+            ("a100", now - timedelta(hours=3), "Completed 2024-01-14 03:01:45 +0000"),
+        )
+
+        backup_id, mock_run = self._run(output)
+
+        assert backup_id == "a101"
+        assert mock_run.call_args[0][0] == ["heroku", "pg:backups", "--app", "test-app"]
+        assert '既存のHerokuバックアップ a101 を再利用します' in caplog.text
+
+    def test_returns_none_when_too_old(self, caplog):
+        """正常系: 許容時間内のバックアップがない場合は新規に作成する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        output = format_backup_list(
+            ("a100", datetime.now(timezone.utc) - timedelta(hours=30), "Completed 2024-01-14 03:01:45 +0000"),
+        )
+
+        backup_id, _ = self._run(output)
+
+        assert backup_id is None
+        assert '6時間以内に完了したHerokuバックアップがないため新規に作成します' in caplog.text
+
+    def test_disabled_does_not_list(self):
+        """正常系: max_capture_ageが0の場合は一覧を取得しない"""
+        backup_id, mock_run = self._run("", max_age=0)
+
+        assert backup_id is None
+        mock_run.assert_not_called()
+
+    def test_list_error_falls_back_to_capture(self, caplog):
+        """異常系: 一覧の取得に失敗した場合は新規に作成する"""
+        with patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=6), \
+             patch('service.backup_with_heroku_cli.subprocess.run',
+                   side_effect=subprocess.CalledProcessError(1, "heroku")):
+            backup_id = select_capture("test-app")
+
+        assert backup_id is None
+        assert 'Herokuバックアップの一覧を取得できないため新規に作成します' in caplog.text
+
+
+class TestBackupWithHerokuCliReuseCapture:
+    """backup_with_heroku_cli関数のテスト（既存バックアップの再利用）"""
+
+    def test_downloads_reused_capture_without_capturing(self, tmp_path):
+        """正常系: 再利用するバックアップがある場合はcaptureせずにそのIDでダウンロードする"""
+        url_result = Mock(stdout="https://storage.example.com/backup", stderr="")
+
+        with patch('service.backup_with_heroku_cli.select_capture', return_value="a101"), \
+             patch('service.backup_with_heroku_cli.get_api_client', return_value=None), \
+             patch('service.backup_with_heroku_cli.get_download_method', return_value='http'), \
+             patch('service.backup_with_heroku_cli.get_dump_compression', return_value='none'), \
+             patch('service.backup_with_heroku_cli.subprocess.run', return_value=url_result) as mock_run, \
+             patch('service.backup_with_heroku_cli.download_with_resume',
+                   return_value=Mock(size=1024, sha256="a" * 64)):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            assert mock_run.call_count == 1
+            assert mock_run.call_args[0][0] == ["heroku", "pg:backups:url", "a101", "--app", "test-app"]
+
+    def test_cli_download_of_reused_capture(self, tmp_path):
+        """正常系: CLIダウンロード方式でも再利用するバックアップのIDを指定する"""
+        with patch('service.backup_with_heroku_cli.select_capture', return_value="a101"), \
+             patch('service.backup_with_heroku_cli.get_api_client', return_value=None), \
+             patch('service.backup_with_heroku_cli.get_download_method', return_value='cli'), \
+             patch('service.backup_with_heroku_cli.subprocess.run', return_value=Mock(returncode=0)) as mock_run:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            assert mock_run.call_count == 1
+            assert mock_run.call_args[0][0][:3] == ["heroku", "pg:backups:download", "a101"]
+
+
+class TestBackupWithHerokuCliCapture:
+    """backup_with_heroku_cli関数のテスト（キャプチャの監視）"""
+
+    @pytest.fixture(autouse=True)
+    def use_cli_download(self):
+        with patch('service.backup_with_heroku_cli.get_download_method', return_value='cli'), \
+             patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=0), \
+             patch('service.backup_with_heroku_cli.get_api_client', return_value=None):
+            yield
+
+    def test_records_capture_metrics(self, tmp_path, mock_capture):
+        """正常系: キャプチャの所要時間・サイズ・速度をメトリクスファイルに追記する"""
+        with patch('service.backup_with_heroku_cli.subprocess.run', return_value=Mock(returncode=0)):
+            backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+            backup_with_heroku_cli(tmp_path, "20231202_120000", "test-app")
+
+        lines = (tmp_path / "capture_metrics.csv").read_text(encoding='utf-8').splitlines()
+        assert lines == [
+            "timestamp,backup_id,duration_seconds,size_bytes,mb_per_second",
+            "20231201_120000,b101,10.0,1048576,0.100",
+            "20231202_120000,b101,10.0,1048576,0.100",
+        ]
+
+    def test_capture_timeout(self, tmp_path, caplog):
+        """異常系: キャプチャが期限内に完了しない場合はダウンロードせずにFalse"""
+        with patch('service.backup_with_heroku_cli.run_capture', side_effect=TimeoutError("期限切れ")), \
+             patch('service.backup_with_heroku_cli.subprocess.run') as mock_run:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is False
+            mock_run.assert_not_called()
+            assert '期限切れ' in caplog.text
+
+
+class TestBackupWithHerokuApi:
+    """backup_with_heroku_cli関数のテスト（Heroku API）"""
+
+    @pytest.fixture
+    def client(self):
+        client = Mock()
+        client.get_backup_url.return_value = "https://storage.example.com/b102?sig=abc"
+        return client
+
+    def test_uses_api_without_spawning_cli(self, tmp_path, client):
+        """正常系: APIトークンがある場合はHeroku CLIを起動せずにキャプチャとURLの取得を行う"""
+        with patch('service.backup_with_heroku_cli.get_api_client', return_value=client), \
+             patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=0), \
+             patch('service.backup_with_heroku_cli.get_download_method', return_value='http'), \
+             patch('service.backup_with_heroku_cli.get_dump_compression', return_value='none'), \
+             patch('service.backup_with_heroku_cli.run_capture',
+                   return_value=CaptureResult("b102", 10.0, 1024)) as mock_capture, \
+             patch('service.backup_with_heroku_cli.subprocess.run') as mock_run, \
+             patch('service.backup_with_heroku_cli.download_with_resume',
+                   return_value=Mock(size=1024, sha256="a" * 64)) as mock_download:
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is True
+            mock_run.assert_not_called()
+            assert mock_capture.call_args[0][3] is client
+            client.get_backup_url.assert_called_once_with("test-app", 102)
+            assert mock_download.call_args[0][0] == "https://storage.example.com/b102?sig=abc"
+            client.close.assert_called_once()
+
+    def test_selects_recent_capture_with_api(self, client):
+        """正常系: APIのバックアップ一覧から許容時間内の完了済みバックアップを選ぶ"""
+        now = datetime.now(timezone.utc)
+        client.list_backups.return_value = [
+            {"num": 102, "schedule": None, "created_at": f"{now - timedelta(minutes=5):%Y-%m-%d %H:%M:%S +0000}",
+             "finished_at": None},
+            {"num": 101, "schedule": {"name": "DATABASE_URL"},
+             "created_at": f"{now - timedelta(hours=2):%Y-%m-%d %H:%M:%S +0000}",
+             "finished_at": f"{now - timedelta(hours=2):%Y-%m-%d %H:%M:%S +0000}", "succeeded": True},
+        ]
+
+        with patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=6), \
+             patch('service.backup_with_heroku_cli.subprocess.run') as mock_run:
+            backup_id = select_capture("test-app", client)
+
+        assert backup_id == "a101"
+        mock_run.assert_not_called()
+
+    def test_api_error_fails_backup(self, tmp_path, client, caplog):
+        """異常系: APIがエラーを返した場合はFalse"""
+        with patch('service.backup_with_heroku_cli.get_api_client', return_value=client), \
+             patch('service.backup_with_heroku_cli.get_max_capture_age', return_value=0), \
+             patch('service.backup_with_heroku_cli.run_capture',
+                   side_effect=HerokuAPIError("Heroku APIエラー: HTTP 403", 403)):
+
+            result = backup_with_heroku_cli(tmp_path, "20231201_120000", "test-app")
+
+            assert result is False
+            assert 'HTTP 403' in caplog.text
+            client.close.assert_called_once()
@@ -0,0 +1,111 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from utils.change_tracker import TableChangeTracker, get_change_counters
+
+
+class TestGetChangeCounters:
+    """get_change_counters関数のテスト"""
+
+    def test_returns_counters(self):
+        """正常系: 挿入・更新・削除の件数をリストで返す"""
+        conn = MagicMock()
+        conn.execute.return_value.first.return_value = (10, 2, 1, 16384)
+
+        assert get_change_counters(conn, 'users') == [10, 2, 1, 16384]
+        assert 'pg_relation_filenode' in str(conn.execute.call_args[0][0])
+
+    def test_returns_none_without_stats(self):
+        """正常系: 統計がないテーブルはNone"""
+        conn = MagicMock()
+        conn.execute.return_value.first.return_value = None
+
+        assert get_change_counters(conn, 'users') is None
+
+
+class TestTableChangeTracker:
+    """TableChangeTrackerクラスのテスト"""
+
+    def _run_backup(self, backup_dir, timestamp, counters, content="id\n1\n"):
+        """1回分のバックアップを行い、再利用したかどうかと出力先を返す"""
+        export_dir = backup_dir / f"csv_backup_{timestamp}"
+        export_dir.mkdir()
+        artifact = export_dir / "users.csv"
+
+        with patch('utils.change_tracker.get_change_counters', return_value=counters):
+            tracker = TableChangeTracker.start(backup_dir / "table_stats.json", 'csv', MagicMock(), ['users'], None)
+        assert tracker is not None
+        reused = tracker.reuse_if_unchanged('users', artifact)
+        if not reused:
+            artifact.write_text(content, encoding='utf-8')
+        tracker.save({'users': True})
+        return reused, artifact
+
+    def test_reuses_previous_artifact_when_unchanged(self, tmp_path):
+        """正常系: 変更件数が前回と同じ場合は前回のファイルをハードリンクで再利用する"""
+        reused_first, first = self._run_backup(tmp_path, "20231201_120000", [10, 2, 1, 16384])
+        reused_second, second = self._run_backup(tmp_path, "20231202_120000", [10, 2, 1, 16384], content="changed")
+
+        assert reused_first is False
+        assert reused_second is True
+        assert second.read_text(encoding='utf-8') == "id\n1\n"
+        assert second.stat().st_ino == first.stat().st_ino
+
+        state = json.loads((tmp_path / "table_stats.json").read_text(encoding='utf-8'))
+        assert state["csv"]["users"] == {"counters": [10, 2, 1, 16384], "artifact": "csv_backup_20231202_120000/users.csv"}
+
+    def test_exports_again_when_changed(self, tmp_path):
+        """正常系: 変更件数が異なる場合は再エクスポートする"""
+        self._run_backup(tmp_path, "20231201_120000", [10, 2, 1, 16384])
+        reused, artifact = self._run_backup(tmp_path, "20231202_120000", [11, 2, 1, 16384], content="id\n1\n2\n")
+
+        assert reused is False
+        assert artifact.read_text(encoding='utf-8') == "id\n1\n2\n"
+
+    def test_exports_again_when_previous_artifact_missing(self, tmp_path):
+        """正常系: 前回のファイルが削除されている場合は再エクスポートする"""
+        _, first = self._run_backup(tmp_path, "20231201_120000", [10, 2, 1, 16384])
+        first.unlink()
+
+        reused, _ = self._run_backup(tmp_path, "20231202_120000", [10, 2, 1, 16384])
+
+        assert reused is False
+
+    def test_does_not_save_failed_tables(self, tmp_path):
+        """正常系: エクスポートに失敗したテーブルの変更件数は保存しない"""
+        with patch('utils.change_tracker.get_change_counters', return_value=[1, 0, 0, 16384]):
+            tracker = TableChangeTracker.start(tmp_path / "table_stats.json", 'csv', MagicMock(), ['users'], None)
+        assert tracker is not None
+        tracker.reuse_if_unchanged('users', tmp_path / "users.csv")
+        tracker.save({'users': False})
+
+        assert not (tmp_path / "table_stats.json").exists()
+
+    def test_exports_again_after_truncate(self, tmp_path):
+        """正常系: TRUNCATEで件数が変わらなくても、ファイルノードが変わった場合は再エクスポートする"""
+        self._run_backup(tmp_path, "20231201_120000", [10, 2, 1, 16384])
+        reused, artifact = self._run_backup(tmp_path, "20231202_120000", [10, 2, 1, 16390], content="id\n")
+
+        assert reused is False
+        assert artifact.read_text(encoding='utf-8') == "id\n"
+
+    def test_reads_counters_before_export(self, tmp_path):
+        """正常系: エクスポート前に全テーブルの変更件数を1本の接続で読み込む"""
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+
+        with patch('utils.change_tracker.get_change_counters', return_value=[1, 0, 0, 16384]) as mock_counters:
+            TableChangeTracker.start(tmp_path / "table_stats.json", 'csv', engine, ['users', 'posts'], None)
+
+        assert engine.connect.call_count == 1
+        assert [call.args for call in mock_counters.call_args_list] == [(conn, 'users'), (conn, 'posts')]
+
+    def test_disabled_with_existing_snapshot(self, tmp_path, capsys):
+        """正常系: 取得済みのスナップショットでは変更件数がファイルより先行するため再利用しない"""
+        engine = MagicMock()
+
+        tracker = TableChangeTracker.start(tmp_path / "table_stats.json", 'csv', engine, ['users'], "00000003-1")
+
+        assert tracker is None
+        engine.connect.assert_not_called()
+        assert '再利用を行いません' in capsys.readouterr().out
@@ -0,0 +1,130 @@
+import io
+import random
+
+import pytest
+
+from utils.chunk_store import WINDOW_SIZE, ChunkStore, get_chunk_size_limits, iter_chunks, window_hashes
+
+AVG_CHUNK_SIZE = 4096
+
+
+@pytest.fixture
+def data():
+    """再現可能な乱数のバイト列（約1MB）"""
+    return random.Random(0).randbytes(1024 * 1024)
+
+
+class TestWindowHashes:
+    """window_hashes関数のテスト"""
+
+    def test_hash_depends_only_on_window(self, data):
+        """正常系: 同じ内容の窓は先頭からの位置に関係なく同じハッシュになる"""
+        hashes = window_hashes(data[:5000])
+        shifted = window_hashes(data[300:5000])
+
+        assert (hashes[300 + WINDOW_SIZE - 1:] == shifted[WINDOW_SIZE - 1:]).all()
+
+
+class TestIterChunks:
+    """iter_chunks関数のテスト"""
+
+    def test_chunks_reassemble_within_size_limits(self, data):
+        """正常系: チャンクを連結すると元のデータになり、最後以外は最小・最大サイズの範囲内"""
+        min_size, max_size = get_chunk_size_limits(AVG_CHUNK_SIZE)
+
+        chunks = list(iter_chunks(io.BytesIO(data), AVG_CHUNK_SIZE))
+
+        assert b"".join(chunks) == data
+        assert all(min_size <= len(chunk) <= max_size for chunk in chunks[:-1])
+
+    def test_boundaries_do_not_depend_on_read_size(self, data):
+        """正常系: 読み込み単位を変えても同じ位置で区切る"""
+        expected = list(iter_chunks(io.BytesIO(data), AVG_CHUNK_SIZE))
+
+        assert list(iter_chunks(io.BytesIO(data), AVG_CHUNK_SIZE, read_size=7777)) == expected
+
+    def test_insertion_keeps_following_chunks(self, data):
+        """正常系: 途中にデータを挿入しても、挿入位置以外のチャンクは変わらない"""
+        original = list(iter_chunks(io.BytesIO(data), AVG_CHUNK_SIZE))
+        edited = data[:500_000] + b"inserted row" + data[500_000:]
+
+        chunks = list(iter_chunks(io.BytesIO(edited), AVG_CHUNK_SIZE))
+
+        assert len(set(chunks) - set(original)) <= 2
+
+    def test_invalid_average_size(self):
+        """異常系: 平均サイズが2の累乗でない場合はValueError"""
+        with pytest.raises(ValueError):
+            get_chunk_size_limits(5000)
+
+
+class TestChunkStore:
+    """ChunkStoreクラスのテスト"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return ChunkStore(tmp_path / "chunk_store", AVG_CHUNK_SIZE)
+
+    def test_stores_duplicate_chunks_once(self, tmp_path, store, data):
+        """正常系: 2回目のダンプは変更のないチャンクを保存せず、重複排除率に反映する"""
+        first = tmp_path / "heroku_backup_20240115_030000.dump"
+        second = tmp_path / "heroku_backup_20240116_030000.dump"
+        first.write_bytes(data)
+        second.write_bytes(data[:500_000] + b"inserted row" + data[500_000:])
+
+        first_result = store.add_file(first)
+        second_result = store.add_file(second)
+
+        assert first_result.new_chunk_count == first_result.chunk_count
+        assert second_result.new_chunk_count <= 2
+        assert second_result.new_bytes < second_result.size_bytes / 10
+        stats = store.get_stats()
+        assert stats.manifest_count == 2
+        assert stats.logical_bytes == len(data) * 2 + len(b"inserted row")
+        assert stats.dedup_ratio > 1.8
+
+    def test_restore_rebuilds_original(self, tmp_path, store, data):
+        """正常系: マニフェストの順にチャンクを連結して元のダンプを復元する"""
+        source = tmp_path / "heroku_backup_20240115_030000.dump"
+        source.write_bytes(data)
+        store.add_file(source)
+        restored = tmp_path / "restored.dump"
+
+        size = store.restore(source.name, restored)
+
+        assert size == len(data)
+        assert restored.read_bytes() == data
+        assert store.list_manifests() == [source.name]
+
+    def test_restore_detects_corrupted_chunk(self, tmp_path, store, data):
+        """異常系: チャンクが壊れている場合はValueErrorとし、復元先のファイルを作らない"""
+        source = tmp_path / "heroku_backup_20240115_030000.dump"
+        source.write_bytes(data)
+        store.add_file(source)
+        digest, _ = store.read_manifest(source.name)['chunks'][0]
+        store.chunk_path(digest).write_bytes(b"corrupted")
+        restored = tmp_path / "restored.dump"
+
+        with pytest.raises(ValueError):
+            store.restore(source.name, restored)
+        assert not restored.exists()
+        assert not restored.with_name("restored.dump.part").exists()
+
+    def test_collect_garbage_keeps_referenced_chunks(self, tmp_path, store, data):
+        """正常系: 削除したマニフェストだけが参照していたチャンクを削除し、他のダンプは復元できる"""
+        first = tmp_path / "heroku_backup_20240115_030000.dump"
+        second = tmp_path / "heroku_backup_20240116_030000.dump"
+        first.write_bytes(data)
+        second.write_bytes(data[:500_000])
+        store.add_file(first)
+        store.add_file(second)
+
+        store.manifest_path(first.name).unlink()
+        removed, freed_bytes = store.collect_garbage()
+
+        assert removed > 0
+        assert freed_bytes > 0
+        assert store.get_stats().stored_bytes == 500_000
+        restored = tmp_path / "restored.dump"
+        store.restore(second.name, restored)
+        assert restored.read_bytes() == data[:500_000]
@@ -1,14 +1,26 @@
 import datetime
+from contextlib import contextmanager
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 import pytz
 
 from service.cleanup_old_backups import cleanup_old_backups
+from utils.backup_catalog import BackupCatalog, record_backup
+from utils.chunk_store import ChunkStore
 
 JST = pytz.timezone('Asia/Tokyo')
 
 
+@contextmanager
+def patch_datetime():
+    """削除の基準日時と、カタログに登録する既存ファイルの作成日時を同じモックで差し替える"""
+    mock_datetime = MagicMock()
+    with patch('service.cleanup_old_backups.datetime', mock_datetime), \
+         patch('utils.backup_catalog.datetime', mock_datetime):
+        yield mock_datetime
+
+
 class TestCleanupOldBackups:
     """cleanup_old_backups関数のテスト"""
 
@@ -44,7 +56,7 @@ class TestCleanupOldBackups:
         recent_ctime = recent_file.stat().st_ctime
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -70,7 +82,7 @@ class TestCleanupOldBackups:
 
         old_ctime = old_file.stat().st_ctime
 
-        with patch('service.cleanup_old_backups.datetime') as mock_datetime:
+        with patch_datetime() as mock_datetime:
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
             mock_datetime.datetime.fromtimestamp = lambda ts, tz: old_time
@@ -94,7 +106,7 @@ class TestCleanupOldBackups:
         recent_time = current_time - datetime.timedelta(days=5)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -119,7 +131,7 @@ class TestCleanupOldBackups:
         old_time = current_time - datetime.timedelta(days=20)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -144,7 +156,7 @@ class TestCleanupOldBackups:
         old_time = current_time - datetime.timedelta(days=20)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime, \
+             patch_datetime() as mock_datetime, \
              patch('pathlib.Path.unlink', side_effect=OSError("Permission denied")):
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
@@ -197,7 +209,7 @@ class TestCleanupOldBackups:
         old_time = current_time - datetime.timedelta(days=20)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -224,7 +236,7 @@ class TestCleanupOldBackups:
         old_time = current_time - datetime.timedelta(days=20)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -265,7 +277,7 @@ class TestCleanupOldBackups:
         boundary_time = current_time - datetime.timedelta(days=14)
 
         with patch('service.cleanup_old_backups.load_config') as mock_config, \
-             patch('service.cleanup_old_backups.datetime') as mock_datetime:
+             patch_datetime() as mock_datetime:
             mock_config.return_value.getint.return_value = 14
             mock_datetime.datetime.now.return_value = current_time
             mock_datetime.timedelta = datetime.timedelta
@@ -274,3 +286,192 @@ class TestCleanupOldBackups:
             cleanup_old_backups(mock_backup_dir)
 
             assert boundary_file.exists()
+
+
+class TestCleanupOldBackupsCatalog:
+    """cleanup_old_backups関数のテスト（バックアップカタログ）"""
+
+    def test_deletes_by_catalog_timestamp(self, tmp_path, caplog):
+        """正常系: ファイルの作成日時ではなくカタログのタイムスタンプで削除対象を判定し、削除済みにする"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        current_time = datetime.datetime.now(JST)
+        old_timestamp = (current_time - datetime.timedelta(days=20)).strftime("%Y%m%d_%H%M%S")
+        recent_timestamp = (current_time - datetime.timedelta(days=5)).strftime("%Y%m%d_%H%M%S")
+        old_file = tmp_path / f"heroku_backup_{old_timestamp}.dump"
+        recent_file = tmp_path / f"heroku_backup_{recent_timestamp}.dump"
+        old_file.touch()
+        recent_file.touch()
+
+        cleanup_old_backups(tmp_path, days=14)
+
+        assert not old_file.exists()
+        assert recent_file.exists()
+        with BackupCatalog(tmp_path) as catalog:
+            assert [entry.path for entry in catalog.list_backups('heroku_dump')] == [recent_file]
+
+    def test_uses_catalog_instead_of_directory(self, tmp_path):
+        """正常系: カタログ作成後はディレクトリを走査せず、カタログに登録されたダンプだけを対象とする"""
+        with BackupCatalog(tmp_path):
+            pass
+        untracked_file = tmp_path / "heroku_backup_20000101_000000.dump"
+        untracked_file.touch()
+
+        with patch('pathlib.Path.glob') as mock_glob:
+            cleanup_old_backups(tmp_path, days=14)
+
+            mock_glob.assert_not_called()
+        assert untracked_file.exists()
+
+    def test_imports_existing_when_catalog_created_by_backup(self, tmp_path):
+        """正常系: バックアップの登録で先にカタログを作成した場合も、既存のダンプとJSONファイルを削除対象にする"""
+        old_dump = tmp_path / "heroku_backup_20000101_000000.dump"
+        old_json = tmp_path / "data_backup_20000101_000000.json"
+        old_dump.touch()
+        old_json.touch()
+        recent_timestamp = datetime.datetime.now(JST).strftime("%Y%m%d_%H%M%S")
+        recent_json = tmp_path / f"data_backup_{recent_timestamp}.json"
+        recent_json.write_text("{}")
+
+        record_backup(tmp_path, recent_timestamp, 'json', recent_json)
+        cleanup_old_backups(tmp_path, days=14)
+
+        assert not old_dump.exists()
+        assert not old_json.exists()
+        assert recent_json.exists()
+
+    def test_deletes_all_artifact_types(self, tmp_path):
+        """正常系: ダンプ・JSONファイル・CSVディレクトリを同じ基準で削除し、ダンプのハッシュも削除する"""
+        old_dump = tmp_path / "heroku_backup_20000101_000000.dump.gz"
+        old_digest = tmp_path / "heroku_backup_20000101_000000.dump.sha256"
+        old_json = tmp_path / "data_backup_20000101_000000.json"
+        old_csv = tmp_path / "csv_backup_20000101_000000"
+        old_csv.mkdir()
+        (old_csv / "users.csv").write_text("id\n1\n")
+        for path in (old_dump, old_digest, old_json):
+            path.touch()
+        untracked_file = tmp_path / "notes.json"
+        untracked_file.touch()
+
+        cleanup_old_backups(tmp_path, days=14)
+
+        assert not old_dump.exists()
+        assert not old_digest.exists()
+        assert not old_json.exists()
+        assert not old_csv.exists()
+        assert untracked_file.exists()
+
+
+    def test_collects_chunks_of_deleted_manifests(self, tmp_path):
+        """正常系: チャンクストアのダンプを削除した場合は、他のダンプが参照しないチャンクも削除する"""
+        store = ChunkStore(tmp_path / "chunk_store", 4096)
+        old_dump = tmp_path / "heroku_backup_20000101_000000.dump"
+        old_dump.write_bytes(bytes(range(256)) * 1024)
+        recent_timestamp = datetime.datetime.now(JST).strftime("%Y%m%d_%H%M%S")
+        recent_dump = tmp_path / f"heroku_backup_{recent_timestamp}.dump"
+        recent_dump.write_bytes(b"recent" * 1024)
+        with BackupCatalog(tmp_path) as catalog:
+            for timestamp, dump_file in (("20000101_000000", old_dump), (recent_timestamp, recent_dump)):
+                catalog.record(timestamp, 'heroku_dump_chunked', store.add_file(dump_file).manifest_path)
+                dump_file.unlink()
+
+        cleanup_old_backups(tmp_path, days=14)
+
+        assert store.list_manifests() == [recent_dump.name]
+        assert store.get_stats().stored_bytes == len(b"recent" * 1024)
+
+
+class TestCleanupOldBackupsRetention:
+    """cleanup_old_backups関数のテスト（世代管理と合計サイズの上限）"""
+
+    @pytest.fixture
+    def retention(self):
+        """日次・週次・月次の保持数と合計サイズの上限を設定する"""
+        def configure(daily=0, weekly=0, monthly=0, max_total_bytes=0):
+            return patch.multiple(
+                'service.cleanup_old_backups',
+                get_keep_daily=Mock(return_value=daily),
+                get_keep_weekly=Mock(return_value=weekly),
+                get_keep_monthly=Mock(return_value=monthly),
+                get_max_total_bytes=Mock(return_value=max_total_bytes),
+            )
+        return configure
+
+    def test_gfs_keeps_daily_weekly_monthly(self, tmp_path, retention):
+        """正常系: 世代管理では保持期間に関係なく日次・週次・月次の代表を残す"""
+        names = [
+            "data_backup_20231115_030000.json",  # 11月の月次・第46週の週次
+            "data_backup_20231201_030000.json",  # 第48週の週次
+            "data_backup_20231211_030000.json",  # 削除（同じ週・月に新しいバックアップがある）
+            "data_backup_20231212_030000.json",  # 削除
+            "data_backup_20231213_030000.json",  # 日次
+            "data_backup_20231214_030000.json",  # 日次・第50週の週次・12月の月次
+        ]
+        for name in names:
+            (tmp_path / name).touch()
+
+        with retention(daily=2, weekly=3, monthly=2):
+            cleanup_old_backups(tmp_path, days=1)
+
+        remaining = sorted(path.name for path in tmp_path.glob("data_backup_*.json"))
+        assert remaining == [names[0], names[1], names[4], names[5]]
+
+    def test_quota_deletes_oldest_first(self, tmp_path, retention, caplog):
+        """正常系: 合計サイズが上限を超える場合は古い順に削除し、種類毎の最新は残す"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        current_time = datetime.datetime.now(JST)
+        files = []
+        for days_ago in (3, 2, 1):
+            timestamp = (current_time - datetime.timedelta(days=days_ago)).strftime("%Y%m%d_%H%M%S")
+            dump_file = tmp_path / f"heroku_backup_{timestamp}.dump"
+            dump_file.write_bytes(b"x" * 100)
+            files.append(dump_file)
+
+        with retention(max_total_bytes=150):
+            cleanup_old_backups(tmp_path, days=30)
+
+        assert [path.exists() for path in files] == [False, False, True]
+        assert '合計サイズの上限' in caplog.text
+        assert '2個の古いバックアップファイルを削除しました' in caplog.text
+
+    def test_quota_counts_chunk_store_usage(self, tmp_path, retention):
+        """正常系: チャンクストアのダンプはマニフェストではなくチャンクストアの使用量で合計サイズに数える"""
+        current_time = datetime.datetime.now(JST)
+        json_files = []
+        for days_ago in (3, 2):
+            timestamp = (current_time - datetime.timedelta(days=days_ago)).strftime("%Y%m%d_%H%M%S")
+            json_file = tmp_path / f"data_backup_{timestamp}.json"
+            json_file.write_bytes(b"x" * 100)
+            json_files.append(json_file)
+        dump_timestamp = (current_time - datetime.timedelta(days=1)).strftime("%Y%m%d_%H%M%S")
+        dump_file = tmp_path / f"heroku_backup_{dump_timestamp}.dump"
+        dump_file.write_bytes(bytes(range(256)) * 64)
+        with BackupCatalog(tmp_path) as catalog:
+            manifest_path = ChunkStore(tmp_path / "chunk_store", 4096).add_file(dump_file).manifest_path
+            dump_file.unlink()
+            catalog.record(dump_timestamp, 'heroku_dump_chunked', manifest_path)
+
+        with retention(max_total_bytes=1000):
+            cleanup_old_backups(tmp_path, days=30)
+
+        assert [path.exists() for path in json_files] == [False, True]
+        assert manifest_path.exists()
+
+    def test_dry_run_reports_without_deleting(self, tmp_path, caplog):
+        """正常系: ドライランでは削除対象と解放される容量をログに出力し、ファイルもカタログも変更しない"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        old_dump = tmp_path / "heroku_backup_20000101_000000.dump"
+        old_dump.write_bytes(b"x" * 2 * 1024 * 1024)
+
+        cleanup_old_backups(tmp_path, days=14, dry_run=True)
+
+        assert old_dump.exists()
+        assert '[ドライラン] 削除対象のバックアップ: 1件, 解放される容量: 2.0MB' in caplog.text
+        assert '保持期間（14日）超過' in caplog.text
+        with BackupCatalog(tmp_path) as catalog:
+            assert [entry.path for entry in catalog.list_backups()] == [old_dump]
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+from utils.cleanup_plan import DeletionPlan, scan_directory
+
+
+class TestScanDirectory:
+    """scan_directory関数のテスト"""
+
+    def test_returns_matching_entries(self, tmp_path):
+        """正常系: パターンに一致するファイルとディレクトリだけを返す"""
+        (tmp_path / "a.log").touch()
+        (tmp_path / "b.txt").touch()
+        (tmp_path / "csv_backup_20240115_030000").mkdir()
+
+        entries = scan_directory(tmp_path, ["*.log", "csv_backup_*"])
+
+        assert sorted(entry.name for entry in entries) == ["a.log", "csv_backup_20240115_030000"]
+
+
+class TestDeletionPlan:
+    """DeletionPlanクラスのテスト"""
+
+    def test_dry_run_report_does_not_delete(self, tmp_path, caplog):
+        """正常系: ドライランでは削除対象と解放される容量をログに出力し、ファイルは残す"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        old_file = tmp_path / "old.log"
+        old_file.write_bytes(b"x" * 1024 * 1024)
+        plan = DeletionPlan()
+        plan.add(old_file, 1024 * 1024, reason="保持期間超過")
+
+        plan.log_report("削除対象のログファイル")
+
+        assert old_file.exists()
+        assert plan.total_bytes == 1024 * 1024
+        assert '[ドライラン] 削除対象のログファイル: 1件, 解放される容量: 1.0MB' in caplog.text
+        assert 'old.log (1.0MB) - 保持期間超過' in caplog.text
+
+    def test_execute_with_workers(self, tmp_path):
+        """正常系: 複数のワーカーでファイル・ディレクトリ・関連ファイルを削除する"""
+        files = [tmp_path / f"backup_{index}.dump" for index in range(10)]
+        for path in files:
+            path.touch()
+        digest_file = tmp_path / "backup_0.dump.sha256"
+        digest_file.touch()
+        csv_dir = tmp_path / "csv_backup_20240115_030000"
+        csv_dir.mkdir()
+        (csv_dir / "users.csv").touch()
+
+        plan = DeletionPlan()
+        plan.add(files[0], 0, extra_paths=[digest_file])
+        for path in files[1:]:
+            plan.add(path, 0)
+        plan.add(csv_dir, 0, is_dir=True)
+
+        deleted, failed = plan.execute(workers=4)
+
+        assert len(deleted) == 11
+        assert failed == []
+        assert list(tmp_path.iterdir()) == []
+
+    def test_execute_reports_failures(self, tmp_path):
+        """異常系: 削除できなかったものは例外とともに返し、他の削除は続ける"""
+        first = tmp_path / "first.log"
+        second = tmp_path / "second.log"
+        first.touch()
+        second.touch()
+        plan = DeletionPlan()
+        plan.add(first, 0)
+        plan.add(second, 0)
+        original_unlink = type(first).unlink
+
+        def unlink(path, missing_ok=False):
+            if path.name == "first.log":
+                raise PermissionError("Permission denied")
+            original_unlink(path, missing_ok=missing_ok)
+
+        with patch('pathlib.Path.unlink', autospec=True, side_effect=unlink):
+            deleted, failed = plan.execute(workers=2)
+
+        assert [item.path for item in deleted] == [second]
+        assert [(item.path, str(error)) for item, error in failed] == [(first, "Permission denied")]
@@ -0,0 +1,142 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+
+from utils.compression import (
+    append_text_member,
+    get_compression_suffix,
+    open_binary_reader,
+    open_binary_writer,
+    open_text_reader,
+    open_text_writer,
+)
+
+
+class TestGetCompressionSuffix:
+    """get_compression_suffix関数のテスト"""
+
+    def test_get_compression_suffix_known_methods(self):
+        """正常系: 圧縮方式に対応する拡張子を返す"""
+        assert get_compression_suffix('none') == ''
+        assert get_compression_suffix('gzip') == '.gz'
+        assert get_compression_suffix('zstd') == '.zst'
+
+    def test_get_compression_suffix_unknown_method(self):
+        """異常系: 未対応の圧縮方式はValueError"""
+        with pytest.raises(ValueError, match="未対応の圧縮方式です"):
+            get_compression_suffix('bz2')
+
+
+class TestOpenTextWriter:
+    """open_text_writer/open_text_reader関数のテスト"""
+
+    @pytest.mark.parametrize("compression, suffix", [('none', ''), ('gzip', '.gz'), ('zstd', '.zst')])
+    def test_round_trip(self, tmp_path, compression, suffix):
+        """正常系: 書き込んだ内容を読み戻せる"""
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+
+        path = tmp_path / f"data.ndjson{suffix}"
+        with open_text_writer(path, compression) as f:
+            f.write('{"name": "テスト"}\n')
+            f.write('{"name": "test2"}\n')
+
+        with open_text_reader(path) as f:
+            lines = f.read().splitlines()
+
+        assert lines == ['{"name": "テスト"}', '{"name": "test2"}']
+
+    def test_gzip_output_is_compressed(self, tmp_path):
+        """正常系: gzip指定時は標準のgzip形式で書き込まれる"""
+        path = tmp_path / "data.ndjson.gz"
+        with open_text_writer(path, 'gzip') as f:
+            f.write("a\n" * 1000)
+
+        assert path.stat().st_size < 1000
+        assert gzip.decompress(path.read_bytes()) == b"a\n" * 1000
+
+
+class TestAppendTextMember:
+    """append_text_member関数のテスト"""
+
+    @pytest.mark.parametrize("compression, suffix", [('none', ''), ('gzip', '.gz'), ('zstd', '.zst')])
+    def test_truncated_members_concatenate(self, tmp_path, compression, suffix):
+        """正常系: メンバー単位で切り詰めても、残りのメンバーを連結したファイルとして読み込める"""
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+
+        path = tmp_path / f"backup.json{suffix}"
+        with open(path, 'wb') as raw:
+            with append_text_member(raw, compression) as f:
+                f.write("{\"a\": 1")
+            offset = raw.tell()
+            with append_text_member(raw, compression) as f:
+                f.write(", \"partial\": [")
+            raw.seek(offset)
+            raw.truncate()
+            with append_text_member(raw, compression) as f:
+                f.write(", \"b\": 2}")
+            assert not raw.closed
+
+        with open_text_reader(path) as f:
+            assert f.read() == '{"a": 1, "b": 2}'
+
+
+class TestOpenBinaryWriter:
+    """open_binary_writer関数のテスト"""
+
+    @pytest.mark.parametrize("compression, suffix", [('none', ''), ('gzip', '.gz'), ('zstd', '.zst')])
+    def test_round_trip(self, tmp_path, compression, suffix):
+        """正常系: バイト列を書き込み、読み戻せる"""
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+
+        path = tmp_path / f"backup.dump{suffix}"
+        with open_binary_writer(path, compression) as f:
+            f.write(b"PGDMP\n")
+
+        with open_text_reader(path) as f:
+            assert f.read() == "PGDMP\n"
+
+    @pytest.mark.parametrize("compression, suffix", [('none', ''), ('gzip', '.gz'), ('zstd', '.zst')])
+    def test_binary_reader_detects_compression(self, tmp_path, compression, suffix):
+        """正常系: open_binary_readerは拡張子から圧縮方式を判定して展開する"""
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+
+        path = tmp_path / f"table.pgcopy{suffix}"
+        with open_binary_writer(path, compression) as f:
+            f.write(b"PGCOPY\n" * 100)
+
+        with open_binary_reader(path) as f:
+            assert f.read() == b"PGCOPY\n" * 100
+
+    def test_zstd_uses_configured_level_and_threads(self, tmp_path):
+        """正常系: zstdは設定したレベルとスレッド数で圧縮し、複数スレッドで圧縮した内容も読み戻せる"""
+        zstandard = pytest.importorskip('zstandard')
+        data = "".join(f"{index},name_{index % 97}\n" for index in range(500_000)).encode()
+        path = tmp_path / "backup.dump.zst"
+
+        with patch('utils.compression.get_zstd_level', return_value=1), \
+             patch('utils.compression.get_zstd_threads', return_value=2), \
+             patch('utils.compression.zstandard.ZstdCompressor', wraps=zstandard.ZstdCompressor) as mock_compressor:
+            with open_binary_writer(path, 'zstd') as f:
+                for offset in range(0, len(data), 1024 * 1024):
+                    f.write(data[offset:offset + 1024 * 1024])
+
+        mock_compressor.assert_called_once_with(level=1, threads=2)
+        assert path.stat().st_size < len(data)
+        with open_binary_reader(path) as f:
+            assert f.read() == data
+
+    def test_gzip_uses_configured_level(self, tmp_path):
+        """正常系: gzipは設定したレベルで圧縮する"""
+        path = tmp_path / "data.csv.gz"
+        with patch('utils.compression.get_gzip_level', return_value=1), \
+             patch('utils.compression.gzip.open', wraps=gzip.open) as mock_open:
+            with open_binary_writer(path, 'gzip') as f:
+                f.write(b"id,name\n" * 100)
+
+        assert mock_open.call_args[1]['compresslevel'] == 1
+        assert gzip.decompress(path.read_bytes()) == b"id,name\n" * 100
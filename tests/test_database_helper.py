@@ -1,4 +1,9 @@
-from utils.database_helper import add_ssl_mode
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine
+
+from utils.database_helper import ConnectionStats, add_ssl_mode, begin_snapshot, exported_snapshot
 
 
 class TestAddSslMode:
@@ -80,3 +85,61 @@ class TestAddSslMode:
         result = add_ssl_mode(database_url)
 
         assert isinstance(result, str)
+
+
+class TestSnapshot:
+    """exported_snapshot/begin_snapshot関数のテスト"""
+
+    def test_exported_snapshot_yields_snapshot_id(self):
+        """正常系: REPEATABLE READトランザクション内でスナップショットIDを取得する"""
+        engine = MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar_one.return_value = "00000003-0000001B-1"
+
+        with exported_snapshot(engine) as snapshot_id:
+            assert snapshot_id == "00000003-0000001B-1"
+            conn.begin.return_value.__exit__.assert_not_called()
+
+        conn.execution_options.assert_called_once_with(isolation_level="REPEATABLE READ")
+        assert "pg_export_snapshot()" in str(conn.execute.call_args[0][0])
+        conn.begin.return_value.__exit__.assert_called_once()
+
+    def test_begin_snapshot_sets_transaction_snapshot(self):
+        """正常系: 接続がエクスポート済みスナップショットを参照する"""
+        conn = MagicMock()
+
+        begin_snapshot(conn, "00000003-0000001B-1")
+
+        conn.execution_options.assert_called_once_with(isolation_level="REPEATABLE READ")
+        assert str(conn.execute.call_args[0][0]) == "SET TRANSACTION SNAPSHOT '00000003-0000001B-1'"
+
+    def test_begin_snapshot_rejects_invalid_id(self):
+        """異常系: 不正な形式のスナップショットIDはSQLに埋め込まない"""
+        conn = MagicMock()
+
+        with pytest.raises(ValueError, match="不正なスナップショットIDです"):
+            begin_snapshot(conn, "1'; DROP TABLE prompts; --")
+
+        conn.execute.assert_not_called()
+
+
+class TestConnectionStats:
+    """ConnectionStatsクラスのテスト"""
+
+    def test_counts_new_connections(self, tmp_path):
+        """正常系: 新しく確立した接続だけを数え、接続時間を記録する"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}")
+        stats = ConnectionStats()
+        stats.attach(engine)
+
+        try:
+            with engine.connect():
+                pass
+            # プールに戻った接続の再利用は数えない
+            with engine.connect():
+                pass
+        finally:
+            engine.dispose()
+
+        assert stats.connection_count == 1
+        assert stats.total_connect_seconds >= 0.0
@@ -0,0 +1,285 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from utils.auth_cache import AuthCache
+from utils.heroku_api import (
+    HerokuAPIClient,
+    HerokuAPIError,
+    get_api_client,
+    get_backup_id,
+    load_api_token,
+    parse_backup_number,
+)
+
+TOKEN = "test-token"
+DATABASE_ID = "5a6b7c8d-0000-0000-0000-000000000001"
+TRANSFERS = [
+    {"num": 101, "uuid": "uuid-101", "to_type": "gof3r", "schedule": None, "created_at": "2024-01-15 03:00:12 +0000",
+     "finished_at": "2024-01-15 03:01:45 +0000", "succeeded": True, "processed_bytes": 1024},
+    {"num": 100, "uuid": "uuid-100", "to_type": "pg_restore", "created_at": "2024-01-14 03:00:12 +0000"},
+]
+
+
+class MockHerokuAPIHandler(BaseHTTPRequestHandler):
+    """Heroku Platform APIとPostgresバックアップAPIのテスト用サーバー"""
+
+    protocol_version = "HTTP/1.1"
+    server: 'MockHerokuAPIServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.server.requests.append((self.command, self.path))
+
+        if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+            self._send_json(401, {"id": "unauthorized", "message": "Invalid credentials provided."})
+            return
+
+        routes = {
+            ("GET", "/account"): {"email": "user@example.com"},
+            ("GET", "/apps/test-app/addon-attachments/DATABASE"): {"addon": {"id": DATABASE_ID}},
+            ("POST", f"/client/v11/databases/{DATABASE_ID}/backups"): {"num": 102, "uuid": "uuid-102"},
+            ("GET", "/client/v11/apps/test-app/transfers"): TRANSFERS,
+            ("GET", "/client/v11/apps/test-app/transfers/101"): TRANSFERS[0],
+            ("POST", "/client/v11/apps/test-app/transfers/101/actions/public-url"): {
+                "url": "https://storage.example.com/b101?sig=abc"
+            },
+        }
+        body = routes.get((self.command, self.path))
+        if body is None:
+            self._send_json(404, {"id": "not_found", "message": "Couldn't find that app."})
+            return
+        self._send_json(200, body)
+        if self.server.close_after_response:
+            self.close_connection = True
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class MockHerokuAPIServer(ThreadingHTTPServer):
+    def __init__(self, close_after_response=False):
+        super().__init__(("127.0.0.1", 0), MockHerokuAPIHandler)
+        self.requests = []
+        self.connections = 0
+        self.close_after_response = close_after_response
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+@pytest.fixture
+def start_api_server():
+    """テスト用APIサーバーを起動し、終了時に停止する"""
+    servers = []
+
+    def start(**kwargs):
+        server = MockHerokuAPIServer(**kwargs)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def create_client(server, token=TOKEN):
+    return HerokuAPIClient(token, platform_url=server.url, postgres_url=server.url, timeout=5)
+
+
+class TestHerokuAPIClient:
+    """HerokuAPIClientクラスのテスト"""
+
+    def test_whoami(self, start_api_server):
+        """正常系: ログイン中のアカウントのメールアドレスを取得する"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            assert client.whoami() == "user@example.com"
+
+    def test_reuses_connection(self, start_api_server):
+        """正常系: 複数のリクエストで同じ接続を使い回す"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            client.whoami()
+            client.list_backups("test-app")
+            client.get_backup("test-app", 101)
+
+        assert len(server.requests) == 3
+        assert server.connections == 1
+
+    def test_reconnects_when_server_closed_connection(self, start_api_server):
+        """正常系: サーバーが接続を閉じた場合は接続し直して続行する"""
+        server = start_api_server(close_after_response=True)
+
+        with create_client(server) as client:
+            client.whoami()
+            client.whoami()
+
+        assert server.connections == 2
+
+    def test_reconnect_failure(self, start_api_server):
+        """異常系: 接続し直しても切断される場合はHerokuAPIError"""
+        server = start_api_server()
+
+        with create_client(server) as client, \
+             patch('http.client.HTTPConnection.getresponse', side_effect=ConnectionResetError("reset")):
+            with pytest.raises(HerokuAPIError) as exc_info:
+                client.whoami()
+
+        assert exc_info.value.status is None
+        assert isinstance(exc_info.value.__cause__, ConnectionResetError)
+        assert client._connections == {}
+
+    def test_capture(self, start_api_server):
+        """正常系: DATABASEのアドオンIDを取得してバックアップを開始する"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            transfer = client.capture("test-app")
+
+        assert transfer["num"] == 102
+        assert server.requests == [
+            ("GET", "/apps/test-app/addon-attachments/DATABASE"),
+            ("POST", f"/client/v11/databases/{DATABASE_ID}/backups"),
+        ]
+
+    def test_list_backups_excludes_restores(self, start_api_server):
+        """正常系: バックアップ以外の転送は一覧に含めない"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            backups = client.list_backups("test-app")
+
+        assert [backup["num"] for backup in backups] == [101]
+
+    def test_get_backup_url(self, start_api_server):
+        """正常系: バックアップの署名付きURLを取得する"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            assert client.get_backup_url("test-app", 101) == "https://storage.example.com/b101?sig=abc"
+
+    def test_unauthorized(self, start_api_server):
+        """異常系: トークンが無効な場合はステータス401のHerokuAPIErrorを送出する"""
+        server = start_api_server()
+
+        with create_client(server, token="expired") as client:
+            with pytest.raises(HerokuAPIError) as exc_info:
+                client.whoami()
+
+        assert exc_info.value.status == 401
+        assert "Invalid credentials provided." in str(exc_info.value)
+
+    def test_unauthorized_invalidates_auth_cache(self, start_api_server, tmp_path):
+        """異常系: APIが401を返した場合はon_unauthorizedでログイン状態のキャッシュを削除する"""
+        server = start_api_server()
+        cache = AuthCache(tmp_path / "auth.json", "hash-1", 12)
+        cache.save("user@example.com")
+
+        client = HerokuAPIClient(
+            "expired", platform_url=server.url, postgres_url=server.url, timeout=5, on_unauthorized=cache.invalidate
+        )
+        with client, pytest.raises(HerokuAPIError):
+            client.list_backups("test-app")
+
+        assert not cache.state_file.exists()
+
+    def test_not_found(self, start_api_server):
+        """異常系: 存在しないアプリはステータス404のHerokuAPIErrorを送出する"""
+        server = start_api_server()
+
+        with create_client(server) as client:
+            with pytest.raises(HerokuAPIError) as exc_info:
+                client.list_backups("unknown-app")
+
+        assert exc_info.value.status == 404
+
+
+class TestBackupId:
+    """バックアップID関連関数のテスト"""
+
+    def test_get_backup_id(self):
+        """正常系: 手動はb、スケジュールはaを番号の前に付ける"""
+        assert get_backup_id({"num": 101, "schedule": None}) == "b101"
+        assert get_backup_id({"num": 102, "schedule": {"uuid": "schedule"}}) == "a102"
+
+    def test_parse_backup_number(self):
+        """正常系: バックアップIDから番号を取得する"""
+        assert parse_backup_number("b101") == 101
+        assert parse_backup_number("a7") == 7
+
+
+class TestLoadApiToken:
+    """load_api_token関数のテスト"""
+
+    def test_reads_netrc(self, tmp_path, monkeypatch):
+        """正常系: netrcファイルのapi.heroku.comのパスワードをトークンとして取得する"""
+        monkeypatch.delenv("HEROKU_API_KEY", raising=False)
+        netrc_file = tmp_path / ".netrc"
+        netrc_file.write_text(
+            "machine api.heroku.com\n  login user@example.com\n  password netrc-token\n"
+            "machine git.heroku.com\n  login user@example.com\n  password git-token\n"
+        )
+        netrc_file.chmod(0o600)
+
+        assert load_api_token(netrc_file) == "netrc-token"
+
+    def test_environment_variable_takes_precedence(self, tmp_path, monkeypatch):
+        """正常系: 環境変数HEROKU_API_KEYがある場合はそちらを使う"""
+        monkeypatch.setenv("HEROKU_API_KEY", "env-token")
+
+        assert load_api_token(tmp_path / ".netrc") == "env-token"
+
+    def test_missing_netrc(self, tmp_path, monkeypatch):
+        """正常系: netrcファイルがない場合はNone"""
+        monkeypatch.delenv("HEROKU_API_KEY", raising=False)
+
+        assert load_api_token(tmp_path / ".netrc") is None
+
+
+class TestGetApiClient:
+    """get_api_client関数のテスト"""
+
+    def test_returns_none_without_token(self):
+        """正常系: トークンがない場合はNone（Heroku CLIを使用）"""
+        with patch('utils.heroku_api.get_use_heroku_api', return_value=True), \
+             patch('utils.heroku_api.load_api_token', return_value=None):
+            assert get_api_client() is None
+
+    def test_returns_none_when_disabled(self):
+        """正常系: use_heroku_apiがfalseの場合はNone"""
+        with patch('utils.heroku_api.get_use_heroku_api', return_value=False), \
+             patch('utils.heroku_api.load_api_token') as mock_load:
+            assert get_api_client() is None
+            mock_load.assert_not_called()
+
+    def test_creates_client_with_token(self):
+        """正常系: トークンがある場合はクライアントを作成する"""
+        with patch('utils.heroku_api.get_use_heroku_api', return_value=True), \
+             patch('utils.heroku_api.load_api_token', return_value=TOKEN):
+            assert isinstance(get_api_client(), HerokuAPIClient)
@@ -0,0 +1,262 @@
+import io
+import subprocess
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from service.heroku_capture import CaptureResult, parse_backup_info, parse_size, record_capture_metrics, run_capture
+from utils.heroku_api import HerokuAPIError
+
+BACKUP_INFO = """=== Backup b101
+Database:         DATABASE
+Started at:       2024-01-15 03:00:12 +0000
+Status:           {status}
+Type:             Manual
+Original DB Size: 120.5MB
+Backup Size:      {size}
+
+=== Backup Logs
+2024-01-15 03:00:13 +0000 pg_dump: reading schemas
+"""
+
+
+def info_result(status, size):
+    return Mock(stdout=BACKUP_INFO.format(status=status, size=size))
+
+
+class FakeCaptureProcess:
+    """指定した回数だけ実行中の状態を返すheroku pg:backups:captureのプロセス"""
+
+    def __init__(self, running_polls, returncode=0, stdout=None):
+        self.stdout = stdout or io.BytesIO(
+            b"Starting backup of postgresql-123... done\nBacking up DATABASE to b101... done\n"
+        )
+        self.running_polls = running_polls
+        self.returncode = None
+        self._final_returncode = returncode
+        self.killed = False
+
+    def wait(self, timeout=None):
+        if self.running_polls > 0:
+            self.running_polls -= 1
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired("heroku", timeout)
+        self.returncode = self._final_returncode
+        if isinstance(self.stdout, PartialLineStream):
+            # プロセスの終了で残りの出力が閉じられる
+            self.stdout.released.set()
+        return self.returncode
+
+    def kill(self):
+        self.killed = True
+
+
+class PartialLineStream:
+    """改行せずにバックアップIDまで出力し、キャプチャの完了まで続きを出力しないストリーム"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.released = threading.Event()
+
+    def read(self, size):
+        if self.chunks:
+            return self.chunks.pop(0)
+        self.released.wait(5)
+        return b""
+
+
+class TestParseSize:
+    """parse_size関数のテスト"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("12.5MB", int(12.5 * 1024 * 1024)),
+        ("1.00GB (90% compression)", 1024 ** 3),
+        ("512.0kB", 512 * 1024),
+        ("0.00B", 0),
+    ])
+    def test_parses_units(self, text, expected):
+        """正常系: 単位付きのサイズをバイト数に変換する"""
+        assert parse_size(text) == expected
+
+    def test_invalid_text(self):
+        """異常系: サイズ表記でない場合はNone"""
+        assert parse_size("pending") is None
+
+
+class TestParseBackupInfo:
+    """parse_backup_info関数のテスト"""
+
+    def test_parses_fields_before_logs(self):
+        """正常系: ログ欄より前の項目を取得する"""
+        fields = parse_backup_info(BACKUP_INFO.format(status="Running", size="5.0MB"))
+
+        assert fields['Status'] == "Running"
+        assert fields['Backup Size'] == "5.0MB"
+        assert fields['Original DB Size'] == "120.5MB"
+        assert '2024-01-15 03' not in fields
+
+
+class TestRunCapture:
+    """run_capture関数のテスト"""
+
+    def test_polls_progress_until_completed(self, caplog):
+        """正常系: 完了までpg:backups:infoで進捗を確認し、ID・サイズ・所要時間を返す"""
+        import logging
+        caplog.set_level(logging.INFO)
+        process = FakeCaptureProcess(running_polls=2)
+        info_results = [
+            info_result("Running", "4.0MB"),
+            info_result("Running", "8.0MB"),
+            info_result("Completed 2024-01-15 03:01:45 +0000", "10.0MB (90% compression)"),
+        ]
+
+        with patch('service.heroku_capture.subprocess.Popen', return_value=process) as mock_popen, \
+             patch('service.heroku_capture.subprocess.run', side_effect=info_results) as mock_run:
+
+            result = run_capture("test-app", poll_interval=0.01, timeout=60)
+
+        assert mock_popen.call_args[0][0] == ["heroku", "pg:backups:capture", "--app", "test-app"]
+        assert mock_run.call_args[0][0] == ["heroku", "pg:backups:info", "b101", "--app", "test-app"]
+        assert result.backup_id == "b101"
+        assert result.size == 10 * 1024 * 1024
+        assert result.duration >= 0
+        assert 'Herokuバックアップ b101 Running: 8.0MB' in caplog.text
+        assert 'Herokuバックアップ作成完了: b101' in caplog.text
+
+    def test_reads_backup_id_before_line_ends(self, caplog):
+        """正常系: 改行されていない出力からバックアップIDを取得し、キャプチャ中に進捗を確認する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        stream = PartialLineStream([
+            b"Starting backup of postgresql-123... done\nBacking up DATABASE to b10",
+            b"1...",
+        ])
+        process = FakeCaptureProcess(running_polls=2, stdout=stream)
+        info_results = [
+            info_result("Running", "4.0MB"),
+            info_result("Running", "8.0MB"),
+            info_result("Completed 2024-01-15 03:01:45 +0000", "10.0MB (90% compression)"),
+        ]
+
+        with patch('service.heroku_capture.subprocess.Popen', return_value=process), \
+             patch('service.heroku_capture.subprocess.run', side_effect=info_results) as mock_run:
+            result = run_capture("test-app", poll_interval=0.05, timeout=60)
+
+        assert result.backup_id == "b101"
+        assert mock_run.call_args_list[0][0][0] == ["heroku", "pg:backups:info", "b101", "--app", "test-app"]
+        assert 'Herokuバックアップ b101 Running: 4.0MB' in caplog.text
+
+    def test_cancels_after_deadline(self):
+        """異常系: 期限を過ぎた場合はキャプチャを取り消してTimeoutErrorを送出する"""
+        process = FakeCaptureProcess(running_polls=100)
+
+        with patch('service.heroku_capture.subprocess.Popen', return_value=process), \
+             patch('service.heroku_capture.subprocess.run', return_value=info_result("Running", "1.0MB")) as mock_run:
+
+            with pytest.raises(TimeoutError):
+                run_capture("test-app", poll_interval=0.01, timeout=0.05)
+
+        assert mock_run.call_args[0][0] == ["heroku", "pg:backups:cancel", "b101", "--app", "test-app"]
+        assert process.killed is True
+
+    def test_failed_capture(self):
+        """異常系: captureが失敗した場合はCalledProcessErrorを送出する"""
+        process = FakeCaptureProcess(running_polls=0, returncode=1)
+
+        with patch('service.heroku_capture.subprocess.Popen', return_value=process), \
+             patch('service.heroku_capture.subprocess.run') as mock_run:
+
+            with pytest.raises(subprocess.CalledProcessError):
+                run_capture("test-app", poll_interval=0.01, timeout=60)
+
+        mock_run.assert_not_called()
+
+
+class TestRunCaptureWithApi:
+    """run_capture関数のテスト（Heroku API）"""
+
+    def _create_client(self, *transfers):
+        client = Mock()
+        client.capture.return_value = {"num": 101, "uuid": "uuid-101", "schedule": None}
+        client.get_backup.side_effect = list(transfers)
+        return client
+
+    def test_polls_processed_bytes(self, caplog):
+        """正常系: APIでバックアップを開始し、完了まで処理済みのバイト数を確認する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        client = self._create_client(
+            {"num": 101, "processed_bytes": 4 * 1024 * 1024, "finished_at": None},
+            {"num": 101, "processed_bytes": 10 * 1024 * 1024, "finished_at": "2024-01-15 03:01:45 +0000",
+             "succeeded": True},
+        )
+
+        with patch('service.heroku_capture.subprocess.Popen') as mock_popen:
+            result = run_capture("test-app", poll_interval=0, timeout=60, client=client)
+
+        mock_popen.assert_not_called()
+        client.capture.assert_called_once_with("test-app")
+        client.get_backup.assert_called_with("test-app", 101)
+        assert result.backup_id == "b101"
+        assert result.size == 10 * 1024 * 1024
+        assert 'Herokuバックアップ b101 Running: 4.0MB' in caplog.text
+
+    def test_failed_backup(self):
+        """異常系: バックアップが失敗した場合はHerokuAPIErrorを送出する"""
+        client = self._create_client(
+            {"num": 101, "processed_bytes": 0, "finished_at": "2024-01-15 03:01:45 +0000", "succeeded": False},
+        )
+
+        with pytest.raises(HerokuAPIError):
+            run_capture("test-app", poll_interval=0, timeout=60, client=client)
+
+    def test_reads_backup_id_before_line_ends(self, caplog):
+        """正常系: 改行されていない出力からバックアップIDを取得し、キャプチャ中に進捗を確認する"""
+        import logging
+        caplog.set_level(logging.INFO)
+        stream = PartialLineStream([
+            b"Starting backup of postgresql-123... done\nBacking up DATABASE to b10",
+            b"1...",
+        ])
+        process = FakeCaptureProcess(running_polls=2, stdout=stream)
+        info_results = [
+            info_result("Running", "4.0MB"),
+            info_result("Running", "8.0MB"),
+            info_result("Completed 2024-01-15 03:01:45 +0000", "10.0MB (90% compression)"),
+        ]
+
+        with patch('service.heroku_capture.subprocess.Popen', return_value=process), \
+             patch('service.heroku_capture.subprocess.run', side_effect=info_results) as mock_run:
+            result = run_capture("test-app", poll_interval=0.05, timeout=60)
+
+        assert result.backup_id == "b101"
+        assert mock_run.call_args_list[0][0][0] == ["heroku", "pg:backups:info", "b101", "--app", "test-app"]
+        assert 'Herokuバックアップ b101 Running: 4.0MB' in caplog.text
+
+    def test_cancels_after_deadline(self):
+        """異常系: 期限を過ぎた場合はAPIで取り消してTimeoutErrorを送出する"""
+        client = self._create_client()
+
+        with pytest.raises(TimeoutError):
+            run_capture("test-app", poll_interval=0.02, timeout=0.01, client=client)
+
+        client.cancel_backup.assert_called_once_with("test-app", "uuid-101")
+
+
+class TestRecordCaptureMetrics:
+    """record_capture_metrics関数のテスト"""
+
+    def test_appends_rows_with_header(self, tmp_path):
+        """正常系: 初回はヘッダーを書き込み、以降は行を追記する"""
+        metrics_file = tmp_path / "capture_metrics.csv"
+
+        record_capture_metrics(metrics_file, "20231201_120000", CaptureResult("b101", 20.0, 40 * 1024 * 1024))
+        record_capture_metrics(metrics_file, "20231202_120000", CaptureResult("b102", 40.0, 40 * 1024 * 1024))
+
+        assert metrics_file.read_text(encoding='utf-8').splitlines() == [
+            "timestamp,backup_id,duration_seconds,size_bytes,mb_per_second",
+            "20231201_120000,b101,20.0,41943040,2.000",
+            "20231202_120000,b102,40.0,41943040,1.000",
+        ]
@@ -1,4 +1,6 @@
+import io
 import subprocess
+import threading
 from unittest.mock import Mock, patch
 
 import pytest
@@ -6,9 +8,20 @@ import pytest
 from service.heroku_login_again import (
     check_heroku_login,
     ensure_heroku_login,
+    execute_heroku_login,
     open_folder_async,
     prompt_heroku_login,
 )
+from utils.auth_cache import AuthCache
+from utils.heroku_api import HerokuAPIError
+
+
+@pytest.fixture(autouse=True)
+def no_api_token(tmp_path):
+    """APIトークンとログイン状態のキャッシュがない状態（Heroku CLIで確認）に固定"""
+    with patch('service.heroku_login_again.get_api_client', return_value=None), \
+         patch('service.heroku_login_again.get_auth_cache', return_value=AuthCache(tmp_path / "auth.json", None, 0)):
+        yield
 
 
 class TestCheckHerokuLogin:
@@ -56,6 +69,93 @@ class TestCheckHerokuLogin:
             assert result is False
 
 
+class TestCheckHerokuLoginWithApi:
+    """check_heroku_login関数のテスト（Heroku API）"""
+
+    def _check(self, client):
+        with patch('service.heroku_login_again.get_api_client', return_value=client), \
+             patch('service.heroku_login_again.subprocess.run', return_value=Mock(returncode=0)) as mock_run:
+            return check_heroku_login(), mock_run
+
+    def test_logged_in(self):
+        """正常系: whoamiが成功した場合はCLIを起動せずにTrue"""
+        client = Mock()
+        client.__enter__ = Mock(return_value=client)
+        client.__exit__ = Mock(return_value=False)
+        client.whoami.return_value = "user@example.com"
+
+        result, mock_run = self._check(client)
+
+        assert result is True
+        mock_run.assert_not_called()
+
+    def test_unauthorized(self):
+        """異常系: トークンが無効な場合はFalse"""
+        client = Mock()
+        client.__enter__ = Mock(return_value=client)
+        client.__exit__ = Mock(return_value=False)
+        client.whoami.side_effect = HerokuAPIError("Heroku APIエラー: HTTP 401", 401)
+
+        result, mock_run = self._check(client)
+
+        assert result is False
+        mock_run.assert_not_called()
+
+    def test_connection_error_falls_back_to_cli(self):
+        """異常系: APIに接続できない場合はHeroku CLIで確認する"""
+        client = Mock()
+        client.__enter__ = Mock(return_value=client)
+        client.__exit__ = Mock(return_value=False)
+        client.whoami.side_effect = ConnectionRefusedError("refused")
+
+        result, mock_run = self._check(client)
+
+        assert result is True
+        mock_run.assert_called_once()
+
+
+class TestCheckHerokuLoginCache:
+    """check_heroku_login関数のテスト（ログイン状態のキャッシュ）"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = AuthCache(tmp_path / "auth.json", "hash-1", 12)
+        with patch('service.heroku_login_again.get_auth_cache', return_value=cache):
+            yield cache
+
+    def test_fresh_cache_skips_subprocess(self, cache):
+        """正常系: キャッシュが有効な場合はwhoamiを実行しない"""
+        cache.save("user@example.com")
+
+        with patch('service.heroku_login_again.subprocess.run') as mock_run, \
+             patch('service.heroku_login_again.get_api_client') as mock_client:
+            result = check_heroku_login()
+
+        assert result is True
+        mock_run.assert_not_called()
+        mock_client.assert_not_called()
+
+    def test_saves_after_cli_check(self, cache):
+        """正常系: CLIで確認したログイン状態を保存し、次回はCLIを起動しない"""
+        with patch('service.heroku_login_again.subprocess.run',
+                   return_value=Mock(returncode=0, stdout="user@example.com\n")) as mock_run:
+            assert check_heroku_login() is True
+            assert check_heroku_login() is True
+
+        mock_run.assert_called_once()
+        assert cache.get_identity() == "user@example.com"
+
+    def test_invalidates_when_logged_out(self, cache):
+        """正常系: CLIでログイン切れを検出した場合はキャッシュを削除する"""
+        cache.save("user@example.com")
+        cache.ttl_hours = 0
+
+        with patch('service.heroku_login_again.subprocess.run', return_value=Mock(returncode=1)):
+            assert check_heroku_login() is False
+
+        assert not cache.state_file.exists()
+
+
 class TestOpenFolderAsync:
     """open_folder_async関数のテスト"""
 
@@ -63,8 +163,7 @@ class TestOpenFolderAsync:
         """正常系: Windows環境でフォルダを開く"""
         folder_path = str(tmp_path)
 
-        with patch('service.heroku_login_again.time.sleep'), \
-             patch('service.heroku_login_again.subprocess.run') as mock_run:
+        with patch('service.heroku_login_again.subprocess.run') as mock_run:
 
             open_folder_async(folder_path)
 
@@ -75,18 +174,16 @@ class TestOpenFolderAsync:
         """異常系: フォルダが存在しない"""
         non_existent_path = "/non/existent/path"
 
-        with patch('service.heroku_login_again.time.sleep'):
-            open_folder_async(non_existent_path)
+        open_folder_async(non_existent_path)
 
-            captured = capsys.readouterr()
-            assert 'フォルダが見つかりません' in captured.out
+        captured = capsys.readouterr()
+        assert 'フォルダが見つかりません' in captured.out
 
     def test_open_folder_async_subprocess_error(self, tmp_path, capsys):
         """異常系: subprocess実行時にエラーが発生"""
         folder_path = str(tmp_path)
 
-        with patch('service.heroku_login_again.time.sleep'), \
-             patch('service.heroku_login_again.subprocess.run', side_effect=Exception("Process error")):
+        with patch('service.heroku_login_again.subprocess.run', side_effect=Exception("Process error")):
 
             open_folder_async(folder_path)
 
@@ -94,125 +191,189 @@ class TestOpenFolderAsync:
             assert 'フォルダを開く際にエラーが発生' in captured.out
 
 
-class TestPromptHerokuLogin:
-    """prompt_heroku_login関数のテスト"""
+LOGIN_OUTPUT = (
+    b"heroku: Press any key to open up the browser to login or q to exit: "
+    b"Opening browser to https://cli-auth.heroku.com/auth/cli/browser/abc\n"
+    b"Logging in... done\n"
+    b"Logged in as user@example.com\n"
+)
 
-    @pytest.fixture
-    def mock_config(self):
-        """モック設定"""
-        config = {
-            "Paths": {
-                "executable_file_path": "C:\\test\\path"
-            }
-        }
-        return config
 
-    def test_prompt_heroku_login_success(self, mock_config, caplog):
-        """正常系: Herokuログインプロセスが成功"""
-        import logging
-        caplog.set_level(logging.INFO)
+class FakeLoginProcess:
+    """heroku loginのプロセス。stdinへの書き込みを記録する"""
 
-        mock_process = Mock()
-        mock_process.returncode = 0
-        mock_process.communicate.return_value = ("Success", "")
-        mock_process.stdin = Mock()
+    def __init__(self, output, returncode=0, exits=True):
+        self.args = ["heroku", "login"]
+        self.stdout = io.BytesIO(output)
+        self.stdin = Mock()
+        self.returncode = returncode
+        self.exits = exits
+        self.waited = False
+        self.killed = False
+        self.terminated = False
 
-        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
-             patch('service.heroku_login_again.threading.Thread') as mock_thread, \
-             patch('service.heroku_login_again.subprocess.Popen', return_value=mock_process), \
-             patch('service.heroku_login_again.time.sleep'):
+    def wait(self, timeout=None):
+        if not self.exits and not self.terminated:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        self.waited = True
+        return self.returncode
 
-            prompt_heroku_login()
+    def kill(self):
+        self.killed = True
+
+    def terminate(self):
+        self.terminated = True
+
+
+class BlockingStream:
+    """何も出力せずに読み込みを待たせるストリーム"""
+
+    def __init__(self):
+        self.released = threading.Event()
+
+    def read(self, size):
+        self.released.wait(5)
+        return b""
 
-            assert 'Heroku CLIでログインを開始' in caplog.text
-            assert 'ログインプロセスが完了しました' in caplog.text
 
-    def test_prompt_heroku_login_failure(self, mock_config, caplog):
-        """異常系: Herokuログインプロセスが失敗"""
+class TestExecuteHerokuLogin:
+    """execute_heroku_login関数のテスト"""
+
+    def test_responds_to_browser_prompt(self, caplog):
+        """正常系: プロンプトが表示されたらEnterキーを送信し、ログイン完了の表示で戻る"""
+        import logging
+        caplog.set_level(logging.INFO)
+        process = FakeLoginProcess(LOGIN_OUTPUT)
+        on_browser_prompt = Mock()
+
+        with patch('service.heroku_login_again.subprocess.Popen', return_value=process) as mock_popen:
+            result = execute_heroku_login(on_browser_prompt)
+
+        assert result is True
+        assert mock_popen.call_args[1]['stderr'] == subprocess.STDOUT
+        process.stdin.write.assert_called_once_with(b"\n")
+        on_browser_prompt.assert_called_once()
+        assert 'ログインプロセスが完了しました: user@example.com' in caplog.text
+        assert 'Herokuへの再ログインにかかった時間' in caplog.text
+        assert process.waited is True
+        assert process.terminated is False
+
+    def test_terminates_process_not_exiting_after_login(self, caplog):
+        """正常系: ログイン完了後にプロセスが終了しない場合は終了させて回収する"""
         import logging
         caplog.set_level(logging.WARNING)
+        process = FakeLoginProcess(LOGIN_OUTPUT, exits=False)
 
-        mock_process = Mock()
-        mock_process.returncode = 1
-        mock_process.communicate.return_value = ("", "Login failed")
-        mock_process.stdin = Mock()
+        with patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            result = execute_heroku_login()
 
-        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
-             patch('service.heroku_login_again.threading.Thread'), \
-             patch('service.heroku_login_again.subprocess.Popen', return_value=mock_process), \
-             patch('service.heroku_login_again.time.sleep'):
+        assert result is True
+        assert process.terminated is True
+        assert process.waited is True
+        assert 'ログインプロセスが終了しないため終了させます' in caplog.text
 
-            prompt_heroku_login()
+    def test_prompt_split_across_chunks(self):
+        """正常系: プロンプトが複数回に分けて出力されても検出する"""
+        process = FakeLoginProcess(LOGIN_OUTPUT)
 
-            assert 'ログインプロセスが終了しました' in caplog.text
+        with patch('service.heroku_login_again.LOGIN_READ_SIZE', 7), \
+             patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            result = execute_heroku_login()
 
-    def test_prompt_heroku_login_timeout(self, mock_config, caplog):
-        """異常系: ログインがタイムアウト"""
+        assert result is True
+        process.stdin.write.assert_called_once_with(b"\n")
+
+    def test_process_exits_without_success_message(self, caplog):
+        """異常系: ログイン完了が表示されずに失敗で終了した場合はFalse"""
+        import logging
+        caplog.set_level(logging.WARNING)
+        process = FakeLoginProcess(" ▸    Login failed\n".encode(), returncode=1)
+
+        with patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            result = execute_heroku_login()
+
+        assert result is False
+        process.stdin.write.assert_not_called()
+        assert 'ログインプロセスが終了しました' in caplog.text
+
+    def test_timeout(self, caplog):
+        """異常系: 期限までにログインが完了しない場合はプロセスを終了してFalse"""
         import logging
         caplog.set_level(logging.ERROR)
+        process = FakeLoginProcess(b"")
+        process.stdout = BlockingStream()
 
-        mock_process = Mock()
-        mock_process.communicate.side_effect = subprocess.TimeoutExpired('cmd', 120)
-        mock_process.stdin = Mock()
+        with patch('service.heroku_login_again.LOGIN_TIMEOUT_SECONDS', 0.05), \
+             patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            result = execute_heroku_login()
 
-        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
-             patch('service.heroku_login_again.threading.Thread'), \
-             patch('service.heroku_login_again.subprocess.Popen', return_value=mock_process), \
-             patch('service.heroku_login_again.time.sleep'):
+        process.stdout.released.set()
+        assert result is False
+        assert process.killed is True
+        assert 'ログインがタイムアウトしました' in caplog.text
 
-            prompt_heroku_login()
+    def test_stdin_write_error(self):
+        """異常系: stdin書き込み時にエラーが発生しても続行"""
+        process = FakeLoginProcess(LOGIN_OUTPUT)
+        process.stdin.write.side_effect = BrokenPipeError("closed")
 
-            assert 'ログインがタイムアウトしました' in caplog.text
-            mock_process.kill.assert_called_once()
+        with patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            assert execute_heroku_login() is True
 
-    def test_prompt_heroku_login_exception(self, mock_config, caplog):
+    def test_exception(self, caplog):
         """異常系: 予期しない例外が発生"""
         import logging
         caplog.set_level(logging.ERROR)
 
-        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
-             patch('service.heroku_login_again.threading.Thread'), \
-             patch('service.heroku_login_again.subprocess.Popen', side_effect=Exception("Unexpected error")), \
-             patch('service.heroku_login_again.time.sleep'):
+        with patch('service.heroku_login_again.subprocess.Popen', side_effect=Exception("Unexpected error")):
+            assert execute_heroku_login() is False
 
-            prompt_heroku_login()
+        assert 'ログイン処理中にエラーが発生しました' in caplog.text
 
-            assert 'ログイン処理中にエラーが発生しました' in caplog.text
 
-    def test_prompt_heroku_login_stdin_write_error(self, mock_config):
-        """異常系: stdin書き込み時にエラーが発生しても続行"""
-        mock_process = Mock()
-        mock_process.returncode = 0
-        mock_process.communicate.return_value = ("Success", "")
-        mock_process.stdin = Mock()
-        mock_process.stdin.write.side_effect = Exception("Write error")
-
-        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
-             patch('service.heroku_login_again.threading.Thread'), \
-             patch('service.heroku_login_again.subprocess.Popen', return_value=mock_process), \
-             patch('service.heroku_login_again.time.sleep'):
+class TestPromptHerokuLogin:
+    """prompt_heroku_login関数のテスト"""
 
-            prompt_heroku_login()
+    @pytest.fixture
+    def mock_config(self):
+        """モック設定"""
+        config = {
+            "Paths": {
+                "executable_file_path": "C:\\test\\path"
+            }
+        }
+        return config
 
-    def test_prompt_heroku_login_thread_creation(self, mock_config):
-        """正常系: フォルダオープン用のスレッドが作成される"""
-        mock_process = Mock()
-        mock_process.returncode = 0
-        mock_process.communicate.return_value = ("Success", "")
-        mock_process.stdin = Mock()
+    def test_opens_folder_when_browser_prompt_appears(self, mock_config):
+        """正常系: ブラウザのプロンプトが表示されたらフォルダを開くスレッドを開始する"""
+        process = FakeLoginProcess(LOGIN_OUTPUT)
 
         with patch('service.heroku_login_again.load_config', return_value=mock_config), \
              patch('service.heroku_login_again.threading.Thread') as mock_thread_class, \
-             patch('service.heroku_login_again.subprocess.Popen', return_value=mock_process), \
-             patch('service.heroku_login_again.time.sleep'):
+             patch('service.heroku_login_again.LoginOutputReader') as mock_reader_class, \
+             patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+            mock_reader_class.return_value.queue.get.side_effect = [LOGIN_OUTPUT.decode(), None]
 
             prompt_heroku_login()
 
             mock_thread_class.assert_called_once()
+            assert mock_thread_class.call_args[1]['args'] == ("C:\\test\\path",)
             thread_instance = mock_thread_class.return_value
             assert thread_instance.daemon is True
             thread_instance.start.assert_called_once()
 
+    def test_does_not_open_folder_without_prompt(self, mock_config):
+        """正常系: プロンプトが表示されずに終了した場合はフォルダを開かない"""
+        process = FakeLoginProcess(b"Logged in as user@example.com\n")
+
+        with patch('service.heroku_login_again.load_config', return_value=mock_config), \
+             patch('service.heroku_login_again.open_folder_in_background') as mock_open, \
+             patch('service.heroku_login_again.subprocess.Popen', return_value=process):
+
+            prompt_heroku_login()
+
+            mock_open.assert_not_called()
+
 
 class TestEnsureHerokuLogin:
     """ensure_heroku_login関数のテスト"""
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.http_download import download_segmented, download_with_resume, get_part_path
+
+CONTENT = os.urandom(256 * 1024 + 123)
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Rangeリクエストに対応し、指定したバイト数で接続を切断できるテスト用サーバー"""
+
+    server: 'RangeServer'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        content = self.server.content
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and self.server.support_range:
+            start = int(range_header.removeprefix('bytes=').split('-')[0])
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(content)}")
+                self.end_headers()
+                return
+            end_text = range_header.removeprefix('bytes=').split('-')[1]
+            end = min(int(end_text), len(content) - 1) if end_text else len(content) - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(content)}")
+        else:
+            end = len(content) - 1
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        body = content[start:end + 1]
+        if self.server.drop_after and len(body) > self.server.drop_after:
+            # 途中で接続を切断する（1回だけ）
+            body = body[:self.server.drop_after]
+            self.server.drop_after = 0
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class RangeServer(ThreadingHTTPServer):
+    def __init__(self, content, support_range=True, drop_after=0):
+        super().__init__(('127.0.0.1', 0), RangeRequestHandler)
+        self.content = content
+        self.support_range = support_range
+        self.drop_after = drop_after
+        self.requests = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/backup.dump"
+
+
+@pytest.fixture
+def start_server():
+    """テスト用HTTPサーバーを起動し、終了時に停止する"""
+    servers = []
+
+    def start(**kwargs):
+        server = RangeServer(CONTENT, **kwargs)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestDownloadWithResume:
+    """download_with_resume関数のテスト"""
+
+    def test_downloads_and_renames(self, tmp_path, start_server):
+        """正常系: 全体をダウンロードし、.partファイルから置き換える"""
+        server = start_server()
+        destination = tmp_path / "heroku_backup.dump"
+
+        result = download_with_resume(server.url, destination, chunk_size=64 * 1024, retry_wait=0)
+
+        assert result.size == len(CONTENT)
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert destination.read_bytes() == CONTENT
+        assert not get_part_path(destination).exists()
+        assert server.requests == [None]
+
+    def test_resumes_with_range_after_disconnect(self, tmp_path, start_server):
+        """正常系: 接続が切れた場合は受信済みのバイト以降をRangeで取得する"""
+        server = start_server(drop_after=100 * 1024)
+        destination = tmp_path / "heroku_backup.dump"
+
+        download_with_resume(server.url, destination, chunk_size=16 * 1024, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+        assert server.requests[0] is None
+        assert server.requests[-1].startswith("bytes=")
+        assert int(server.requests[-1].removeprefix("bytes=").rstrip("-")) > 0
+
+    def test_resumes_existing_part_file(self, tmp_path, start_server):
+        """正常系: 前回の実行で残った.partファイルの続きから取得する"""
+        server = start_server()
+        destination = tmp_path / "heroku_backup.dump"
+        get_part_path(destination).write_bytes(CONTENT[:1000])
+
+        result = download_with_resume(server.url, destination, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+        assert server.requests == ["bytes=1000-"]
+        # 前回書き込んだ部分もハッシュに含まれる
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+    def test_completed_part_file(self, tmp_path, start_server):
+        """正常系: .partファイルが全体を受信済みの場合はそのまま置き換える"""
+        server = start_server()
+        destination = tmp_path / "heroku_backup.dump"
+        get_part_path(destination).write_bytes(CONTENT)
+
+        download_with_resume(server.url, destination, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+
+    def test_resume_with_compression_hashes_original_content(self, tmp_path, start_server):
+        """正常系: 圧縮しながら保存し、途中で切断されても圧縮前の内容のハッシュが一致する"""
+        server = start_server(drop_after=100 * 1024)
+        destination = tmp_path / "heroku_backup.dump.gz"
+
+        result = download_with_resume(server.url, destination, chunk_size=16 * 1024, retry_wait=0, compression='gzip')
+
+        assert gzip.decompress(destination.read_bytes()) == CONTENT
+        assert result.size == len(CONTENT)
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+    def test_restarts_when_range_not_supported(self, tmp_path, start_server):
+        """正常系: Rangeに対応していないサーバーでは最初から取得し直す"""
+        server = start_server(support_range=False)
+        destination = tmp_path / "heroku_backup.dump"
+        get_part_path(destination).write_bytes(b"stale")
+
+        download_with_resume(server.url, destination, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+
+    def test_gives_up_after_max_retries(self, tmp_path):
+        """異常系: 再試行回数を超えた場合はConnectionErrorを送出し、ダウンロード先のファイルは作成しない"""
+        destination = tmp_path / "heroku_backup.dump"
+
+        with pytest.raises(ConnectionError):
+            download_with_resume("http://127.0.0.1:9/backup.dump", destination, max_retries=1, retry_wait=0)
+
+        assert not destination.exists()
+
+
+class TestDownloadSegmented:
+    """download_segmented関数のテスト"""
+
+    def test_downloads_ranges_in_parallel(self, tmp_path, start_server):
+        """正常系: 指定した接続数のバイト範囲に分けて取得し、元のファイルと一致する"""
+        server = start_server()
+        destination = tmp_path / "heroku_backup.dump"
+
+        result = download_segmented(server.url, destination, connections=4, chunk_size=16 * 1024, retry_wait=0)
+
+        assert result.size == len(CONTENT)
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert destination.read_bytes() == CONTENT
+        assert not get_part_path(destination).exists()
+        # 先頭1バイトのサイズ確認と4つの範囲
+        assert len(server.requests) == 5
+        assert server.requests[0] == "bytes=0-0"
+        assert server.requests[1:].count(None) == 0
+
+    def test_retries_dropped_segment(self, tmp_path, start_server):
+        """正常系: 途中で切断された範囲は受信済みの位置から再取得する"""
+        server = start_server(drop_after=10 * 1024)
+        destination = tmp_path / "heroku_backup.dump"
+
+        download_segmented(server.url, destination, connections=3, chunk_size=4 * 1024, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+        # サイズ確認・3つの範囲・切断された範囲の再取得
+        assert len(server.requests) == 5
+
+    def test_compresses_after_segmented_download(self, tmp_path, start_server):
+        """正常系: 分割ダウンロード後に圧縮し、一時ファイルを残さない"""
+        server = start_server()
+        destination = tmp_path / "heroku_backup.dump.gz"
+
+        result = download_segmented(server.url, destination, connections=4, retry_wait=0, compression='gzip')
+
+        assert gzip.decompress(destination.read_bytes()) == CONTENT
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert not get_part_path(destination).exists()
+
+    def test_falls_back_without_range_support(self, tmp_path, start_server):
+        """正常系: Rangeに対応していないサーバーでは1本の接続でダウンロードする"""
+        server = start_server(support_range=False)
+        destination = tmp_path / "heroku_backup.dump"
+
+        download_segmented(server.url, destination, connections=4, retry_wait=0)
+
+        assert destination.read_bytes() == CONTENT
+        assert server.requests == ["bytes=0-0", None]
@@ -0,0 +1,50 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from utils.json_state import load_json_state, save_json_section, save_json_state
+
+
+class TestLoadJsonState:
+    """load_json_state関数のテスト"""
+
+    def test_missing_file(self, tmp_path):
+        """正常系: ファイルがない場合は空"""
+        assert load_json_state(tmp_path / "state.json") == {}
+
+    def test_loads_saved_state(self, tmp_path):
+        """正常系: 保存した内容を読み込む"""
+        path = tmp_path / "state.json"
+        save_json_state(path, {"users": {"value": "日本語"}})
+
+        assert load_json_state(path) == {"users": {"value": "日本語"}}
+        assert not path.with_name("state.json.part").exists()
+
+
+class TestSaveJsonState:
+    """save_json_state関数のテスト"""
+
+    def test_keeps_previous_state_when_write_fails(self, tmp_path):
+        """異常系: 書き込み途中で失敗しても前回の状態ファイルは壊れない"""
+        path = tmp_path / "state.json"
+        save_json_state(path, {"users": 1})
+
+        with patch('utils.json_state.json.dump', side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                save_json_state(path, {"users": 2})
+
+        assert json.loads(path.read_text(encoding='utf-8')) == {"users": 1}
+
+
+class TestSaveJsonSection:
+    """save_json_section関数のテスト"""
+
+    def test_keeps_other_sections(self, tmp_path):
+        """正常系: 他のセクションを残したまま指定したセクションを置き換える"""
+        path = tmp_path / "state.json"
+        save_json_state(path, {"csv": {"users": 1}, "json": {"users": 1}})
+
+        save_json_section(path, "csv", {"users": 2})
+
+        assert load_json_state(path) == {"csv": {"users": 2}, "json": {"users": 1}}
@@ -0,0 +1,45 @@
+import os
+import time
+from unittest.mock import patch
+
+from utils.log_rotation import cleanup_old_logs
+
+
+class TestCleanupOldLogs:
+    """cleanup_old_logs関数のテスト"""
+
+    @staticmethod
+    def make_log(path, days_ago):
+        path.write_text("log\n", encoding='utf-8')
+        modified_at = time.time() - days_ago * 24 * 60 * 60
+        os.utime(path, (modified_at, modified_at))
+        return path
+
+    def test_deletes_old_rotated_logs(self, tmp_path, caplog):
+        """正常系: 保持期間を超えたローテーション済みのログだけを削除し、現在のログは残す"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        main_log = self.make_log(tmp_path / "HerokuDatabaseBackup.log", 40)
+        old_log = self.make_log(tmp_path / "HerokuDatabaseBackup.log.2024-01-01.log", 40)
+        recent_log = self.make_log(tmp_path / "HerokuDatabaseBackup.log.2024-02-01.log", 5)
+
+        with patch('utils.log_rotation.get_cleanup_workers', return_value=2):
+            cleanup_old_logs(tmp_path, 30, "HerokuDatabaseBackup")
+
+        assert main_log.exists()
+        assert not old_log.exists()
+        assert recent_log.exists()
+        assert '古いログファイルを削除しました: HerokuDatabaseBackup.log.2024-01-01.log' in caplog.text
+
+    def test_dry_run_keeps_files(self, tmp_path, caplog):
+        """正常系: ドライランでは削除対象をログに出力するだけで削除しない"""
+        import logging
+        caplog.set_level(logging.INFO)
+
+        old_log = self.make_log(tmp_path / "HerokuDatabaseBackup.log.2024-01-01.log", 40)
+
+        cleanup_old_logs(tmp_path, 30, "HerokuDatabaseBackup", dry_run=True)
+
+        assert old_log.exists()
+        assert '[ドライラン] 削除対象のログファイル: 1件' in caplog.text
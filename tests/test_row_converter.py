@@ -0,0 +1,112 @@
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from unittest.mock import MagicMock
+
+import pytz
+
+from utils.row_converter import RowEncoder, get_converter
+
+
+class TestGetConverter:
+    """get_converter関数のテスト"""
+
+    def test_get_converter_plain_types(self):
+        """正常系: 変換不要な型はNoneを返す"""
+        for type_code in [16, 20, 23, 25, 1043, 3802]:
+            assert get_converter(type_code) is None
+
+    def test_get_converter_unknown_type(self):
+        """正常系: 未知の型は値から判定する変換関数を返す"""
+        converter = get_converter(1115)  # timestamp[]
+        assert converter is not None
+        assert converter([datetime.datetime(2023, 12, 1, 12)]) == ['2023-12-01T12:00:00']
+
+
+class TestRowEncoder:
+    """RowEncoderクラスのテスト"""
+
+    def test_encode_postgres_types(self):
+        """正常系: PostgreSQLの各型が情報を失わずに変換される"""
+        jst = pytz.timezone('Asia/Tokyo')
+        keys = ['id', 'amount', 'day', 'created_at', 'uid', 'payload', 'elapsed', 'tags']
+        type_codes = [23, 1700, 1082, 1184, 2950, 17, 1186, 1009]
+        encoder = RowEncoder(keys, type_codes)
+        row = (
+            1,
+            decimal.Decimal('12345678901234567890.123456789'),
+            datetime.date(2023, 12, 1),
+            jst.localize(datetime.datetime(2023, 12, 1, 12, 30, 0, 123456)),
+            uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            memoryview(b'\x00\xffbinary'),
+            datetime.timedelta(days=1, seconds=3661, microseconds=500000),
+            ['a', 'b'],
+        )
+
+        data = json.loads(encoder.encode(row))
+
+        assert data['id'] == 1
+        assert decimal.Decimal(data['amount']) == row[1]
+        assert datetime.date.fromisoformat(data['day']) == row[2]
+        assert datetime.datetime.fromisoformat(data['created_at']) == row[3]
+        assert uuid.UUID(data['uid']) == row[4]
+        assert base64.b64decode(data['payload']) == b'\x00\xffbinary'
+        assert data['elapsed'] == 'P1DT3661.500000S'
+        assert data['tags'] == ['a', 'b']
+
+    def test_encode_non_finite_floats(self):
+        """正常系: NaN・無限大は有効なJSONになるよう文字列で出力する"""
+        encoder = RowEncoder(['ratio', 'minimum', 'samples'], [701, 700, 1022])
+        row = (float('nan'), float('-inf'), [1.5, float('inf')])
+
+        text = encoder.encode(row)
+
+        assert json.loads(text) == {'ratio': 'NaN', 'minimum': '-Infinity', 'samples': [1.5, 'Infinity']}
+        assert encoder.encode((0.25, None, [])) == '{"ratio": 0.25, "minimum": null, "samples": []}'
+
+    def test_encode_bytearray(self):
+        """正常系: 型が分からない列のbytearrayもBase64で出力する"""
+        encoder = RowEncoder(['raw'])
+
+        assert json.loads(encoder.encode((bytearray(b'\x00\x01'),))) == {'raw': 'AAE='}
+
+    def test_encode_negative_interval(self):
+        """正常系: 負のintervalも符号付きで変換される"""
+        encoder = RowEncoder(['elapsed'], [1186])
+
+        data = json.loads(encoder.encode((-datetime.timedelta(seconds=90),)))
+
+        assert data['elapsed'] == '-P0DT90.000000S'
+
+    def test_encode_keeps_none(self):
+        """正常系: NULLは変換せずnullとして出力される"""
+        encoder = RowEncoder(['created_at', 'amount'], [1114, 1700])
+
+        assert json.loads(encoder.encode((None, None))) == {'created_at': None, 'amount': None}
+
+    def test_only_non_plain_columns_have_converters(self):
+        """正常系: 変換が必要な列にだけ変換関数が割り当てられる"""
+        encoder = RowEncoder(['id', 'name', 'created_at'], [23, 25, 1114])
+
+        assert [index for index, _ in encoder.converters] == [2]
+
+    def test_falls_back_when_type_codes_missing(self):
+        """正常系: 型情報がない場合は値から判定して変換する"""
+        encoder = RowEncoder(['id', 'created_at', 'amount'])
+        row = (1, datetime.datetime(2023, 12, 1, 12), decimal.Decimal('1.10'))
+
+        assert encoder.convert(row) == {'id': 1, 'created_at': '2023-12-01T12:00:00', 'amount': '1.10'}
+
+    def test_from_result_uses_cursor_description(self):
+        """正常系: カーソルの列情報から型を取得する"""
+        result = MagicMock()
+        result.keys.return_value = ['id', 'created_at']
+        result.cursor.description = [('id', 23, None, None, None, None, None),
+                                     ('created_at', 1114, None, None, None, None, None)]
+
+        encoder = RowEncoder.from_result(result)
+
+        assert encoder.keys == ['id', 'created_at']
+        assert [index for index, _ in encoder.converters] == [1]
@@ -0,0 +1,183 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from service.table_export import export_engine, export_tables, removing_partial_file, snapshot_scope
+
+
+class TestExportTables:
+    """export_tables関数のテスト"""
+
+    def test_export_tables_serial_uses_single_connection(self, capsys):
+        """正常系: ワーカー数1の場合は1本の接続で順番にエクスポートする"""
+        engine = MagicMock()
+        mock_conn = engine.connect.return_value.__enter__.return_value
+        exported = []
+
+        def export_table(conn, table):
+            exported.append((conn, table))
+            return "1件"
+
+        results = export_tables(engine, ['a', 'b', 'c'], export_table)
+
+        assert results == {'a': True, 'b': True, 'c': True}
+        assert exported == [(mock_conn, 'a'), (mock_conn, 'b'), (mock_conn, 'c')]
+        assert engine.connect.call_count == 1
+        captured = capsys.readouterr()
+        assert '✅ a: 1件' in captured.out
+
+    def test_export_tables_serial_rolls_back_after_failure(self, capsys):
+        """異常系: 失敗したテーブルのトランザクションを破棄して続行する"""
+        engine = MagicMock()
+        mock_conn = engine.connect.return_value.__enter__.return_value
+
+        def export_table(conn, table):
+            if table == 'b':
+                raise Exception("Table does not exist")
+            return "1件"
+
+        results = export_tables(engine, ['a', 'b', 'c'], export_table)
+
+        assert results == {'a': True, 'b': False, 'c': True}
+        mock_conn.rollback.assert_called_once()
+        captured = capsys.readouterr()
+        assert '❌ b: Table does not exist' in captured.out
+
+    def test_export_tables_parallel_runs_concurrently(self, capsys):
+        """正常系: ワーカー数分のテーブルが同時にエクスポートされる"""
+        engine = MagicMock()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def export_table(conn, table):
+            # 3テーブルが同時に実行されていなければタイムアウトする
+            barrier.wait()
+            return f"{table}完了"
+
+        results = export_tables(engine, ['a', 'b', 'c'], export_table, workers=3)
+
+        assert results == {'a': True, 'b': True, 'c': True}
+        assert engine.connect.call_count == 3
+        captured = capsys.readouterr()
+        assert captured.out.index('✅ a') < captured.out.index('✅ b') < captured.out.index('✅ c')
+
+    def test_export_tables_parallel_reports_failures(self, capsys):
+        """異常系: 並列実行時も失敗したテーブルが報告される"""
+        engine = MagicMock()
+
+        def export_table(conn, table):
+            if table == 'b':
+                raise Exception("Permission denied")
+            return "1件"
+
+        results = export_tables(engine, ['a', 'b', 'c'], export_table, workers=2)
+
+        assert results == {'a': True, 'b': False, 'c': True}
+        captured = capsys.readouterr()
+        assert '❌ b: Permission denied' in captured.out
+
+    def test_export_tables_applies_snapshot_to_each_connection(self):
+        """正常系: 並列実行時は各ワーカーの接続でスナップショットを参照する"""
+        engine = MagicMock()
+
+        with patch('service.table_export.begin_snapshot') as mock_begin:
+            export_tables(engine, ['a', 'b', 'c'], lambda conn, table: "1件", workers=3,
+                          snapshot_id="00000003-0000001B-1")
+
+            assert mock_begin.call_count == 3
+            for call in mock_begin.call_args_list:
+                assert call[0][1] == "00000003-0000001B-1"
+
+    def test_export_tables_reapplies_snapshot_after_rollback(self):
+        """正常系: ロールバック後もスナップショットを参照し直す"""
+        engine = MagicMock()
+
+        def export_table(conn, table):
+            if table == 'a':
+                raise Exception("Table does not exist")
+            return "1件"
+
+        with patch('service.table_export.begin_snapshot') as mock_begin:
+            export_tables(engine, ['a', 'b'], export_table, snapshot_id="00000003-0000001B-1")
+
+            assert mock_begin.call_count == 2
+
+
+class TestSnapshotScope:
+    """snapshot_scope関数のテスト"""
+
+    def test_snapshot_scope_uses_given_snapshot(self):
+        """正常系: 呼び出し元のスナップショットIDをそのまま使う"""
+        engine = MagicMock()
+
+        with patch('service.table_export.exported_snapshot') as mock_exported:
+            with snapshot_scope(engine, "00000003-0000001B-1", consistent=True) as snapshot_id:
+                assert snapshot_id == "00000003-0000001B-1"
+
+            mock_exported.assert_not_called()
+
+    def test_snapshot_scope_exports_snapshot_in_consistent_mode(self):
+        """正常系: 一貫性モードではスナップショットをエクスポートする"""
+        engine = MagicMock()
+
+        with patch('service.table_export.exported_snapshot') as mock_exported:
+            mock_exported.return_value.__enter__.return_value = "00000003-0000001B-1"
+            with snapshot_scope(engine, None, consistent=True) as snapshot_id:
+                assert snapshot_id == "00000003-0000001B-1"
+
+            mock_exported.assert_called_once_with(engine)
+
+    def test_snapshot_scope_disabled(self):
+        """正常系: 一貫性モードでなければスナップショットを使わない"""
+        with snapshot_scope(MagicMock(), None, consistent=False) as snapshot_id:
+            assert snapshot_id is None
+
+
+class TestExportEngine:
+    """export_engine関数のテスト"""
+
+    def test_uses_shared_engine(self):
+        """正常系: 共有エンジンが渡された場合は作成も破棄もしない"""
+        engine = MagicMock()
+
+        with patch('service.table_export.create_engine') as mock_create_engine:
+            with export_engine("postgresql://localhost/db", engine, 4) as active_engine:
+                assert active_engine is engine
+
+        mock_create_engine.assert_not_called()
+        engine.dispose.assert_not_called()
+
+    def test_creates_and_disposes_owned_engine(self):
+        """正常系: ワーカー数とスナップショット用の接続を合わせたプールで作成し、失敗しても破棄する"""
+        with patch('service.table_export.create_engine') as mock_create_engine:
+            with pytest.raises(RuntimeError):
+                with export_engine("postgresql://localhost/db", None, 4) as active_engine:
+                    assert active_engine is mock_create_engine.return_value
+                    raise RuntimeError("export failed")
+
+        assert mock_create_engine.call_args[1]['pool_size'] == 5
+        mock_create_engine.return_value.dispose.assert_called_once()
+
+
+class TestRemovingPartialFile:
+    """removing_partial_file関数のテスト"""
+
+    def test_keeps_completed_file(self, tmp_path):
+        """正常系: 書き込みが完了したファイルは残す"""
+        path = tmp_path / "users.csv"
+
+        with removing_partial_file(path):
+            path.write_text("id\n1\n")
+
+        assert path.exists()
+
+    def test_removes_partial_file(self, tmp_path):
+        """異常系: 書き込み途中で失敗した場合はファイルを削除して例外を送出する"""
+        path = tmp_path / "users.csv"
+
+        with pytest.raises(RuntimeError):
+            with removing_partial_file(path):
+                path.write_text("id\n")
+                raise RuntimeError("connection lost")
+
+        assert not path.exists()
@@ -0,0 +1,183 @@
+import datetime
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from utils.watermark import IncrementalExport, WatermarkRange, subtract_overlap
+
+
+@pytest.fixture
+def mock_conn():
+    """列名を二重引用符で囲むモック接続"""
+    conn = MagicMock()
+    conn.dialect.identifier_preparer.quote.side_effect = lambda name: f'"{name}"'
+    return conn
+
+
+class TestWatermarkRange:
+    """WatermarkRangeクラスのテスト"""
+
+    def test_condition_between_marks(self, mock_conn):
+        """正常系: 前回のウォーターマークより後ろで今回の上限以下の行を条件にする"""
+        watermark_range = WatermarkRange('id', 10, 20)
+
+        assert watermark_range.condition(mock_conn) == '"id" > :watermark_lower AND "id" <= :watermark_upper'
+        assert watermark_range.params == {"watermark_lower": 10, "watermark_upper": 20}
+
+    def test_condition_pyformat(self, mock_conn):
+        """正常系: COPY用にpsycopg2形式のプレースホルダを使う"""
+        watermark_range = WatermarkRange('id', 10, 20)
+
+        assert watermark_range.condition(mock_conn, pyformat=True) == \
+            '"id" > %(watermark_lower)s AND "id" <= %(watermark_upper)s'
+
+    def test_first_run_has_no_condition(self, mock_conn):
+        """正常系: 前回のウォーターマークがない場合は全件を対象にする"""
+        watermark_range = WatermarkRange('id', None, 20)
+
+        assert watermark_range.params == {}
+        assert watermark_range.condition(mock_conn) == ""
+
+
+class TestSubtractOverlap:
+    """subtract_overlap関数のテスト"""
+
+    def test_subtracts_by_type(self):
+        """正常系: 数値列は値の差、日時列は秒数として遡る"""
+        assert subtract_overlap(100, 30) == 70
+        assert subtract_overlap("2023-12-01T12:30:00", 300) == datetime.datetime(2023, 12, 1, 12, 25)
+
+    def test_unparseable_value_unchanged(self):
+        """正常系: 日時として解釈できない文字列はそのまま使う"""
+        assert subtract_overlap("abc", 300) == "abc"
+
+
+class TestIncrementalExport:
+    """IncrementalExportクラスのテスト"""
+
+    def test_prepare_uses_saved_watermark(self, tmp_path, mock_conn):
+        """正常系: 保存済みのウォーターマークを下限、現在の最大値を上限にする"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(json.dumps({"json": {"users": {"column": "id", "value": 10}}}), encoding='utf-8')
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', return_value=25):
+            incremental = IncrementalExport(state_file, 'json', {"users": "id"})
+            watermark_range = incremental.prepare(mock_conn, 'users')
+
+        assert watermark_range.lower == 10
+        assert watermark_range.upper == 25
+        assert incremental.is_incremental('users') is True
+
+    def test_prepare_without_configured_column(self, tmp_path, mock_conn):
+        """正常系: ウォーターマーク列が設定されていないテーブルは全件"""
+        incremental = IncrementalExport(tmp_path / "watermarks.json", 'json', {})
+
+        assert incremental.prepare(mock_conn, 'users') is None
+        assert incremental.is_incremental('users') is False
+
+    def test_prepare_missing_column_falls_back_to_full(self, tmp_path, mock_conn, capsys):
+        """正常系: テーブルにウォーターマーク列がない場合は全件"""
+        with patch('utils.watermark.has_column', return_value=False):
+            incremental = IncrementalExport(tmp_path / "watermarks.json", 'json', {"users": "updated_at"})
+            assert incremental.prepare(mock_conn, 'users') is None
+
+        assert "全件をエクスポートします" in capsys.readouterr().out
+
+    def test_save_only_successful_tables(self, tmp_path, mock_conn):
+        """正常系: 成功したテーブルのウォーターマークだけを形式毎に保存する"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(json.dumps({"csv": {"users": {"column": "id", "value": 1}}}), encoding='utf-8')
+        updated_at = datetime.datetime(2023, 12, 1, 12, 30)
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', side_effect=[updated_at, 7]):
+            incremental = IncrementalExport(state_file, 'json', {"users": "updated_at", "prompts": "id"})
+            incremental.prepare(mock_conn, 'users')
+            incremental.prepare(mock_conn, 'prompts')
+            incremental.save({"users": True, "prompts": False})
+
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+        assert state["json"] == {"users": {"column": "updated_at", "value": "2023-12-01T12:30:00"}}
+        # 他の形式のウォーターマークは保持される
+        assert state["csv"] == {"users": {"column": "id", "value": 1}}
+
+    def test_changed_column_resets_watermark(self, tmp_path, mock_conn):
+        """正常系: 設定した列が変わった場合は保存済みの値を使わず全件"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(json.dumps({"json": {"users": {"column": "id", "value": 10}}}), encoding='utf-8')
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', return_value="2023-12-01"):
+            incremental = IncrementalExport(state_file, 'json', {"users": "updated_at"})
+            watermark_range = incremental.prepare(mock_conn, 'users')
+
+        assert watermark_range.params == {}
+        assert incremental.is_incremental('users') is False
+
+    def test_prepare_applies_overlap_and_tracks_base(self, tmp_path, mock_conn):
+        """正常系: 下限を読み直す幅だけ遡り、差分の起点を引き継ぐ。全件のテーブルは今回を起点にする"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(
+            json.dumps({"json": {"users": {"column": "id", "value": 10, "base": "20231130_120000"}}}),
+            encoding='utf-8'
+        )
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', side_effect=[25, 7]):
+            incremental = IncrementalExport(
+                state_file, 'json', {"users": "id", "prompts": "id"}, "20231201_120000", overlap=5
+            )
+            watermark_range = incremental.prepare(mock_conn, 'users')
+            incremental.prepare(mock_conn, 'prompts')
+            incremental.save({"users": True, "prompts": True})
+
+        assert watermark_range.lower == 5
+        assert incremental.get_base_timestamp() == "20231130_120000"
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+        assert state["json"]["users"]["base"] == "20231130_120000"
+        assert state["json"]["prompts"] == {"column": "id", "value": 7, "base": "20231201_120000"}
+
+    def test_starts_new_chain_after_full_export_interval(self, tmp_path, mock_conn):
+        """正常系: 起点から指定日数が経過したテーブルは全件をエクスポートし、今回を新しい起点にする"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(
+            json.dumps({"json": {
+                "users": {"column": "id", "value": 10, "base": "20231124_120000"},
+                "prompts": {"column": "id", "value": 3, "base": "20231125_120000"},
+            }}),
+            encoding='utf-8'
+        )
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', side_effect=[25, 7]):
+            incremental = IncrementalExport(
+                state_file, 'json', {"users": "id", "prompts": "id"}, "20231201_120000", full_export_every_days=7
+            )
+            assert incremental.is_incremental('users') is False
+            assert incremental.is_incremental('prompts') is True
+            users_range = incremental.prepare(mock_conn, 'users')
+            prompts_range = incremental.prepare(mock_conn, 'prompts')
+            incremental.save({"users": True, "prompts": True})
+
+        assert users_range.lower is None
+        assert prompts_range.lower == 3
+        assert incremental.get_base_timestamp() == "20231125_120000"
+        state = json.loads(state_file.read_text(encoding='utf-8'))
+        assert state["json"]["users"] == {"column": "id", "value": 25, "base": "20231201_120000"}
+
+    def test_mark_without_base_starts_new_chain(self, tmp_path, mock_conn):
+        """正常系: 起点が記録されていないウォーターマークは全件をエクスポートして起点を記録する"""
+        state_file = tmp_path / "watermarks.json"
+        state_file.write_text(json.dumps({"json": {"users": {"column": "id", "value": 10}}}), encoding='utf-8')
+
+        with patch('utils.watermark.has_column', return_value=True), \
+             patch('utils.watermark.get_column_max', return_value=25):
+            incremental = IncrementalExport(
+                state_file, 'json', {"users": "id"}, "20231201_120000", full_export_every_days=7
+            )
+            watermark_range = incremental.prepare(mock_conn, 'users')
+
+        assert watermark_range.lower is None
+        assert incremental.get_base_timestamp() is None
@@ -0,0 +1,93 @@
+import hashlib
+from pathlib import Path
+from typing import BinaryIO
+
+from utils.compression import open_binary_reader, open_binary_writer
+
+DIGEST_SUFFIX = ".sha256"
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class ArtifactWriter:
+    """受信したバイト列のSHA-256を計算しながら、必要に応じて圧縮してファイルに書き込む
+
+    ハッシュは圧縮前の内容に対して計算するため、圧縮方式に関係なく元のファイルと照合できる。
+    """
+
+    def __init__(self, path: Path, compression: str = 'none', resume: bool = False) -> None:
+        self.path = path
+        self.compression = compression
+        self.sha256 = hashlib.sha256()
+        self.bytes_written = 0
+
+        if resume and compression == 'none' and path.exists():
+            # 前回の続きから書き込む場合は、書き込み済みの内容をハッシュに反映する
+            with open(path, 'rb') as f:
+                while block := f.read(READ_BLOCK_SIZE):
+                    self.sha256.update(block)
+                    self.bytes_written += len(block)
+            self._stream: BinaryIO = open(path, 'ab')
+        else:
+            # 圧縮ストリームは途中から再開できないため最初から書き込む
+            self._stream = open_binary_writer(path, compression)
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self._stream.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def restart(self) -> None:
+        """書き込み済みの内容を破棄して最初から書き込む"""
+        self._stream.close()
+        self.sha256 = hashlib.sha256()
+        self.bytes_written = 0
+        self._stream = open_binary_writer(self.path, self.compression)
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+    def __enter__(self) -> 'ArtifactWriter':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+def get_digest_path(artifact: Path) -> Path:
+    return artifact.with_name(f"{artifact.name}{DIGEST_SUFFIX}")
+
+
+def write_digest_file(artifact: Path, digest: str) -> Path:
+    """sha256sumと同じ形式でハッシュ値をファイルの隣に保存"""
+    digest_file = get_digest_path(artifact)
+    digest_file.write_text(f"{digest}  {artifact.name}\n", encoding='utf-8')
+    return digest_file
+
+
+def read_digest_file(artifact: Path) -> str | None:
+    """ファイルの隣に保存したハッシュ値を取得。保存されていない場合はNone"""
+    digest_file = get_digest_path(artifact)
+    if not digest_file.exists():
+        return None
+    fields = digest_file.read_text(encoding='utf-8').split()
+    return fields[0] if fields else None
+
+
+def hash_file(path: Path) -> str:
+    """ファイルのSHA-256を計算（圧縮したファイルは展開後の内容に対して計算）"""
+    sha256 = hashlib.sha256()
+    with open_binary_reader(path) as f:
+        while block := f.read(READ_BLOCK_SIZE):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def copy_through(source: Path, writer: ArtifactWriter) -> None:
+    """ファイルの内容をArtifactWriterに書き込む（圧縮したファイルは展開して書き込む）"""
+    with open_binary_reader(source) as f:
+        while block := f.read(READ_BLOCK_SIZE):
+            writer.write(block)
@@ -0,0 +1,71 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from utils.json_state import load_json_state, save_json_state
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_FILE_NAME = ".heroku_backup_auth.json"
+
+
+def hash_credentials(credentials_file: Path, env_token: str | None = None) -> str | None:
+    """認証情報のSHA-256を計算。認証情報がない場合はNone"""
+    if env_token:
+        return hashlib.sha256(env_token.encode('utf-8')).hexdigest()
+    if not credentials_file.exists():
+        return None
+    return hashlib.sha256(credentials_file.read_bytes()).hexdigest()
+
+
+class AuthCache:
+    """確認済みのHerokuログイン状態を、認証情報のハッシュと有効期限とともに保存する
+
+    認証情報が変わった場合（再ログイン）や有効期限を過ぎた場合はキャッシュを使わない。
+    """
+
+    def __init__(self, state_file: Path, credentials_hash: str | None, ttl_hours: float) -> None:
+        self.state_file = state_file
+        self.credentials_hash = credentials_hash
+        self.ttl_hours = ttl_hours
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            return load_json_state(self.state_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"ログイン状態のキャッシュを読み込めませんでした: {e}")
+            return {}
+
+    def get_identity(self) -> str | None:
+        """キャッシュが有効な場合はログイン中のアカウントを返す"""
+        if self.credentials_hash is None or self.ttl_hours <= 0:
+            return None
+        state = self._load()
+        if state.get('credentials_hash') != self.credentials_hash:
+            return None
+        expires_at = state.get('expires_at')
+        if expires_at is None or datetime.fromisoformat(expires_at) <= datetime.now(timezone.utc):
+            return None
+        return state.get('identity')
+
+    def save(self, identity: str) -> None:
+        """確認したログイン状態を保存"""
+        if self.credentials_hash is None or self.ttl_hours <= 0:
+            return
+        verified_at = datetime.now(timezone.utc)
+        state = {
+            'identity': identity,
+            'credentials_hash': self.credentials_hash,
+            'verified_at': verified_at.isoformat(),
+            'expires_at': (verified_at + timedelta(hours=self.ttl_hours)).isoformat(),
+        }
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        save_json_state(self.state_file, state)
+
+    def invalidate(self) -> None:
+        """キャッシュを削除（APIが401を返した場合など）"""
+        if self.state_file.exists():
+            self.state_file.unlink(missing_ok=True)
+            logger.info("Herokuログイン状態のキャッシュを削除しました")
@@ -0,0 +1,315 @@
+import datetime
+import fnmatch
+import logging
+import os
+import re
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+import pytz
+
+from utils.cleanup_plan import scan_directory
+
+JST = pytz.timezone('Asia/Tokyo')
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE_NAME = "backup_catalog.sqlite3"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+# バックアップ名に含まれるタイムスタンプ（例: heroku_backup_20240115_030000.dump）
+TIMESTAMP_PATTERN = re.compile(r'(\d{8}_\d{6})')
+# カタログ作成前のバックアップを登録する際の種類毎のパターン
+ARTIFACT_PATTERNS = {
+    'heroku_dump': ("*.dump", "*.dump.gz", "*.dump.zst"),
+    'json': ("data_backup_*.json", "data_backup_*.json.gz", "data_backup_*.json.zst"),
+    'json_chunks': ("json_chunks_*",),
+    'ndjson': ("ndjson_backup_*",),
+    'pgcopy': ("pgcopy_backup_*",),
+    'parquet': ("parquet_backup_*",),
+    'csv': ("csv_backup_*",),
+}
+# 既存のバックアップを登録済みであることを示すcatalog_metaのキー
+BOOTSTRAPPED_KEY = "bootstrapped"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size_bytes INTEGER NOT NULL,
+    sha256 TEXT,
+    duration_seconds REAL,
+    created_at TEXT NOT NULL,
+    deleted_at TEXT,
+    base_timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS backups_method_timestamp ON backups (method, timestamp);
+CREATE TABLE IF NOT EXISTS backup_tables (
+    backup_id INTEGER NOT NULL REFERENCES backups (id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    PRIMARY KEY (backup_id, table_name)
+);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def parse_artifact_timestamp(name: str) -> str | None:
+    """バックアップ名からタイムスタンプ（%Y%m%d_%H%M%S）を取得"""
+    match = TIMESTAMP_PATTERN.search(name)
+    return match.group(1) if match else None
+
+
+def get_artifact_size(artifact: Path) -> int:
+    """ファイルのサイズ。ディレクトリの場合は含まれるファイルの合計サイズ"""
+    if not artifact.is_dir():
+        return artifact.stat().st_size
+    total = 0
+    with os.scandir(artifact) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += get_artifact_size(Path(entry.path))
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def _get_entry_timestamp(entry: os.DirEntry) -> str:
+    """名前に含まれるタイムスタンプ。名前に含まれない場合は作成日時を使う"""
+    timestamp = parse_artifact_timestamp(entry.name)
+    if timestamp is not None:
+        return timestamp
+    file_ctime = datetime.datetime.fromtimestamp(entry.stat().st_ctime, tz=JST)
+    return file_ctime.strftime(TIMESTAMP_FORMAT)
+
+
+def _get_entry_size(entry: os.DirEntry) -> int:
+    if entry.is_dir():
+        return get_artifact_size(Path(entry.path))
+    return entry.stat().st_size
+
+
+class CatalogEntry:
+    """カタログに登録されたバックアップ"""
+
+    def __init__(
+        self,
+        entry_id: int,
+        timestamp: str,
+        method: str,
+        path: Path,
+        size_bytes: int,
+        sha256: str | None,
+        duration_seconds: float | None,
+        base_timestamp: str | None = None,
+    ) -> None:
+        self.entry_id = entry_id
+        self.timestamp = timestamp
+        self.method = method
+        self.path = path
+        self.size_bytes = size_bytes
+        self.sha256 = sha256
+        self.duration_seconds = duration_seconds
+        # 差分エクスポートの場合は、起点となった全件エクスポートのタイムスタンプ
+        self.base_timestamp = base_timestamp
+
+
+class BackupCatalog:
+    """バックアップの一覧・サイズ・ハッシュ・テーブル毎の件数を記録するSQLiteのカタログ
+
+    バックアップディレクトリを走査せずに、削除対象や復元対象のバックアップを検索できる。
+    パスはバックアップディレクトリからの相対パスで保存する。
+    カタログを最初に開いた際に、作成前からあるバックアップをディレクトリから登録する。
+    """
+
+    def __init__(self, backup_dir: Path) -> None:
+        self.backup_dir = backup_dir
+        self.catalog_file = backup_dir / CATALOG_FILE_NAME
+        self._conn = sqlite3.connect(self.catalog_file, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        try:
+            self._bootstrap()
+        except BaseException:
+            self._conn.close()
+            raise
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> 'BackupCatalog':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def _relative_path(self, artifact: Path) -> str:
+        try:
+            return artifact.relative_to(self.backup_dir).as_posix()
+        except ValueError:
+            return artifact.as_posix()
+
+    def record(
+        self,
+        timestamp: str,
+        method: str,
+        artifact: Path,
+        duration_seconds: float | None = None,
+        sha256: str | None = None,
+        row_counts: dict[str, int] | None = None,
+        base_timestamp: str | None = None,
+        size_bytes: int | None = None,
+    ) -> int:
+        """完了したバックアップを登録し、IDを返す（同じパスは上書き）
+
+        size_bytesを省略した場合はファイル（ディレクトリの場合は含まれるファイルの合計）のサイズを登録する。
+        """
+        path = self._relative_path(artifact)
+        if size_bytes is None:
+            size_bytes = get_artifact_size(artifact)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO backups "
+                "(timestamp, method, path, size_bytes, sha256, duration_seconds, created_at, base_timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET timestamp = excluded.timestamp, method = excluded.method, "
+                "size_bytes = excluded.size_bytes, sha256 = excluded.sha256, "
+                "duration_seconds = excluded.duration_seconds, created_at = excluded.created_at, deleted_at = NULL, "
+                "base_timestamp = excluded.base_timestamp",
+                (
+                    timestamp, method, path, size_bytes, sha256, duration_seconds,
+                    datetime.datetime.now(datetime.timezone.utc).isoformat(), base_timestamp,
+                ),
+            )
+            entry_id = self._conn.execute("SELECT id FROM backups WHERE path = ?", (path,)).fetchone()['id']
+            self._conn.execute("DELETE FROM backup_tables WHERE backup_id = ?", (entry_id,))
+            self._conn.executemany(
+                "INSERT INTO backup_tables (backup_id, table_name, row_count) VALUES (?, ?, ?)",
+                [(entry_id, table, row_count) for table, row_count in (row_counts or {}).items()],
+            )
+        return entry_id
+
+    def _migrate(self) -> None:
+        """以前のバージョンで作成したカタログに不足している列を追加"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(backups)")}
+        if 'base_timestamp' not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE backups ADD COLUMN base_timestamp TEXT")
+
+    def _bootstrap(self) -> None:
+        """カタログ作成前のバックアップを最初の1回だけディレクトリから登録する
+
+        どの処理が最初にカタログを開いても登録するよう、登録済みかどうかをcatalog_metaに記録する。
+        同時に開いた別のプロセスと重複しないよう、書き込みロックを取ってから確認する。
+        """
+        if self._is_bootstrapped():
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = 0
+            if not self._is_bootstrapped():
+                scanned = scan_directory(
+                    self.backup_dir, [pattern for patterns in ARTIFACT_PATTERNS.values() for pattern in patterns]
+                )
+                for method, patterns in ARTIFACT_PATTERNS.items():
+                    count += self._insert_existing(method, [
+                        (Path(entry.path), _get_entry_timestamp(entry), _get_entry_size(entry))
+                        for entry in scanned if any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns)
+                    ])
+                self._conn.execute(
+                    "INSERT INTO catalog_meta (key, value) VALUES (?, ?)",
+                    (BOOTSTRAPPED_KEY, datetime.datetime.now(datetime.timezone.utc).isoformat()),
+                )
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        if count:
+            logger.info(f"既存のバックアップ{count}件をカタログに登録しました")
+
+    def _is_bootstrapped(self) -> bool:
+        row = self._conn.execute("SELECT 1 FROM catalog_meta WHERE key = ?", (BOOTSTRAPPED_KEY,)).fetchone()
+        return row is not None
+
+    def _insert_existing(self, method: str, artifacts: Iterable[tuple[Path, str, int]]) -> int:
+        count = 0
+        for artifact, timestamp, size_bytes in artifacts:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO backups (timestamp, method, path, size_bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    timestamp, method, self._relative_path(artifact), size_bytes,
+                    datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                ),
+            )
+            count += cursor.rowcount
+        return count
+
+    def import_existing(self, method: str, artifacts: Iterable[tuple[Path, str, int]]) -> int:
+        """カタログ作成前からあるバックアップ（パス・タイムスタンプ・サイズ）を登録し、登録した件数を返す"""
+        with self._conn:
+            count = self._insert_existing(method, artifacts)
+        if count:
+            logger.info(f"既存のバックアップ{count}件をカタログに登録しました")
+        return count
+
+    def list_backups(self, method: str | None = None, before: str | None = None) -> list[CatalogEntry]:
+        """削除済みを除くバックアップをタイムスタンプ順に取得（beforeより前のタイムスタンプに限定可能）"""
+        query = "SELECT * FROM backups WHERE deleted_at IS NULL"
+        params: list[str] = []
+        if method is not None:
+            query += " AND method = ?"
+            params.append(method)
+        if before is not None:
+            query += " AND timestamp < ?"
+            params.append(before)
+        query += " ORDER BY timestamp, id"
+        return [
+            CatalogEntry(
+                row['id'], row['timestamp'], row['method'], self.backup_dir / row['path'],
+                row['size_bytes'], row['sha256'], row['duration_seconds'], row['base_timestamp'],
+            )
+            for row in self._conn.execute(query, params)
+        ]
+
+    def get_row_counts(self, entry_id: int) -> dict[str, int]:
+        """バックアップに含まれるテーブル毎の件数を取得"""
+        rows = self._conn.execute(
+            "SELECT table_name, row_count FROM backup_tables WHERE backup_id = ? ORDER BY table_name", (entry_id,)
+        )
+        return {row['table_name']: row['row_count'] for row in rows}
+
+    def mark_deleted(self, entry_id: int) -> None:
+        """削除したバックアップを一覧から除外する（履歴は残す）"""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE backups SET deleted_at = ? WHERE id = ?",
+                (datetime.datetime.now(datetime.timezone.utc).isoformat(), entry_id),
+            )
+
+
+def record_backup(
+    backup_dir: Path,
+    timestamp: str,
+    method: str,
+    artifact: Path,
+    duration_seconds: float | None = None,
+    sha256: str | None = None,
+    row_counts: dict[str, int] | None = None,
+    base_timestamp: str | None = None,
+    size_bytes: int | None = None,
+) -> None:
+    """完了したバックアップをカタログに登録。カタログに書き込めなくてもバックアップは失敗扱いにしない"""
+    try:
+        with BackupCatalog(backup_dir) as catalog:
+            catalog.record(
+                timestamp, method, artifact, duration_seconds, sha256, row_counts, base_timestamp, size_bytes
+            )
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"バックアップカタログに登録できませんでした: {artifact}: {e}")
@@ -0,0 +1,105 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Connection, Engine, text
+
+from utils.json_state import load_json_state, save_json_section
+
+TABLE_STATS_FILE_NAME = "table_stats.json"
+
+
+def get_change_counters(conn: Connection, table: str) -> list[int] | None:
+    """pg_stat_user_tablesから挿入・更新・削除の累計件数とファイルノードを取得。統計がない場合はNone
+
+    TRUNCATEは削除件数に数えられないが、テーブルのファイルノードを変更するため判定に含める。
+    """
+    statement = text(
+        "SELECT n_tup_ins, n_tup_upd, n_tup_del, pg_relation_filenode(relid) FROM pg_stat_user_tables "
+        "WHERE relid = CAST(:table AS regclass)"
+    )
+    row = conn.execute(statement, {"table": table}).first()
+    if row is None or any(value is None for value in row):
+        return None
+    return [int(value) for value in row]
+
+
+class TableChangeTracker:
+    """前回のバックアップ以降に変更のないテーブルを判定し、前回のファイルを再利用する"""
+
+    def __init__(self, state_file: Path, export_name: str) -> None:
+        self.state_file = state_file
+        self.export_name = export_name
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._counters: dict[str, list[int]] = {}
+        self._tables: dict[str, dict[str, Any]] = load_json_state(state_file).get(export_name, {})
+
+    @classmethod
+    def start(
+        cls, state_file: Path, export_name: str, engine: Engine, tables: list[str], snapshot_id: str | None
+    ) -> "TableChangeTracker | None":
+        """エクスポート前に全テーブルの変更件数を読み込んだトラッカーを作成
+
+        変更件数はMVCCの対象外で、スナップショットより後にコミットされた変更も含む。
+        スナップショットの取得後に読むと出力していない変更まで記録し、以降の再利用で取りこぼすため、
+        呼び出し元が既にスナップショットを保持している場合は再利用しない（None）。
+        """
+        if snapshot_id is not None:
+            print("  ⚠️ 取得済みのスナップショットでエクスポートするため、変更のないテーブルの再利用を行いません")
+            return None
+
+        tracker = cls(state_file, export_name)
+        with engine.connect() as conn:
+            for table in tables:
+                counters = get_change_counters(conn, table)
+                if counters is not None:
+                    tracker._counters[table] = counters
+        return tracker
+
+    def reuse_if_unchanged(self, table: str, artifact: Path) -> bool:
+        """変更がなければ前回のファイルをartifactにハードリンクしてTrueを返す"""
+        counters = self._counters.get(table)
+        if counters is None:
+            return False
+
+        with self._lock:
+            self._pending[table] = {"counters": counters, "artifact": artifact}
+
+        previous = self._tables.get(table)
+        if previous is None or previous["counters"] != counters:
+            return False
+
+        previous_artifact = self.state_file.parent / previous["artifact"]
+        # 圧縮方式などが変わってファイル名が異なる場合は再利用しない
+        if previous_artifact.name != artifact.name or not previous_artifact.is_file():
+            return False
+        if previous_artifact.resolve() == artifact.resolve():
+            return True
+
+        artifact.unlink(missing_ok=True)
+        try:
+            os.link(previous_artifact, artifact)
+        except OSError:
+            # ハードリンクに対応していないファイルシステムではコピーする
+            shutil.copy2(previous_artifact, artifact)
+        return True
+
+    def save(self, results: dict[str, bool]) -> None:
+        """エクスポートに成功したテーブルの変更件数とファイルの場所を保存"""
+        with self._lock:
+            updated = {
+                table: {
+                    "counters": state["counters"],
+                    "artifact": Path(os.path.relpath(state["artifact"], self.state_file.parent)).as_posix(),
+                }
+                for table, state in self._pending.items()
+                if results.get(table)
+            }
+        if not updated:
+            return
+
+        self._tables.update(updated)
+        save_json_section(self.state_file, self.export_name, self._tables)
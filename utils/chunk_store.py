@@ -0,0 +1,248 @@
+import functools
+import hashlib
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from utils.artifact_writer import ArtifactWriter
+
+CHUNK_STORE_DIR_NAME = "chunk_store"
+DEFAULT_AVG_CHUNK_SIZE = 1024 * 1024
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+# ローリングハッシュの窓の長さ（バイト）。区切り位置は直前の窓の内容だけで決まる
+WINDOW_SIZE = 64
+HASH_BASE = 0x100000001B3
+HASH_BASE_INVERSE = pow(HASH_BASE, -1, 2 ** 64)
+# バイト毎の乱数表。区切り位置が変わると既存のチャンクと一致しなくなるため、実行環境に依存しない値を使う
+GEAR_TABLE = np.array(
+    [int.from_bytes(hashlib.sha256(bytes([value])).digest()[:8], 'little') for value in range(256)],
+    dtype=np.uint64,
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _power_table(base: int, length: int) -> np.ndarray:
+    """base**0 から base**(length-1) まで（2**64を法とする）"""
+    powers = np.ones(length, dtype=np.uint64)
+    powers[1:] = np.cumprod(np.full(length - 1, base, dtype=np.uint64))
+    return powers
+
+
+def window_hashes(data: bytes) -> np.ndarray:
+    """各位置で終わる長さWINDOW_SIZEの窓のローリングハッシュを計算
+
+    窓の和を累積和の差で求め、先頭位置の分だけ逆元を掛けて正規化することで、
+    1バイトずつのループを使わずにnumpyでまとめて計算する。先頭WINDOW_SIZE-1バイトは窓が短い。
+    """
+    values = GEAR_TABLE[np.frombuffer(data, dtype=np.uint8)]
+    length = len(values)
+    table_length = max(length, READ_BLOCK_SIZE + WINDOW_SIZE)
+    sums = np.multiply(values, _power_table(HASH_BASE, table_length)[:length], out=values)
+    np.cumsum(sums, out=sums)
+    hashes = np.empty_like(sums)
+    hashes[:WINDOW_SIZE] = sums[:WINDOW_SIZE]
+    np.subtract(sums[WINDOW_SIZE:], sums[:-WINDOW_SIZE], out=hashes[WINDOW_SIZE:])
+    hashes[WINDOW_SIZE - 1:] *= _power_table(HASH_BASE_INVERSE, table_length)[:length - WINDOW_SIZE + 1]
+    return hashes
+
+
+def get_chunk_size_limits(avg_size: int) -> tuple[int, int]:
+    """平均サイズに対するチャンクの最小・最大サイズ"""
+    if avg_size < 4 * WINDOW_SIZE or avg_size & (avg_size - 1):
+        raise ValueError(f"チャンクの平均サイズは{4 * WINDOW_SIZE}以上の2の累乗で指定してください: {avg_size}")
+    return avg_size // 4, avg_size * 4
+
+
+def iter_chunks(
+    stream: BinaryIO, avg_size: int = DEFAULT_AVG_CHUNK_SIZE, read_size: int = READ_BLOCK_SIZE
+) -> Iterator[bytes]:
+    """ストリームを内容で区切ったチャンクに分割（Content-Defined Chunking）
+
+    ハッシュの上位ビットが0になる位置で区切るため、途中にデータが挿入・削除されても
+    それ以降の区切り位置は元に戻り、変更のないチャンクは前回と同じ内容になる。
+    """
+    min_size, max_size = get_chunk_size_limits(avg_size)
+    shift = np.uint64(64 - (avg_size.bit_length() - 1))
+    history = b""
+    chunk = bytearray()
+
+    while block := stream.read(read_size):
+        hashes = window_hashes(history + block)[len(history):]
+        history = (history + block)[-(WINDOW_SIZE - 1):]
+        start = 0
+        for position in np.flatnonzero((hashes >> shift) == 0).tolist():
+            end = position + 1
+            while len(chunk) + end - start > max_size:
+                take = max_size - len(chunk)
+                chunk += block[start:start + take]
+                yield bytes(chunk)
+                chunk.clear()
+                start += take
+            if len(chunk) + end - start >= min_size:
+                chunk += block[start:end]
+                yield bytes(chunk)
+                chunk.clear()
+                start = end
+        while len(chunk) + len(block) - start > max_size:
+            take = max_size - len(chunk)
+            chunk += block[start:start + take]
+            yield bytes(chunk)
+            chunk.clear()
+            start += take
+        chunk += block[start:]
+
+    if chunk:
+        yield bytes(chunk)
+
+
+class StoreResult:
+    """チャンクストアに格納したファイルの情報"""
+
+    def __init__(
+        self, manifest_path: Path, size_bytes: int, sha256: str, chunk_count: int, new_chunk_count: int,
+        new_bytes: int,
+    ) -> None:
+        self.manifest_path = manifest_path
+        self.size_bytes = size_bytes
+        self.sha256 = sha256
+        self.chunk_count = chunk_count
+        self.new_chunk_count = new_chunk_count
+        self.new_bytes = new_bytes
+
+
+class StoreStats:
+    """マニフェストが参照する合計サイズと、実際に保存しているチャンクの合計サイズ"""
+
+    def __init__(self, manifest_count: int, logical_bytes: int, stored_bytes: int) -> None:
+        self.manifest_count = manifest_count
+        self.logical_bytes = logical_bytes
+        self.stored_bytes = stored_bytes
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.logical_bytes / self.stored_bytes if self.stored_bytes else 0.0
+
+
+class ChunkStore:
+    """ファイルを内容で区切ったチャンクに分割し、同じチャンクはハッシュ値の名前で1回だけ保存する
+
+    ファイル毎にチャンクの並びをマニフェスト（JSON）に記録し、復元時はチャンクを順に連結する。
+    チャンクを書き終えてからマニフェストを保存するため、中断しても既存のバックアップは壊れない。
+    """
+
+    def __init__(self, root: Path, avg_chunk_size: int = DEFAULT_AVG_CHUNK_SIZE) -> None:
+        get_chunk_size_limits(avg_chunk_size)
+        self.root = root
+        self.chunk_dir = root / "chunks"
+        self.manifest_dir = root / "manifests"
+        self.avg_chunk_size = avg_chunk_size
+
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / digest
+
+    def manifest_path(self, name: str) -> Path:
+        return self.manifest_dir / f"{name}.json"
+
+    def _write_chunk(self, digest: str, data: bytes) -> bool:
+        """未保存のチャンクを書き込み、書き込んだ場合はTrueを返す"""
+        path = self.chunk_path(digest)
+        if path.exists():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{digest}.part")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+        return True
+
+    def add_file(self, source: Path) -> StoreResult:
+        """ファイルをチャンクに分割して格納し、マニフェストを保存"""
+        sha256 = hashlib.sha256()
+        chunks: list[list] = []
+        new_chunk_count = new_bytes = 0
+
+        with open(source, 'rb') as f:
+            for data in iter_chunks(f, self.avg_chunk_size):
+                sha256.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                if self._write_chunk(digest, data):
+                    new_chunk_count += 1
+                    new_bytes += len(data)
+                chunks.append([digest, len(data)])
+
+        size_bytes = sum(size for _, size in chunks)
+        manifest = {
+            'name': source.name,
+            'size_bytes': size_bytes,
+            'sha256': sha256.hexdigest(),
+            'avg_chunk_size': self.avg_chunk_size,
+            'chunks': chunks,
+        }
+        manifest_path = self.manifest_path(source.name)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = manifest_path.with_name(f"{manifest_path.name}.part")
+        temp_path.write_text(json.dumps(manifest), encoding='utf-8')
+        os.replace(temp_path, manifest_path)
+
+        return StoreResult(manifest_path, size_bytes, manifest['sha256'], len(chunks), new_chunk_count, new_bytes)
+
+    def list_manifests(self) -> list[str]:
+        """格納しているファイル名の一覧"""
+        if not self.manifest_dir.exists():
+            return []
+        with os.scandir(self.manifest_dir) as entries:
+            return sorted(entry.name[:-len(".json")] for entry in entries if entry.name.endswith(".json"))
+
+    def read_manifest(self, name: str) -> dict:
+        return json.loads(self.manifest_path(name).read_text(encoding='utf-8'))
+
+    def restore(self, name: str, destination: Path) -> int:
+        """チャンクを順に連結してファイルを復元し、SHA-256を照合してサイズを返す"""
+        manifest = self.read_manifest(name)
+        temp_path = destination.with_name(f"{destination.name}.part")
+        with ArtifactWriter(temp_path) as writer:
+            for digest, _ in manifest['chunks']:
+                writer.write(self.chunk_path(digest).read_bytes())
+
+        if writer.hexdigest() != manifest['sha256']:
+            temp_path.unlink(missing_ok=True)
+            raise ValueError(f"復元したファイルのSHA-256がマニフェストと一致しません: {name}")
+        os.replace(temp_path, destination)
+        return writer.bytes_written
+
+    def collect_garbage(self) -> tuple[int, int]:
+        """どのマニフェストからも参照されないチャンクを削除し、削除した数とバイト数を返す"""
+        referenced = {
+            digest for name in self.list_manifests() for digest, _ in self.read_manifest(name)['chunks']
+        }
+        removed = freed_bytes = 0
+        if not self.chunk_dir.exists():
+            return removed, freed_bytes
+
+        with os.scandir(self.chunk_dir) as prefixes:
+            prefix_dirs = [Path(prefix.path) for prefix in prefixes if prefix.is_dir()]
+        for prefix_dir in prefix_dirs:
+            with os.scandir(prefix_dir) as entries:
+                unreferenced = [entry for entry in entries if entry.name not in referenced]
+            for entry in unreferenced:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+                removed += 1
+                freed_bytes += size
+        return removed, freed_bytes
+
+    def get_stats(self) -> StoreStats:
+        """重複排除率を求めるための合計サイズを取得"""
+        names = self.list_manifests()
+        logical_bytes = sum(self.read_manifest(name)['size_bytes'] for name in names)
+        stored_bytes = 0
+        if self.chunk_dir.exists():
+            with os.scandir(self.chunk_dir) as prefixes:
+                for prefix in prefixes:
+                    if prefix.is_dir():
+                        with os.scandir(prefix.path) as entries:
+                            stored_bytes += sum(entry.stat().st_size for entry in entries)
+        return StoreStats(len(names), logical_bytes, stored_bytes)
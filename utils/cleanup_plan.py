@@ -0,0 +1,94 @@
+import fnmatch
+import logging
+import os
+import shutil
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def scan_directory(directory: Path, patterns: Iterable[str]) -> list[os.DirEntry]:
+    """os.scandirで一覧を1回だけ取得し、パターンに一致するエントリを返す
+
+    DirEntryはstatの結果をキャッシュするため、ファイル毎の問い合わせを繰り返さずに済む。
+    """
+    patterns = list(patterns)
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns)]
+
+
+class PlannedDeletion:
+    """削除予定のファイルまたはディレクトリと、一緒に削除する関連ファイル"""
+
+    def __init__(
+        self, path: Path, size_bytes: int, is_dir: bool = False, reason: str = "", extra_paths: Iterable[Path] = ()
+    ) -> None:
+        self.path = path
+        self.size_bytes = size_bytes
+        self.is_dir = is_dir
+        self.reason = reason
+        self.extra_paths = list(extra_paths)
+
+
+def delete_planned(item: PlannedDeletion) -> None:
+    if item.is_dir:
+        shutil.rmtree(item.path)
+    else:
+        item.path.unlink(missing_ok=True)
+    for extra_path in item.extra_paths:
+        extra_path.unlink(missing_ok=True)
+
+
+class DeletionPlan:
+    """削除対象を先に確定し、ドライランの報告または少数のワーカーでの削除を行う"""
+
+    def __init__(self) -> None:
+        self.items: list[PlannedDeletion] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(
+        self, path: Path, size_bytes: int, is_dir: bool = False, reason: str = "", extra_paths: Iterable[Path] = ()
+    ) -> None:
+        self.items.append(PlannedDeletion(path, size_bytes, is_dir, reason, extra_paths))
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(item.size_bytes for item in self.items)
+
+    def log_report(self, title: str) -> None:
+        """削除せずに削除対象と解放される容量をログに出力（ドライラン）"""
+        logger.info(f"[ドライラン] {title}: {len(self.items)}件, 解放される容量: {self.total_bytes / 1024 / 1024:,.1f}MB")
+        for item in self.items:
+            reason = f" - {item.reason}" if item.reason else ""
+            logger.info(f"[ドライラン]   {item.path.name} ({item.size_bytes / 1024 / 1024:,.1f}MB){reason}")
+
+    def execute(self, workers: int = 1) -> tuple[list[PlannedDeletion], list[tuple[PlannedDeletion, OSError]]]:
+        """削除を実行し、削除できたものと失敗したもの（例外付き）を返す"""
+        def delete_batch(items: list[PlannedDeletion]) -> list[OSError | None]:
+            errors: list[OSError | None] = []
+            for item in items:
+                try:
+                    delete_planned(item)
+                    errors.append(None)
+                except OSError as e:
+                    errors.append(e)
+            return errors
+
+        workers = min(workers, len(self.items))
+        if workers <= 1:
+            items, errors = self.items, delete_batch(self.items)
+        else:
+            # ネットワーク共有では1件毎の往復が支配的なため、ワーカー毎にまとめた削除を同時に発行する
+            batches = [self.items[index::workers] for index in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(delete_batch, batches))
+            items = [item for batch in batches for item in batch]
+            errors = [error for batch_errors in results for error in batch_errors]
+
+        deleted = [item for item, error in zip(items, errors) if error is None]
+        failed = [(item, error) for item, error in zip(items, errors) if error is not None]
+        return deleted, failed
@@ -0,0 +1,123 @@
+import gzip
+import io
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, TextIO, cast
+
+from utils.config_manager import get_gzip_level, get_zstd_level, get_zstd_threads
+
+try:
+    import zstandard
+except ImportError:  # zstdを使わない環境では未インストールでも動作させる
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def get_compression_suffix(compression: str) -> str:
+    """圧縮方式に対応するファイル拡張子を取得"""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"未対応の圧縮方式です: {compression}")
+    return COMPRESSION_SUFFIXES[compression]
+
+
+def _zstd_stream_writer(raw: BinaryIO, closefd: bool) -> BinaryIO:
+    """設定したレベルとスレッド数でzstd圧縮しながらrawに書き込むストリームを開く
+
+    threadsを指定すると圧縮を別スレッドで並列に行うため、書き込み側は圧縮の完了を待たずに次のデータを渡せる。
+    """
+    if zstandard is None:
+        raise RuntimeError("zstd圧縮にはzstandardパッケージが必要です")
+    compressor = zstandard.ZstdCompressor(level=get_zstd_level(), threads=get_zstd_threads())
+    return compressor.stream_writer(raw, closefd=closefd)
+
+
+def _zstd_writer(path: Path) -> BinaryIO:
+    return _zstd_stream_writer(open(path, 'wb'), closefd=True)
+
+
+def open_text_writer(path: Path, compression: str = 'none') -> TextIO:
+    """書き込みながら圧縮するテキストストリームを開く"""
+    get_compression_suffix(compression)
+
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', compresslevel=get_gzip_level(), encoding='utf-8', newline='\n')
+
+    if compression == 'zstd':
+        return io.TextIOWrapper(_zstd_writer(path), encoding='utf-8', newline='\n')
+
+    return open(path, 'w', encoding='utf-8', newline='\n')
+
+
+def open_binary_writer(path: Path, compression: str = 'none') -> BinaryIO:
+    """書き込みながら圧縮するバイナリストリームを開く"""
+    get_compression_suffix(compression)
+
+    if compression == 'gzip':
+        # GzipFileはBinaryIOを継承しないが、同じメソッドを備えている
+        return cast(BinaryIO, gzip.open(path, 'wb', compresslevel=get_gzip_level()))
+
+    if compression == 'zstd':
+        return _zstd_writer(path)
+
+    return open(path, 'wb')
+
+
+@contextmanager
+def append_text_member(raw: BinaryIO, compression: str = 'none', gzip_level: int | None = None) -> Iterator[TextIO]:
+    """開いているファイルの末尾に、単独で展開できる圧縮データ（gzipのメンバー・zstdのフレーム）としてテキストを書き込む
+
+    メンバーやフレームは連結しても1つの圧縮ファイルとして展開できるため、書き込み単位毎に切り詰めや連結ができる。
+    rawは閉じない。
+    """
+    get_compression_suffix(compression)
+
+    member: BinaryIO = raw
+    if compression == 'gzip':
+        level = get_gzip_level() if gzip_level is None else gzip_level
+        member = cast(BinaryIO, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level))
+    elif compression == 'zstd':
+        member = _zstd_stream_writer(raw, closefd=False)
+
+    text = io.TextIOWrapper(member, encoding='utf-8', newline='\n')
+    try:
+        yield text
+    finally:
+        text.flush()
+        text.detach()
+        if member is not raw:
+            member.close()
+
+
+def open_text_reader(path: Path) -> TextIO:
+    """拡張子から圧縮方式を判定してテキストストリームを開く"""
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='\n')
+
+    if path.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("zstd圧縮の読み込みにはzstandardパッケージが必要です")
+        raw = open(path, 'rb')
+        # 連結したフレームを最後まで読み込む
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True, read_across_frames=True)
+        return io.TextIOWrapper(reader, encoding='utf-8', newline='\n')
+
+    return open(path, encoding='utf-8', newline='\n')
+
+
+def open_binary_reader(path: Path) -> BinaryIO:
+    """拡張子から圧縮方式を判定してバイナリストリームを開く（非圧縮のファイルはそのまま開く）"""
+    if path.suffix == '.gz':
+        return cast(BinaryIO, gzip.open(path, 'rb'))
+
+    if path.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError("zstd圧縮の読み込みにはzstandardパッケージが必要です")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True, read_across_frames=True)
+
+    return open(path, 'rb')
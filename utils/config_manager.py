@@ -65,3 +65,243 @@ def get_backup_tables() -> list[str]:
     config = load_config()
     tables_str = config.get('Database', 'backup_tables', fallback='app_settings,prompts,summary_usage')
     return [table.strip() for table in tables_str.split(',')]
+
+
+def get_fetch_batch_size() -> int:
+    """サーバーサイドカーソルで一度に取得する行数を取得"""
+    config = load_config()
+    return config.getint('Database', 'fetch_batch_size', fallback=1000)
+
+
+def get_ndjson_compression() -> str:
+    """NDJSONエクスポートの圧縮方式を取得（none/gzip/zstd）"""
+    config = load_config()
+    return config.get('Database', 'ndjson_compression', fallback='none').strip().lower()
+
+
+def get_json_compression() -> str:
+    """JSONファイルの圧縮方式を取得（none/gzip/zstd）"""
+    config = load_config()
+    return config.get('Database', 'json_compression', fallback='none').strip().lower()
+
+
+def get_csv_compression() -> str:
+    """CSVファイルの圧縮方式を取得（none/gzip/zstd）"""
+    config = load_config()
+    return config.get('Database', 'csv_compression', fallback='none').strip().lower()
+
+
+def get_pgcopy_compression() -> str:
+    """バイナリCOPYファイルの圧縮方式を取得（none/gzip/zstd）"""
+    config = load_config()
+    return config.get('Database', 'pgcopy_compression', fallback='none').strip().lower()
+
+
+def get_zstd_level() -> int:
+    """zstd圧縮のレベルを取得（1〜22、大きいほど高圧縮で低速）"""
+    config = load_config()
+    return min(max(config.getint('Compression', 'zstd_level', fallback=3), 1), 22)
+
+
+def get_zstd_threads() -> int:
+    """zstd圧縮に使うスレッド数を取得（0: 書き込みと同じスレッドで圧縮、-1: 論理CPU数）"""
+    config = load_config()
+    return max(config.getint('Compression', 'zstd_threads', fallback=-1), -1)
+
+
+def get_gzip_level() -> int:
+    """gzip圧縮のレベルを取得（1〜9）"""
+    config = load_config()
+    return min(max(config.getint('Compression', 'gzip_level', fallback=6), 1), 9)
+
+
+def get_export_workers() -> int:
+    """テーブルを並列にエクスポートするワーカー数を取得"""
+    config = load_config()
+    return max(config.getint('Database', 'export_workers', fallback=1), 1)
+
+
+def get_consistent_snapshot() -> bool:
+    """全テーブルを同一時点のスナップショットからエクスポートするかを取得"""
+    config = load_config()
+    return config.getboolean('Database', 'consistent_snapshot', fallback=False)
+
+
+def get_csv_export_method() -> str:
+    """CSVエクスポートの方式を取得（copy/pandas）"""
+    config = load_config()
+    return config.get('Database', 'csv_export_method', fallback='copy').strip().lower()
+
+
+def get_parquet_compression() -> str:
+    """Parquetエクスポートの圧縮方式を取得（zstd/snappy/gzip/none）"""
+    config = load_config()
+    return config.get('Database', 'parquet_compression', fallback='zstd').strip().lower()
+
+
+def get_parquet_row_group_rows() -> int:
+    """Parquetエクスポートで1つの行グループにまとめる行数を取得"""
+    config = load_config()
+    return max(config.getint('Database', 'parquet_row_group_rows', fallback=131072), 1)
+
+
+def get_pool_size() -> int:
+    """共有エンジンの接続プールのサイズを取得（未設定時はエクスポートのワーカー数）"""
+    config = load_config()
+    return max(config.getint('Database', 'pool_size', fallback=get_export_workers()), 1)
+
+
+def get_pool_pre_ping() -> bool:
+    """接続プールから取り出す際に接続の生存確認を行うかを取得"""
+    config = load_config()
+    return config.getboolean('Database', 'pool_pre_ping', fallback=True)
+
+
+def get_chunk_rows() -> int:
+    """チャンク分割エクスポートで1ファイルに書き込む行数を取得"""
+    config = load_config()
+    return max(config.getint('Database', 'chunk_rows', fallback=50000), 1)
+
+
+def get_incremental_export() -> bool:
+    """ウォーターマークによる差分エクスポートを行うかを取得"""
+    config = load_config()
+    return config.getboolean('Database', 'incremental_export', fallback=False)
+
+
+def get_incremental_columns() -> dict[str, str]:
+    """テーブル毎のウォーターマーク列を取得（[Incremental]セクションのテーブル名 = 列名）"""
+    config = load_config()
+    if not config.has_section('Incremental'):
+        return {}
+    return {table: column.strip() for table, column in config.items('Incremental') if column.strip()}
+
+
+def get_incremental_overlap() -> int:
+    """差分エクスポートで前回のウォーターマークから遡って読み直す幅（日時列は秒数、数値列は値の差）を取得"""
+    config = load_config()
+    return max(config.getint('Database', 'incremental_overlap', fallback=300), 0)
+
+
+def get_full_export_every_days() -> int:
+    """差分エクスポートで全件をエクスポートし直して新しい起点とする間隔（日数、0の場合は更新しない）を取得"""
+    config = load_config()
+    return max(config.getint('Database', 'full_export_every_days', fallback=7), 0)
+
+
+def get_skip_unchanged_tables() -> bool:
+    """前回のバックアップ以降に変更のないテーブルのエクスポートを省略するかを取得"""
+    config = load_config()
+    return config.getboolean('Database', 'skip_unchanged_tables', fallback=False)
+
+
+def get_keep_daily() -> int:
+    """日次で残すバックアップの数を取得（日次・週次・月次がすべて0の場合はcleanup_daysで削除）"""
+    config = load_config()
+    return max(config.getint('Backup', 'keep_daily', fallback=0), 0)
+
+
+def get_keep_weekly() -> int:
+    """週次で残すバックアップの数を取得"""
+    config = load_config()
+    return max(config.getint('Backup', 'keep_weekly', fallback=0), 0)
+
+
+def get_keep_monthly() -> int:
+    """月次で残すバックアップの数を取得"""
+    config = load_config()
+    return max(config.getint('Backup', 'keep_monthly', fallback=0), 0)
+
+
+def get_max_total_bytes() -> int:
+    """バックアップ全体の合計サイズの上限（バイト）を取得（0の場合は制限しない）"""
+    config = load_config()
+    return int(max(config.getfloat('Backup', 'max_total_gb', fallback=0), 0) * 1024 ** 3)
+
+
+def get_cleanup_workers() -> int:
+    """古いバックアップやログを同時に削除するワーカー数を取得"""
+    config = load_config()
+    return max(config.getint('Backup', 'cleanup_workers', fallback=4), 1)
+
+
+def get_download_method() -> str:
+    """Herokuバックアップのダウンロード方式を取得（http/cli）"""
+    config = load_config()
+    return config.get('Backup', 'download_method', fallback='http').strip().lower()
+
+
+def get_download_chunk_size() -> int:
+    """HTTPダウンロードで一度に読み込むバイト数を取得（設定はMB単位）"""
+    config = load_config()
+    return max(config.getint('Backup', 'download_chunk_mb', fallback=8), 1) * 1024 * 1024
+
+
+def get_download_retries() -> int:
+    """HTTPダウンロードが中断した場合の再試行回数を取得"""
+    config = load_config()
+    return max(config.getint('Backup', 'download_retries', fallback=5), 0)
+
+
+def get_download_connections() -> int:
+    """HTTPダウンロードで同時に使う接続数を取得（1の場合は分割しない）"""
+    config = load_config()
+    return max(config.getint('Backup', 'download_connections', fallback=1), 1)
+
+
+def get_dump_compression() -> str:
+    """ダウンロードしたダンプファイルの圧縮方式を取得（none/gzip/zstd）"""
+    config = load_config()
+    return config.get('Backup', 'dump_compression', fallback='none').strip().lower()
+
+
+def get_dedup_dumps() -> bool:
+    """ダウンロードしたダンプをチャンクストアに重複排除して格納するかを取得"""
+    config = load_config()
+    return config.getboolean('Backup', 'dedup_dumps', fallback=False)
+
+
+def get_dedup_chunk_size() -> int:
+    """チャンクストアのチャンクの平均サイズを取得（設定はKB単位、2の累乗に切り下げ）"""
+    config = load_config()
+    chunk_bytes = max(config.getint('Backup', 'dedup_chunk_kb', fallback=1024), 1) * 1024
+    return 1 << (chunk_bytes.bit_length() - 1)
+
+
+def get_max_capture_age() -> float:
+    """再利用するHerokuバックアップの最大経過時間（時間）を取得（0の場合は常に新規作成）"""
+    config = load_config()
+    return max(config.getfloat('Backup', 'max_capture_age', fallback=0), 0)
+
+
+def get_capture_poll_interval() -> float:
+    """Herokuバックアップ作成中に進捗を確認する間隔（秒）を取得"""
+    config = load_config()
+    return max(config.getfloat('Backup', 'capture_poll_seconds', fallback=15), 1)
+
+
+def get_capture_timeout() -> float:
+    """Herokuバックアップ作成の期限（秒）を取得"""
+    config = load_config()
+    return max(config.getfloat('Backup', 'capture_timeout_minutes', fallback=60), 1) * 60
+
+
+def get_use_heroku_api() -> bool:
+    """Heroku CLIの代わりにHeroku APIを使うかを取得（APIトークンがない場合はCLIを使用）"""
+    config = load_config()
+    return config.getboolean('Backup', 'use_heroku_api', fallback=True)
+
+
+def get_auth_cache_hours() -> float:
+    """確認済みのHerokuログイン状態を再利用する時間を取得（0の場合は毎回確認）
+
+    バックアップの実行間隔（通常は1日）より短いと次回の実行時には常に期限切れになるため、既定値は間隔より長くする。
+    """
+    config = load_config()
+    return max(config.getfloat('Backup', 'auth_cache_hours', fallback=72), 0)
+
+
+def get_auth_cache_path() -> str | None:
+    """Herokuログイン状態のキャッシュファイルのパスを取得（未設定の場合はNone）"""
+    config = load_config()
+    return config.get('Paths', 'auth_cache_file', fallback=None) or None
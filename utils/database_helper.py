@@ -1,4 +1,111 @@
+import re
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import IO, Any
+
+from sqlalchemy import Connection, CursorResult, Engine, event, text
+
+SNAPSHOT_ID_PATTERN = re.compile(r'^[0-9A-Fa-f]+-[0-9A-Fa-f]+(-[0-9]+)?$')
+
+
 def add_ssl_mode(database_url: str) -> str:
     """データベースURLにSSLモードを追加"""
     separator = "&" if "?" in database_url else "?"
     return f"{database_url}{separator}sslmode=require"
+
+
+def stream_table(
+    conn: Connection,
+    table: str,
+    batch_size: int,
+    condition: str = "",
+    params: dict[str, Any] | None = None,
+) -> CursorResult:
+    """サーバーサイドカーソルでテーブルの行を取得するクエリを実行。条件の指定がなければ全件"""
+    where = f" WHERE {condition}" if condition else ""
+    statement = text(f"SELECT * FROM {table}{where}")
+    if params:
+        statement = statement.bindparams(**params)
+    return conn.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+
+
+def get_primary_key_columns(conn: Connection, table: str) -> list[str]:
+    """テーブルの主キー列を定義順で取得。主キーがない場合は空のリスト"""
+    statement = text(
+        "SELECT a.attname FROM pg_index i "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+        "WHERE i.indrelid = CAST(:table AS regclass) AND i.indisprimary "
+        "ORDER BY array_position(i.indkey::int2[], a.attnum)"
+    )
+    return list(conn.execute(statement, {"table": table}).scalars())
+
+
+@contextmanager
+def exported_snapshot(engine: Engine) -> Iterator[str]:
+    """スナップショットをエクスポートし、ブロックを抜けるまでトランザクションを保持する"""
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            snapshot_id = conn.execute(text("SELECT pg_export_snapshot()")).scalar_one()
+            yield snapshot_id
+
+
+def begin_snapshot(conn: Connection, snapshot_id: str) -> None:
+    """エクスポート済みスナップショットを参照するREPEATABLE READトランザクションを開始"""
+    # SET TRANSACTION SNAPSHOTはパラメータを受け付けないため形式を検証してから埋め込む
+    if not SNAPSHOT_ID_PATTERN.match(snapshot_id):
+        raise ValueError(f"不正なスナップショットIDです: {snapshot_id}")
+    conn.execution_options(isolation_level="REPEATABLE READ")
+    conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+
+
+def copy_expert(conn: Connection, sql: str, f: IO[bytes], params: dict[str, Any] | None = None) -> int:
+    """psycopg2のcopy_expertでCOPYを実行し、処理した件数を返す
+
+    COPYはパラメータを受け付けないため、paramsを指定した場合は%(name)s形式の値をmogrifyで埋め込む。
+    """
+    # psycopg2のカーソルを直接使うため、SQLAlchemy側でもトランザクションを開始しておく
+    if not conn.in_transaction():
+        conn.begin()
+
+    dbapi_connection = conn.connection.dbapi_connection
+    if dbapi_connection is None:
+        raise RuntimeError("データベース接続が確立されていません")
+
+    cursor = dbapi_connection.cursor()
+    try:
+        if params:
+            sql = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert(sql, f)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+class ConnectionStats:
+    """エンジンが確立したDB接続の数と接続確立にかかった時間を記録する"""
+
+    def __init__(self) -> None:
+        self.connection_count = 0
+        self.total_connect_seconds = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def attach(self, engine: Engine) -> None:
+        """エンジンの接続イベントを監視する"""
+        event.listen(engine, "do_connect", self._before_connect)
+        event.listen(engine, "connect", self._after_connect)
+
+    def _before_connect(self, *args: Any) -> None:
+        self._local.started_at = time.perf_counter()
+
+    def _after_connect(self, *args: Any) -> None:
+        started_at = getattr(self._local, 'started_at', None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        with self._lock:
+            self.connection_count += 1
+            self.total_connect_seconds += elapsed
@@ -0,0 +1,198 @@
+import http.client
+import json
+import logging
+import netrc
+import os
+import urllib.parse
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from utils.auth_cache import AUTH_CACHE_FILE_NAME, AuthCache, hash_credentials
+from utils.config_manager import get_auth_cache_hours, get_auth_cache_path, get_use_heroku_api
+
+logger = logging.getLogger(__name__)
+
+PLATFORM_API_URL = "https://api.heroku.com"
+POSTGRES_API_URL = "https://postgres-api.heroku.com"
+NETRC_MACHINE = "api.heroku.com"
+# pg:backupsで表示されるバックアップの転送先の種類
+BACKUP_TO_TYPE = "gof3r"
+
+
+class HerokuAPIError(Exception):
+    """Heroku APIがエラーを返した場合の例外"""
+
+    def __init__(self, message: str, status: int | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def get_netrc_path() -> Path:
+    """Heroku CLIが認証情報を保存するnetrcファイルのパスを取得（Windowsは_netrc）"""
+    home = Path.home()
+    for name in (".netrc", "_netrc"):
+        if (home / name).exists():
+            return home / name
+    return home / ".netrc"
+
+
+def load_api_token(netrc_path: Path | None = None) -> str | None:
+    """環境変数HEROKU_API_KEYまたはnetrcファイルからAPIトークンを取得"""
+    token = os.environ.get("HEROKU_API_KEY")
+    if token:
+        return token
+
+    path = netrc_path or get_netrc_path()
+    if not path.exists():
+        return None
+    try:
+        authenticators = netrc.netrc(str(path)).authenticators(NETRC_MACHINE)
+    except (netrc.NetrcParseError, OSError) as e:
+        logger.warning(f"netrcファイルを読み込めませんでした: {e}")
+        return None
+    return authenticators[2] if authenticators else None
+
+
+def get_auth_cache() -> AuthCache:
+    """現在の認証情報に対応するログイン状態のキャッシュを取得"""
+    state_file = Path(get_auth_cache_path() or Path.home() / AUTH_CACHE_FILE_NAME)
+    credentials_hash = hash_credentials(get_netrc_path(), os.environ.get("HEROKU_API_KEY"))
+    return AuthCache(state_file, credentials_hash, get_auth_cache_hours())
+
+
+def get_backup_id(transfer: dict[str, Any]) -> str:
+    """転送情報からpg:backupsと同じ形式のバックアップID（例: b101、スケジュールはa101）を作成"""
+    prefix = "a" if transfer.get("schedule") else "b"
+    return f"{prefix}{transfer['num']}"
+
+
+def parse_backup_number(backup_id: str) -> int:
+    """バックアップID（例: b101）から番号を取得"""
+    return int(backup_id.lstrip("abcr"))
+
+
+class HerokuAPIClient:
+    """Heroku Platform APIとPostgresバックアップAPIのクライアント
+
+    ホスト毎に接続を保持し、複数のリクエストで使い回す。
+    APIが401を返した場合はon_unauthorizedを呼び出す（ログイン状態のキャッシュの削除など）。
+    """
+
+    def __init__(
+        self,
+        token: str,
+        platform_url: str = PLATFORM_API_URL,
+        postgres_url: str = POSTGRES_API_URL,
+        timeout: float = 30.0,
+        on_unauthorized: Callable[[], None] | None = None,
+    ) -> None:
+        self._token = token
+        self.platform_url = platform_url
+        self.postgres_url = postgres_url
+        self.timeout = timeout
+        self.on_unauthorized = on_unauthorized
+        self._connections: dict[str, http.client.HTTPConnection] = {}
+
+    def _get_connection(self, base_url: str) -> http.client.HTTPConnection:
+        connection = self._connections.get(base_url)
+        if connection is None:
+            parsed = urllib.parse.urlsplit(base_url)
+            connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(parsed.netloc, timeout=self.timeout)
+            self._connections[base_url] = connection
+        return connection
+
+    def _request(self, base_url: str, method: str, path: str, body: dict[str, Any] | None = None) -> Any:
+        headers = {
+            "Accept": "application/vnd.heroku+json; version=3",
+            "Authorization": f"Bearer {self._token}",
+        }
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        error: Exception | None = None
+        for _ in range(2):
+            connection = self._get_connection(base_url)
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # 保持していた接続がサーバー側で閉じられていた場合は1回だけ接続し直す
+                connection.close()
+                del self._connections[base_url]
+                error = e
+                continue
+            return self._parse_response(response, data, method, path)
+
+        raise HerokuAPIError(f"Heroku APIに接続できません: {method} {path}: {error}") from error
+
+    def _parse_response(self, response: http.client.HTTPResponse, data: bytes, method: str, path: str) -> Any:
+        if response.status == 401 and self.on_unauthorized is not None:
+            self.on_unauthorized()
+        if response.status >= 400:
+            try:
+                message = json.loads(data).get("message", "")
+            except ValueError:
+                message = data.decode("utf-8", errors="replace")
+            raise HerokuAPIError(f"Heroku APIエラー: HTTP {response.status} {method} {path}: {message}", response.status)
+        return json.loads(data) if data else None
+
+    def close(self) -> None:
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def __enter__(self) -> 'HerokuAPIClient':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def whoami(self) -> str:
+        """ログイン中のアカウントのメールアドレスを取得"""
+        return self._request(self.platform_url, "GET", "/account")["email"]
+
+    def get_database_id(self, app_name: str) -> str:
+        """アプリのDATABASEに接続しているHeroku PostgresアドオンのIDを取得"""
+        attachment = self._request(self.platform_url, "GET", f"/apps/{app_name}/addon-attachments/DATABASE")
+        return attachment["addon"]["id"]
+
+    def capture(self, app_name: str) -> dict[str, Any]:
+        """バックアップの作成を開始し、転送情報を返す"""
+        database_id = self.get_database_id(app_name)
+        return self._request(self.postgres_url, "POST", f"/client/v11/databases/{database_id}/backups")
+
+    def list_backups(self, app_name: str) -> list[dict[str, Any]]:
+        """アプリのバックアップ一覧を取得（リストアやコピーは含めない）"""
+        transfers = self._request(self.postgres_url, "GET", f"/client/v11/apps/{app_name}/transfers")
+        return [transfer for transfer in transfers if transfer.get("to_type") == BACKUP_TO_TYPE]
+
+    def get_backup(self, app_name: str, num: int) -> dict[str, Any]:
+        """バックアップの状態と処理済みのバイト数を取得"""
+        return self._request(self.postgres_url, "GET", f"/client/v11/apps/{app_name}/transfers/{num}")
+
+    def get_backup_url(self, app_name: str, num: int) -> str:
+        """バックアップをダウンロードする署名付きURLを取得"""
+        result = self._request(
+            self.postgres_url, "POST", f"/client/v11/apps/{app_name}/transfers/{num}/actions/public-url"
+        )
+        return result["url"]
+
+    def cancel_backup(self, app_name: str, uuid: str) -> None:
+        """実行中のバックアップを取り消す"""
+        self._request(self.postgres_url, "POST", f"/client/v11/apps/{app_name}/transfers/{uuid}/actions/cancel")
+
+
+def get_api_client() -> HerokuAPIClient | None:
+    """APIトークンがあればHeroku APIクライアントを作成。ない場合はNone（Heroku CLIを使用）"""
+    if not get_use_heroku_api():
+        return None
+    token = load_api_token()
+    if token is None:
+        logger.info("HerokuのAPIトークンが見つからないためHeroku CLIを使用します")
+        return None
+    return HerokuAPIClient(token, on_unauthorized=get_auth_cache().invalidate)
@@ -0,0 +1,263 @@
+import http.client
+import logging
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utils.artifact_writer import ArtifactWriter, copy_through, hash_file
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)$')
+PROGRESS_LOG_BYTES = 256 * 1024 * 1024
+# 再試行しても結果が変わらないHTTPステータス以外は通信エラーとして再試行する
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class DownloadResult:
+    """ダウンロードしたバイト数と、圧縮前の内容のSHA-256"""
+
+    def __init__(self, size: int, sha256: str) -> None:
+        self.size = size
+        self.sha256 = sha256
+
+
+def get_part_path(destination: Path) -> Path:
+    return destination.with_name(f"{destination.name}.part")
+
+
+def _parse_total_size(content_range: str | None) -> int | None:
+    """Content-Rangeヘッダーからファイル全体のサイズを取得"""
+    if not content_range:
+        return None
+    match = CONTENT_RANGE_PATTERN.match(content_range.strip())
+    if match is None or match.group(3) == '*':
+        return None
+    return int(match.group(3))
+
+
+def _get_total_size(response: http.client.HTTPResponse, offset: int) -> int | None:
+    if response.status == 206:
+        return _parse_total_size(response.headers.get('Content-Range'))
+    content_length = response.headers.get('Content-Length')
+    return int(content_length) + offset if content_length is not None else None
+
+
+def _download_into(
+    url: str,
+    writer: ArtifactWriter,
+    chunk_size: int,
+    max_retries: int,
+    retry_wait: float,
+    timeout: float,
+) -> None:
+    """受信したバイト列をwriterに書き込む。中断した場合は書き込み済みの位置から再開する"""
+    total_size: int | None = None
+    retries = 0
+
+    while True:
+        offset = writer.bytes_written
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header('Range', f"bytes={offset}-")
+
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if offset and response.status != 206:
+                    # Rangeに対応していないサーバーは全体を返すため最初から書き直す
+                    logger.warning("サーバーが再開に対応していないため最初からダウンロードします")
+                    writer.restart()
+                    offset = 0
+                total_size = _get_total_size(response, offset)
+                if offset:
+                    logger.info(f"{offset:,}バイト目からダウンロードを再開します")
+
+                next_progress = offset + PROGRESS_LOG_BYTES
+                while chunk := response.read(chunk_size):
+                    writer.write(chunk)
+                    offset += len(chunk)
+                    if offset >= next_progress:
+                        total_text = f" / {total_size / 1024 / 1024:,.0f}MB" if total_size else ""
+                        logger.info(f"ダウンロード中: {offset / 1024 / 1024:,.0f}MB{total_text}")
+                        next_progress += PROGRESS_LOG_BYTES
+
+            if total_size is not None and offset < total_size:
+                raise http.client.IncompleteRead(b'', total_size - offset)
+            return
+
+        except urllib.error.HTTPError as e:
+            if e.code == 416:
+                # 前回の実行で全体を受信済みの場合
+                total_size = _parse_total_size(e.headers.get('Content-Range'))
+                if total_size is not None and offset == total_size:
+                    return
+            if e.code not in RETRYABLE_STATUS_CODES or retries >= max_retries:
+                raise
+            error: Exception = e
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            if retries >= max_retries:
+                raise ConnectionError(f"ダウンロードが{max_retries}回の再試行後も完了しませんでした: {e}") from e
+            error = e
+
+        retries += 1
+        logger.warning(f"ダウンロードが中断されました（{retries}/{max_retries}回目の再試行）: {error}")
+        time.sleep(retry_wait * retries)
+
+
+def download_with_resume(
+    url: str,
+    destination: Path,
+    chunk_size: int = 8 * 1024 * 1024,
+    max_retries: int = 5,
+    retry_wait: float = 2.0,
+    timeout: float = 60.0,
+    compression: str = 'none',
+) -> DownloadResult:
+    """URLの内容を.partファイルへストリーミングで保存し、完了後にdestinationへ置き換える
+
+    受信したバイト列は1回の書き込みでSHA-256の計算と圧縮を行う。
+    通信が途切れた場合はRangeリクエストで続きから再開する。
+    """
+    part_file = get_part_path(destination)
+    with ArtifactWriter(part_file, compression, resume=True) as writer:
+        _download_into(url, writer, chunk_size, max_retries, retry_wait, timeout)
+        result = DownloadResult(writer.bytes_written, writer.hexdigest())
+
+    os.replace(part_file, destination)
+    return result
+
+
+def _probe_total_size(url: str, timeout: float) -> int | None:
+    """先頭1バイトのRangeリクエストでファイル全体のサイズを取得。Range非対応の場合はNone"""
+    # 署名付きURLはGET用に署名されているためHEADではなくGETで確認する
+    request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        if response.status != 206:
+            return None
+        return _parse_total_size(response.headers.get('Content-Range'))
+
+
+class SegmentProgress:
+    """複数の接続で受信したバイト数を合算して進捗をログに出力する"""
+
+    def __init__(self, total_size: int) -> None:
+        self.total_size = total_size
+        self.received = 0
+        self._next_log = PROGRESS_LOG_BYTES
+        self._lock = threading.Lock()
+
+    def add(self, size: int) -> None:
+        with self._lock:
+            self.received += size
+            if self.received >= self._next_log:
+                logger.info(
+                    f"ダウンロード中: {self.received / 1024 / 1024:,.0f}MB / {self.total_size / 1024 / 1024:,.0f}MB"
+                )
+                self._next_log += PROGRESS_LOG_BYTES
+
+
+def _download_segment(
+    url: str,
+    part_file: Path,
+    start: int,
+    end: int,
+    chunk_size: int,
+    max_retries: int,
+    retry_wait: float,
+    timeout: float,
+    progress: SegmentProgress,
+) -> int:
+    """start〜endのバイト範囲を取得して事前確保したファイルの該当位置に書き込む"""
+    position = start
+    retries = 0
+    while True:
+        request = urllib.request.Request(url, headers={'Range': f"bytes={position}-{end}"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response, open(part_file, 'r+b') as f:
+                if response.status != 206:
+                    raise ValueError(f"Rangeリクエストに対応していない応答です: HTTP {response.status}")
+                f.seek(position)
+                while position <= end and (chunk := response.read(min(chunk_size, end - position + 1))):
+                    f.write(chunk)
+                    position += len(chunk)
+                    progress.add(len(chunk))
+            if position <= end:
+                raise http.client.IncompleteRead(b'', end - position + 1)
+            return position - start
+
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or retries >= max_retries:
+                raise
+            error: Exception = e
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            if retries >= max_retries:
+                raise ConnectionError(f"バイト範囲 {start}-{end} のダウンロードが完了しませんでした: {e}") from e
+            error = e
+
+        retries += 1
+        logger.warning(
+            f"バイト範囲 {start}-{end} のダウンロードが中断されました（{retries}/{max_retries}回目の再試行）: {error}"
+        )
+        time.sleep(retry_wait * retries)
+
+
+def download_segmented(
+    url: str,
+    destination: Path,
+    connections: int,
+    chunk_size: int = 8 * 1024 * 1024,
+    max_retries: int = 5,
+    retry_wait: float = 2.0,
+    timeout: float = 60.0,
+    compression: str = 'none',
+) -> DownloadResult:
+    """ファイルをconnections個のバイト範囲に分け、同時に取得してdestinationに保存する
+
+    サーバーがRangeリクエストに対応していない場合は1本の接続でダウンロードする。
+    範囲毎に順不同で書き込むため、SHA-256の計算と圧縮は受信後に1回読み直して行う。
+    """
+    total_size = _probe_total_size(url, timeout)
+    if total_size is None or connections <= 1 or total_size < connections:
+        return download_with_resume(url, destination, chunk_size, max_retries, retry_wait, timeout, compression)
+
+    part_file = get_part_path(destination)
+    # 全体のサイズを事前に確保し、各接続が自分の範囲に直接書き込む
+    with open(part_file, 'wb') as f:
+        f.truncate(total_size)
+
+    segment_size = -(-total_size // connections)
+    ranges = [(start, min(start + segment_size, total_size) - 1) for start in range(0, total_size, segment_size)]
+    logger.info(f"{len(ranges)}本の接続で分割ダウンロードします（{total_size:,}バイト）")
+
+    progress = SegmentProgress(total_size)
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(
+                _download_segment, url, part_file, start, end,
+                chunk_size, max_retries, retry_wait, timeout, progress
+            )
+            for start, end in ranges
+        ]
+        received = sum(future.result() for future in futures)
+
+    # 全範囲を受信し、ファイルサイズが一致することを確認してから置き換える
+    if received != total_size or part_file.stat().st_size != total_size:
+        raise ConnectionError(f"ダウンロードしたサイズが一致しません: {received:,} / {total_size:,}バイト")
+
+    if compression == 'none':
+        result = DownloadResult(total_size, hash_file(part_file))
+        os.replace(part_file, destination)
+        return result
+
+    try:
+        with ArtifactWriter(destination, compression) as writer:
+            copy_through(part_file, writer)
+            result = DownloadResult(writer.bytes_written, writer.hexdigest())
+    finally:
+        part_file.unlink(missing_ok=True)
+    return result
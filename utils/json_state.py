@@ -0,0 +1,27 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+
+def load_json_state(path: Path) -> dict[str, Any]:
+    """JSONの状態ファイルを読み込む。ファイルがない場合は空"""
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json_state(path: Path, state: dict[str, Any]) -> None:
+    """書き込み途中で中断しても壊れた状態ファイルが残らないよう、一時ファイルに書いてから置き換える"""
+    temp_file = path.with_name(f"{path.name}.part")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
+
+
+def save_json_section(path: Path, section: str, value: dict[str, Any]) -> None:
+    """他のセクションの内容を残したまま、指定したセクションだけを置き換えて保存"""
+    state = load_json_state(path)
+    state[section] = value
+    save_json_state(path, state)
@@ -3,15 +3,19 @@ from datetime import datetime, timedelta
 from logging.handlers import TimedRotatingFileHandler
 from pathlib import Path
 
-from utils.config_manager import get_log_level
+from utils.cleanup_plan import DeletionPlan, scan_directory
+from utils.config_manager import get_cleanup_workers, get_log_level
 
 
 def get_project_root() -> Path:
     return Path(__file__).parent.parent
 
 
-def setup_logging(log_directory: str = 'logs', log_retention_days: int = 7, log_name: str = 'HerokuDatabaseBackup'):
-    """ロギングシステムを初期化し古いログを削除"""
+def setup_logging(
+    log_directory: str = 'logs', log_retention_days: int = 7, log_name: str = 'HerokuDatabaseBackup',
+    dry_run: bool = False
+):
+    """ロギングシステムを初期化し古いログを削除（dry_runの場合は削除対象を表示するだけ）"""
     project_root = get_project_root()
     log_dir_path = project_root / log_directory
 
@@ -40,22 +44,29 @@ def setup_logging(log_directory: str = 'logs', log_retention_days: int = 7, log_
         handlers=[file_handler, console_handler]
     )
 
-    cleanup_old_logs(log_dir_path, log_retention_days, log_name)
+    cleanup_old_logs(log_dir_path, log_retention_days, log_name, dry_run)
     logging.info(f"ログシステムを初期化しました: {log_file}")
     logging.info(f"ログレベル: {log_level_str}")
 
 
-def cleanup_old_logs(log_directory: Path, retention_days: int, log_name: str):
-    """保持期間を超えたログファイルを削除"""
-    now = datetime.now()
+def cleanup_old_logs(log_directory: Path, retention_days: int, log_name: str, dry_run: bool = False):
+    """保持期間を超えたログファイルを削除（dry_runの場合は削除対象をログに出力するだけ）"""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
     main_log_file = f'{log_name}.log'
 
-    for file_path in log_directory.glob('*.log'):
-        if file_path.name != main_log_file:
-            file_modification_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-            if now - file_modification_time > timedelta(days=retention_days):
-                try:
-                    file_path.unlink()
-                    logging.info(f"古いログファイルを削除しました: {file_path.name}")
-                except OSError as e:
-                    logging.error(f"ログファイルの削除中にエラーが発生しました {file_path.name}: {str(e)}")
+    plan = DeletionPlan()
+    for entry in scan_directory(log_directory, ['*.log']):
+        if entry.name != main_log_file and entry.is_file():
+            stat = entry.stat()
+            if stat.st_mtime < cutoff:
+                plan.add(Path(entry.path), stat.st_size, reason=f"保持期間（{retention_days}日）超過")
+
+    if dry_run:
+        plan.log_report("削除対象のログファイル")
+        return
+
+    deleted, failed = plan.execute(get_cleanup_workers())
+    for item in deleted:
+        logging.info(f"古いログファイルを削除しました: {item.path.name}")
+    for item, error in failed:
+        logging.error(f"ログファイルの削除中にエラーが発生しました {item.path.name}: {str(error)}")
@@ -0,0 +1,144 @@
+import base64
+import datetime
+import decimal
+import json
+import math
+import uuid
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+from sqlalchemy import Result
+
+Converter = Callable[[Any], Any]
+
+# psycopg2がそのままJSONに変換できる値を返す型（変換不要）
+PLAIN_TYPE_OIDS = frozenset({
+    16,    # bool
+    18,    # char
+    19,    # name
+    20,    # int8
+    21,    # int2
+    23,    # int4
+    25,    # text
+    26,    # oid
+    114,   # json
+    790,   # money
+    1042,  # bpchar
+    1043,  # varchar
+    3802,  # jsonb
+})
+
+
+def _isoformat(value: Any) -> str:
+    return value.isoformat()
+
+
+def _decimal_to_str(value: decimal.Decimal) -> str:
+    # floatを経由すると精度が落ちるため文字列で保持する
+    return str(value)
+
+
+def _float_to_json(value: float) -> float | str:
+    """NaN・無限大はJSONの数値で表せないため、PostgreSQLが受け付ける文字列（NaN/Infinity/-Infinity）にする"""
+    if math.isfinite(value):
+        return value
+    if math.isnan(value):
+        return 'NaN'
+    return 'Infinity' if value > 0 else '-Infinity'
+
+
+def _bytes_to_base64(value: bytes | bytearray | memoryview) -> str:
+    return base64.b64encode(bytes(value)).decode('ascii')
+
+
+def _timedelta_to_iso8601(value: datetime.timedelta) -> str:
+    """intervalをPostgreSQLが受け付けるISO 8601形式に変換"""
+    # psycopg2はintervalの月をdaysに正規化して返すため、日数以下の精度で復元できる
+    sign = '-' if value < datetime.timedelta(0) else ''
+    value = abs(value)
+    seconds = value.seconds + value.microseconds / 1_000_000
+    return f"{sign}P{value.days}DT{seconds:.6f}S"
+
+
+def _convert_any(value: Any) -> Any:
+    """型が事前に分からない値をJSONに変換可能な値に変換"""
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    if isinstance(value, float):
+        return _float_to_json(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return _decimal_to_str(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _bytes_to_base64(value)
+    if isinstance(value, datetime.timedelta):
+        return _timedelta_to_iso8601(value)
+    if isinstance(value, (list, tuple)):
+        return [_convert_any(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _convert_any(item) for key, item in value.items()}
+    return str(value)
+
+
+TYPE_CONVERTERS: dict[int, Converter] = {
+    17: _bytes_to_base64,          # bytea
+    700: _float_to_json,           # float4
+    701: _float_to_json,           # float8
+    1082: _isoformat,              # date
+    1083: _isoformat,              # time
+    1114: _isoformat,              # timestamp
+    1184: _isoformat,              # timestamptz
+    1186: _timedelta_to_iso8601,   # interval
+    1266: _isoformat,              # timetz
+    1700: _decimal_to_str,         # numeric
+    2950: str,                     # uuid
+}
+
+
+def get_converter(type_code: Any) -> Converter | None:
+    """列の型コード（OID）に対応する変換関数を取得。変換不要な型はNone"""
+    if type_code in PLAIN_TYPE_OIDS:
+        return None
+    return TYPE_CONVERTERS.get(type_code, _convert_any)
+
+
+class RowEncoder:
+    """列毎の変換関数を一度だけ組み立て、行をJSONに変換する"""
+
+    def __init__(self, keys: Iterable[str], type_codes: Sequence[Any] | None = None) -> None:
+        self.keys = list(keys)
+        if type_codes is None or len(type_codes) != len(self.keys):
+            # 型情報が取得できない場合は値から型を判定する
+            type_codes = [None] * len(self.keys)
+
+        self.converters: list[tuple[int, Converter]] = []
+        for index, type_code in enumerate(type_codes):
+            converter = get_converter(type_code)
+            if converter is not None:
+                self.converters.append((index, converter))
+
+        # 変換漏れのNaNなどを不正なJSONとして書き込まないよう、エラーにする
+        self._encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False).encode
+
+    @classmethod
+    def from_result(cls, result: Result) -> 'RowEncoder':
+        """結果セットのカーソル情報から列の型を取得してエンコーダーを作成"""
+        description = getattr(getattr(result, 'cursor', None), 'description', None)
+        type_codes = [column[1] for column in description] if isinstance(description, Sequence) else None
+        return cls(result.keys(), type_codes)
+
+    def convert(self, row: Sequence[Any]) -> dict[str, Any]:
+        """行をJSONに変換可能な辞書に変換"""
+        values = list(row)
+        for index, converter in self.converters:
+            value = values[index]
+            if value is not None:
+                values[index] = converter(value)
+        return dict(zip(self.keys, values))
+
+    def encode(self, row: Sequence[Any]) -> str:
+        """行をJSON文字列に変換"""
+        return self._encode(self.convert(row))
@@ -0,0 +1,174 @@
+import datetime
+import threading
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Connection, text
+
+from utils.backup_catalog import TIMESTAMP_FORMAT
+from utils.json_state import load_json_state, save_json_section
+from utils.row_converter import RowEncoder
+
+WATERMARK_FILE_NAME = "watermarks.json"
+
+
+class WatermarkRange:
+    """ウォーターマーク列で絞り込むエクスポート範囲（lower < 列 <= upper）"""
+
+    def __init__(self, column: str, lower: Any, upper: Any) -> None:
+        self.column = column
+        self.lower = lower
+        self.upper = upper
+
+    @property
+    def params(self) -> dict[str, Any]:
+        """クエリに渡す値。前回のウォーターマークがない場合は全件を対象とするため空"""
+        if self.lower is None:
+            # 初回は列がNULLの行も含めて全件をエクスポートする
+            return {}
+        params = {"watermark_lower": self.lower}
+        if self.upper is not None:
+            params["watermark_upper"] = self.upper
+        return params
+
+    def condition(self, conn: Connection, pyformat: bool = False) -> str:
+        """WHERE句の条件を作成。pyformatがTrueの場合はpsycopg2の%(name)s形式のプレースホルダを使う"""
+        column = conn.dialect.identifier_preparer.quote(self.column)
+        conditions = []
+        for name, operator in (("watermark_lower", ">"), ("watermark_upper", "<=")):
+            if name in self.params:
+                placeholder = f"%({name})s" if pyformat else f":{name}"
+                conditions.append(f"{column} {operator} {placeholder}")
+        return " AND ".join(conditions)
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    """テーブルに指定した列が存在するかを確認"""
+    statement = text(
+        "SELECT EXISTS (SELECT 1 FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attname = :column AND attnum > 0 AND NOT attisdropped)"
+    )
+    return bool(conn.execute(statement, {"table": table, "column": column}).scalar_one())
+
+
+def get_column_max(conn: Connection, table: str, column: str) -> Any:
+    """列の最大値を取得。行がない場合はNone"""
+    quoted = conn.dialect.identifier_preparer.quote(column)
+    return conn.execute(text(f"SELECT max({quoted}) FROM {table}")).scalar_one()
+
+
+def subtract_overlap(value: Any, overlap: float) -> Any:
+    """保存済みのウォーターマークから、読み直す幅を引いた下限を求める
+
+    日時列は秒数、数値列は値の差として引く。文字列など解釈できない値はそのまま使う。
+    """
+    if not overlap or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value - int(overlap)
+    if isinstance(value, float):
+        return value - overlap
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value) - datetime.timedelta(seconds=overlap)
+        except ValueError:
+            return value
+    return value
+
+
+class IncrementalExport:
+    """エクスポート形式毎にテーブルのウォーターマークを管理し、差分の範囲を決定する
+
+    前回の上限を読んだ後にコミットされた、上限以下の値の行を取りこぼさないよう、
+    下限はoverlapの幅だけ遡って読み直す（差分ファイル間で行が重複する場合がある）。
+    テーブル毎に差分の起点となった全件エクスポートのタイムスタンプ（base）も記録する。
+    起点からfull_export_every_days日以上経過したテーブルは全件をエクスポートして新しい起点とし、
+    古い起点と差分を削除できるようにする（0の場合は起点を更新しない）。
+    """
+
+    def __init__(
+        self,
+        state_file: Path,
+        export_name: str,
+        columns: dict[str, str],
+        timestamp: str | None = None,
+        overlap: float = 0,
+        full_export_every_days: int = 0,
+    ) -> None:
+        self.state_file = state_file
+        self.export_name = export_name
+        self.columns = columns
+        self.timestamp = timestamp
+        self.overlap = overlap
+        self.full_export_every_days = full_export_every_days
+        self._lock = threading.Lock()
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._bases: dict[str, str] = {}
+        self._marks: dict[str, dict[str, Any]] = load_json_state(state_file).get(export_name, {})
+
+    def prepare(self, conn: Connection, table: str) -> WatermarkRange | None:
+        """テーブルのエクスポート範囲を決定。ウォーターマーク列がない場合は全件（None）"""
+        column = self.columns.get(table)
+        if column is None:
+            return None
+        if not has_column(conn, table, column):
+            print(f"  ⚠️ {table}: ウォーターマーク列 {column} がないため全件をエクスポートします")
+            return None
+
+        # 先に上限を確定し、エクスポート中に追加された行は次回に回す
+        upper = get_column_max(conn, table, column)
+        mark = self._get_chain_mark(table)
+        if mark is not None:
+            lower = subtract_overlap(mark["value"], self.overlap)
+            base = mark.get("base")
+        else:
+            lower = None
+            base = self.timestamp
+
+        with self._lock:
+            if lower is not None and base is not None:
+                self._bases[table] = base
+            if upper is not None:
+                value = RowEncoder([column]).convert([upper])[column]
+                self._pending[table] = {"column": column, "value": value}
+                if base is not None:
+                    self._pending[table]["base"] = base
+        return WatermarkRange(column, lower, upper)
+
+    def _get_chain_mark(self, table: str) -> dict[str, Any] | None:
+        """差分の下限に使う前回のウォーターマーク。列が変わった場合や起点が古い場合はNone（全件）"""
+        mark = self._marks.get(table)
+        if mark is None or mark["column"] != self.columns.get(table):
+            return None
+        if self.full_export_every_days <= 0 or self.timestamp is None:
+            return mark
+        base = mark.get("base")
+        if base is None:
+            return None
+        try:
+            elapsed = (
+                datetime.datetime.strptime(self.timestamp, TIMESTAMP_FORMAT)
+                - datetime.datetime.strptime(base, TIMESTAMP_FORMAT)
+            )
+        except ValueError:
+            return mark
+        return None if elapsed >= datetime.timedelta(days=self.full_export_every_days) else mark
+
+    def is_incremental(self, table: str) -> bool:
+        """前回のウォーターマークがあり、差分のみをエクスポートするテーブルか"""
+        return self._get_chain_mark(table) is not None
+
+    def get_base_timestamp(self) -> str | None:
+        """差分を含む場合は、復元に必要な最も古い全件エクスポートのタイムスタンプ。全件のみの場合はNone"""
+        with self._lock:
+            return min(self._bases.values(), default=None)
+
+    def save(self, results: dict[str, bool]) -> None:
+        """エクスポートに成功したテーブルのウォーターマークを保存"""
+        with self._lock:
+            updated = {table: mark for table, mark in self._pending.items() if results.get(table)}
+        if not updated:
+            return
+
+        self._marks.update(updated)
+        save_json_section(self.state_file, self.export_name, self._marks)